@@ -1,16 +1,53 @@
 import os
+import io
+import csv
 import json
-from datetime import datetime
-from typing import Optional, List
+import base64
+import asyncio
+import heapq
+import logging
+import itertools
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, AsyncIterator
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, select
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, select, delete, or_, and_, func, case
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from .models import ActionRequest
+from .audit_archive import SegmentStore, month_start, add_months
+from .tracing import span
 
 DATABASE_URL = os.getenv("AUDIT_DB_URL", "sqlite+aiosqlite:///./audit.db")
 
+# Group commit: flush every AUDIT_BATCH_SIZE records or AUDIT_FLUSH_INTERVAL_MS, whichever comes first
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "200"))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+# What to do when the queue is full: block (wait for room), inline (commit directly) or drop
+AUDIT_QUEUE_POLICY = os.getenv("AUDIT_QUEUE_POLICY", "block")
+# A failed group commit is retried until it succeeds, backing off up to this long between attempts
+AUDIT_FLUSH_MAX_BACKOFF_MS = int(os.getenv("AUDIT_FLUSH_MAX_BACKOFF_MS", "5000"))
+# Rows fetched per round-trip while streaming an export
+AUDIT_EXPORT_CHUNK = int(os.getenv("AUDIT_EXPORT_CHUNK", "1000"))
+# Months kept in the database (the current one included); older months move to archive segments. 0 disables archiving
+AUDIT_HOT_MONTHS = int(os.getenv("AUDIT_HOT_MONTHS", "3"))
+# Entries older than this are deleted, archived or not. 0 keeps everything
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "0"))
+AUDIT_RETENTION_INTERVAL = int(os.getenv("AUDIT_RETENTION_INTERVAL", "3600"))
+
+AUDIT_QUEUE_DEPTH = Gauge("mcp_audit_queue_depth", "Audit records waiting to be written")
+AUDIT_BATCH = Histogram("mcp_audit_batch_size", "Audit records per group commit", buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+AUDIT_FLUSH_LATENCY = Histogram("mcp_audit_flush_seconds", "Audit group commit latency")
+AUDIT_DROPPED = Counter("mcp_audit_dropped_total", "Audit records dropped", ["reason"])
+AUDIT_FLUSH_FAILURES = Counter("mcp_audit_flush_failures_total", "Audit group commits that failed and were retried")
+AUDIT_ARCHIVED = Counter("mcp_audit_archived_total", "Audit records moved to archive segments")
+AUDIT_EXPIRED = Counter("mcp_audit_expired_total", "Audit records deleted by the retention window", ["source"])
+
+logger = logging.getLogger(__name__)
+
 engine = create_async_engine(DATABASE_URL, echo=False)
 SessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 Base = declarative_base()
@@ -27,46 +64,363 @@ class AuditEntry(Base):
     parameters = Column(Text)
     result = Column(String)
 
+    # Match the /audit query shapes: org is always given, newest first, id breaks timestamp ties
+    __table_args__ = (
+        Index("ix_audit_log_timestamp", "timestamp", "id"),
+        Index("ix_audit_log_org_timestamp", "org", "timestamp", "id"),
+        Index("ix_audit_log_org_user_timestamp", "org", "user_email", "timestamp", "id"),
+        Index("ix_audit_log_org_action_timestamp", "org", "action", "timestamp", "id"),
+        Index("ix_audit_log_org_repo_timestamp", "org", "repo", "timestamp", "id"),
+    )
+
+def _create_missing_indexes(conn):
+    # create_all skips tables that already exist, so add indexes to older databases here
+    for index in AuditEntry.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
 
-async def log_action(user: dict, action: ActionRequest, result: str):
+async def write_entries(records: List[AuditEntry]):
     async with SessionLocal() as session:
-        record = AuditEntry(
-            user_email=user.get("email"),
-            action=action.action,
-            org=action.org,
-            repo=action.repo,
-            parameters=json.dumps(action.parameters),
-            result=result
-        )
-        session.add(record)
+        session.add_all(records)
         await session.commit()
 
+class AuditWriter:
+    """
+    Background audit pipeline: records go onto a bounded queue and a single
+    writer task commits them in groups, so callers never wait on a commit.
+    A batch that fails to commit is retried until it goes through; meanwhile
+    the queue fills up and AUDIT_QUEUE_POLICY decides what callers do.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval_ms: int = AUDIT_FLUSH_INTERVAL_MS,
+        queue_size: int = AUDIT_QUEUE_SIZE,
+        policy: str = AUDIT_QUEUE_POLICY,
+        max_backoff_ms: int = AUDIT_FLUSH_MAX_BACKOFF_MS,
+    ):
+        if policy not in ("block", "inline", "drop"):
+            raise ValueError(f"Unknown audit queue policy: {policy}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.queue_size = queue_size
+        self.policy = policy
+        self.max_backoff = max_backoff_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.create_task(self._run(), name="audit-writer")
+
+    async def stop(self):
+        """Flush everything still queued, then stop the writer."""
+        if not self.running:
+            return
+        await self.queue.put(self._STOP)
+        await self.task
+        self.task = None
+
+    async def submit(self, record: AuditEntry):
+        if not self.running:
+            # No writer (tests, CLI tools): fall back to a direct commit
+            await write_entries([record])
+            return
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            if self.policy == "block":
+                await self.queue.put(record)
+            elif self.policy == "inline":
+                await write_entries([record])
+                return
+            else:
+                AUDIT_DROPPED.labels(reason="queue_full").inc()
+                logger.warning("Audit queue full, dropping record for %s", record.action)
+                return
+        AUDIT_QUEUE_DEPTH.set(self.queue.qsize())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            AUDIT_QUEUE_DEPTH.set(self.queue.qsize())
+            await self._flush(batch)
+            if stopping:
+                # Drain whatever was queued behind the stop marker
+                rest = []
+                while not self.queue.empty():
+                    rest.append(self.queue.get_nowait())
+                if rest:
+                    await self._flush(rest)
+                return
+
+    async def _flush(self, batch: List[AuditEntry]):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                await write_entries(batch)
+                AUDIT_BATCH.observe(len(batch))
+                AUDIT_FLUSH_LATENCY.observe(time.perf_counter() - started)
+                return
+            except Exception as e:
+                attempt += 1
+                AUDIT_FLUSH_FAILURES.inc()
+                logger.warning("Audit flush of %d records failed (attempt %d): %s", len(batch), attempt, e)
+                # Audit records are never dropped here; the writer stops taking from the queue instead
+                await asyncio.sleep(min(0.1 * 2 ** attempt, self.max_backoff))
+
+audit_writer = AuditWriter()
+
+def make_entry(user: dict, action: ActionRequest, result: str) -> AuditEntry:
+    return AuditEntry(
+        timestamp=datetime.utcnow(),
+        user_email=user.get("email"),
+        action=action.action,
+        org=action.org,
+        repo=action.repo,
+        parameters=json.dumps(action.parameters),
+        result=result
+    )
+
+async def log_action(user: dict, action: ActionRequest, result: str):
+    with span("audit", action.action, action.org):
+        await audit_writer.submit(make_entry(user, action, result))
+
+async def log_actions(user: dict, outcomes: List[tuple]):
+    """Record a batch of (action, result) pairs in a single transaction."""
+    await write_entries([make_entry(user, action, result) for action, result in outcomes])
+
+def _naive_utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC (datetime.utcnow)
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def _filtered(
+    stmt,
+    email: Optional[str] = None,
+    action: Optional[str] = None,
+    org: Optional[str] = None,
+    repo: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    if email:
+        stmt = stmt.where(AuditEntry.user_email == email)
+    if action:
+        stmt = stmt.where(AuditEntry.action == action)
+    if org:
+        stmt = stmt.where(AuditEntry.org == org)
+    if repo:
+        stmt = stmt.where(AuditEntry.repo == repo)
+    if since:
+        stmt = stmt.where(AuditEntry.timestamp >= _naive_utc(since))
+    if until:
+        stmt = stmt.where(AuditEntry.timestamp < _naive_utc(until))
+    return stmt
+
+def filtered_entries(
+    email: Optional[str] = None,
+    action: Optional[str] = None,
+    org: Optional[str] = None,
+    repo: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    stmt = _filtered(select(AuditEntry), email, action, org, repo, since, until)
+    return stmt.order_by(AuditEntry.timestamp.desc(), AuditEntry.id.desc())
+
+archive = SegmentStore()
+
+def _archive_match(
+    email: Optional[str] = None,
+    action: Optional[str] = None,
+    org: Optional[str] = None,
+    repo: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    before: Optional[tuple] = None,
+):
+    """The filtered_entries() conditions, applied to archived records."""
+    since = since and _naive_utc(since)
+    until = until and _naive_utc(until)
+
+    def match(record: dict) -> bool:
+        if (email and record["email"] != email) or (action and record["action"] != action):
+            return False
+        if (org and record["org"] != org) or (repo and record["repo"] != repo):
+            return False
+        if since or until or before:
+            timestamp = datetime.fromisoformat(record["timestamp"])
+            if (since and timestamp < since) or (until and timestamp >= until):
+                return False
+            if before and (timestamp, record["id"]) >= before:
+                return False
+        return True
+
+    return match
+
+async def archived_entries(
+    email: Optional[str] = None,
+    action: Optional[str] = None,
+    org: Optional[str] = None,
+    repo: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    before: Optional[tuple] = None,
+) -> AsyncIterator[dict]:
+    """
+    Matching archived records (with their `id`), newest first. Only segments
+    whose month and orgs overlap the query are opened, so queries for recent
+    entries never touch the archive.
+    """
+    match = _archive_match(email, action, org, repo, since, until, before)
+    for segment in archive.select(org, since and _naive_utc(since), until and _naive_utc(until)):
+        records = archive.read(segment, match)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(lambda: [r for _, r in zip(range(AUDIT_EXPORT_CHUNK), records)])
+                if not chunk:
+                    break
+                for record in chunk:
+                    yield record
+        finally:
+            records.close()
+
 async def query_audit_logs(
     email: Optional[str] = None,
     action: Optional[str] = None,
     org: Optional[str] = None,
     repo: Optional[str] = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
 ) -> List[dict]:
     async with SessionLocal() as session:
-        stmt = select(AuditEntry)
-
-        if email:
-            stmt = stmt.where(AuditEntry.user_email == email)
-        if action:
-            stmt = stmt.where(AuditEntry.action == action)
-        if org:
-            stmt = stmt.where(AuditEntry.org == org)
-        if repo:
-            stmt = stmt.where(AuditEntry.repo == repo)
-
-        stmt = stmt.order_by(AuditEntry.timestamp.desc()).limit(limit).offset(offset)
+        stmt = filtered_entries(email, action, org, repo, since, until).limit(limit).offset(offset)
         result = await session.execute(stmt)
-        return [entry_to_dict(e) for e in result.scalars().all()]
+        entries = [entry_to_dict(e) for e in result.scalars().all()]
+        if len(entries) == limit or not archive.select(org, since and _naive_utc(since), until and _naive_utc(until)):
+            return entries
+        # Archived months are all older than the database rows, so they continue the same ordering
+        hot = await session.scalar(
+            _filtered(select(func.count(AuditEntry.id)), email, action, org, repo, since, until)
+        )
+
+    skip = max(offset - hot, 0)
+    async for record in archived_entries(email, action, org, repo, since, until):
+        if skip:
+            skip -= 1
+            continue
+        record.pop("id")
+        entries.append(record)
+        if len(entries) == limit:
+            break
+    return entries
+
+def encode_cursor(timestamp: datetime, entry_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), entry_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        timestamp, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(entry_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid audit cursor: {cursor}") from e
+
+def _seek(stmt, before: Optional[tuple]):
+    """Rows after (timestamp, id) `before` in newest-first order."""
+    if before is None:
+        return stmt
+    timestamp, entry_id = before
+    return stmt.where(or_(
+        AuditEntry.timestamp < timestamp,
+        and_(AuditEntry.timestamp == timestamp, AuditEntry.id < entry_id),
+    ))
+
+async def _pages(stmt, chunk_size: int = AUDIT_EXPORT_CHUNK) -> AsyncIterator[list]:
+    """
+    Rows of `stmt` (which selects `id` and `timestamp`), newest first, a chunk
+    per short read transaction. Nothing stays open while the caller handles a
+    chunk, so a slow export client can't hold SQLite's lock against writers.
+    """
+    stmt = stmt.order_by(AuditEntry.timestamp.desc(), AuditEntry.id.desc()).limit(chunk_size)
+    before = None
+    while True:
+        async with SessionLocal() as session:
+            rows = (await session.execute(_seek(stmt, before))).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        before = (rows[-1].timestamp, rows[-1].id)
+
+async def query_audit_page(
+    email: Optional[str] = None,
+    action: Optional[str] = None,
+    org: Optional[str] = None,
+    repo: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    """
+    Keyset pagination: seek past the (timestamp, id) of the last row seen
+    instead of skipping rows with OFFSET, so every page costs the same.
+    """
+    before = decode_cursor(cursor) if cursor else None
+    stmt = _seek(filtered_entries(email, action, org, repo, since, until), before)
+
+    async with SessionLocal() as session:
+        # Fetch one extra row to know whether another page exists
+        result = await session.execute(stmt.limit(limit + 1))
+        rows = [{**entry_to_dict(e), "id": e.id} for e in result.scalars().all()]
+
+    if len(rows) <= limit:
+        async for record in archived_entries(email, action, org, repo, since, until, before):
+            rows.append(record)
+            if len(rows) > limit:
+                break
+
+    last = rows[limit - 1] if len(rows) > limit else None
+    next_cursor = encode_cursor(datetime.fromisoformat(last["timestamp"]), last["id"]) if last else None
+    for row in rows:
+        row.pop("id")
+    return {"entries": rows[:limit], "next_cursor": next_cursor}
 
 def entry_to_dict(entry: AuditEntry) -> dict:
     return {
@@ -78,3 +432,240 @@ def entry_to_dict(entry: AuditEntry) -> dict:
         "parameters": entry.parameters,
         "result": entry.result
     }
+
+EXPORT_COLUMNS = ("timestamp", "email", "action", "org", "repo", "parameters", "result")
+
+async def stream_audit_entries(
+    email: Optional[str] = None,
+    action: Optional[str] = None,
+    org: Optional[str] = None,
+    repo: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = AUDIT_EXPORT_CHUNK,
+) -> AsyncIterator[dict]:
+    """
+    Every matching entry, newest first, read `chunk_size` rows at a time
+    (each chunk its own keyset query) and then from the archive. Plain column
+    rows skip the ORM identity map, so memory stays flat however many rows match.
+    """
+    columns = select(
+        AuditEntry.id, AuditEntry.timestamp, AuditEntry.user_email, AuditEntry.action, AuditEntry.org,
+        AuditEntry.repo, AuditEntry.parameters, AuditEntry.result,
+    )
+    async for rows in _pages(_filtered(columns, email, action, org, repo, since, until), chunk_size):
+        for row in rows:
+            yield entry_to_dict(row)
+
+    async for record in archived_entries(email, action, org, repo, since, until):
+        record.pop("id")
+        yield record
+
+async def export_ndjson(entries: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for entry in entries:
+        yield json.dumps(entry) + "\n"
+
+async def export_csv(entries: AsyncIterator[dict], rows_per_chunk: int = 500) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    rows = 0
+    async for entry in entries:
+        writer.writerow(entry)
+        rows += 1
+        if rows % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# No "org": stats are always for the one org the caller administers
+STATS_DIMENSIONS = {
+    "action": AuditEntry.action,
+    "user": AuditEntry.user_email,
+    # Error results carry the message; bucket them so the groups stay bounded
+    "result": case((AuditEntry.result == "success", "success"), else_="error"),
+}
+STATS_BUCKETS = ("hour", "day", "week", "month")
+
+def _bucket(bucket: str, dialect: str):
+    if dialect == "postgresql":
+        return func.to_char(func.date_trunc(bucket, AuditEntry.timestamp), 'YYYY-MM-DD"T"HH24:MI:SS')
+    if bucket == "week":
+        # Monday of the row's week
+        return func.strftime("%Y-%m-%dT00:00:00", AuditEntry.timestamp, "weekday 0", "-6 days")
+    fmt = {"hour": "%Y-%m-%dT%H:00:00", "day": "%Y-%m-%dT00:00:00", "month": "%Y-%m-01T00:00:00"}[bucket]
+    return func.strftime(fmt, AuditEntry.timestamp)
+
+async def audit_stats(
+    org: str,
+    group_by: List[str],
+    bucket: str = "day",
+    email: Optional[str] = None,
+    action: Optional[str] = None,
+    repo: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[dict]:
+    """
+    Entry counts per time bucket and `group_by` dimensions, grouped by the
+    database. Covers the months still in the database, not archived ones.
+    """
+    unknown = [d for d in group_by if d not in STATS_DIMENSIONS]
+    if unknown or bucket not in STATS_BUCKETS:
+        raise ValueError(f"Unknown stats grouping: {', '.join(unknown) or bucket}")
+
+    bucket_col = _bucket(bucket, engine.dialect.name).label("bucket")
+    dims = [STATS_DIMENSIONS[d].label(d) for d in group_by]
+    stmt = _filtered(select(bucket_col, *dims, func.count().label("count")), email, action, org, repo, since, until)
+    stmt = stmt.group_by(bucket_col, *dims).order_by(bucket_col, *dims)
+
+    async with SessionLocal() as session:
+        result = await session.execute(stmt)
+        return [dict(row._mapping) for row in result]
+
+def archived_before() -> Optional[str]:
+    """Where the database part of the log starts when older months have been archived, else None."""
+    segments = archive.segments()
+    return segments[0]["end"] if segments else None
+
+class AuditRetention:
+    """
+    Periodic housekeeping: deletes entries past AUDIT_RETENTION_DAYS, moves
+    closed months older than AUDIT_HOT_MONTHS into archive segments when
+    AUDIT_ARCHIVE_DIR is set, and compacts the database after a month was
+    archived. One worker at a time does the work.
+    """
+
+    def __init__(
+        self,
+        hot_months: int = AUDIT_HOT_MONTHS,
+        retention_days: int = AUDIT_RETENTION_DAYS,
+        interval: int = AUDIT_RETENTION_INTERVAL,
+    ):
+        self.hot_months = hot_months if archive.path else 0
+        self.retention_days = retention_days
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if (self.hot_months or self.retention_days) and self.task is None:
+            self.task = asyncio.create_task(self._loop(), name="audit-retention")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Audit retention pass failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.utcnow()
+        with archive.exclusive() as owner:
+            if not owner:
+                return {"expired": 0, "archived": 0}
+            # Expire first so nothing is archived only to be deleted straight away
+            expired = await self._expire(now) if self.retention_days else 0
+            archived = await self._archive(now) if self.hot_months else 0
+            # VACUUM locks out the audit writer; expired rows leave free pages that later inserts reuse
+            if archived:
+                await self._compact()
+        return {"expired": expired, "archived": archived}
+
+    async def _expire(self, now: datetime) -> int:
+        cutoff = now - timedelta(days=self.retention_days)
+        async with SessionLocal() as session:
+            result = await session.execute(delete(AuditEntry).where(AuditEntry.timestamp < cutoff))
+            await session.commit()
+        # Segments go whole, once their entire month is past the window
+        segments = await asyncio.to_thread(archive.drop_before, cutoff)
+        archived = sum(s["rows"] for s in segments)
+        AUDIT_EXPIRED.labels(source="database").inc(result.rowcount)
+        AUDIT_EXPIRED.labels(source="archive").inc(archived)
+        return result.rowcount + archived
+
+    async def _archive(self, now: datetime) -> int:
+        cutoff = add_months(month_start(now), 1 - self.hot_months)
+        async with SessionLocal() as session:
+            oldest = await session.scalar(select(func.min(AuditEntry.timestamp)).where(AuditEntry.timestamp < cutoff))
+        moved = 0
+        month = month_start(oldest) if oldest else cutoff
+        while month < cutoff:
+            moved += await self._archive_month(month)
+            month = add_months(month, 1)
+        return moved
+
+    async def _archive_month(self, month: datetime) -> int:
+        in_month = and_(AuditEntry.timestamp >= month, AuditEntry.timestamp < add_months(month, 1))
+        stmt = select(
+            AuditEntry.id, AuditEntry.timestamp, AuditEntry.user_email, AuditEntry.action, AuditEntry.org,
+            AuditEntry.repo, AuditEntry.parameters, AuditEntry.result,
+        ).where(in_month)
+
+        segment = archive.get(month)
+        if segment is None:
+            writer = await asyncio.to_thread(archive.open, month)
+            try:
+                # Short reads per chunk, so the audit writer isn't locked out while the file is written
+                async for rows in _pages(stmt):
+                    await asyncio.to_thread(writer.write, [{**entry_to_dict(r), "id": r.id} for r in rows])
+            except BaseException:
+                await asyncio.to_thread(writer.abort)
+                raise
+            if not writer.rows:
+                await asyncio.to_thread(writer.abort)
+                return 0
+            segment = await asyncio.to_thread(writer.commit)
+        else:
+            # Rows up to the segment's max id are already in it (an earlier pass stopped before deleting
+            # them); later ones were flushed or resumed after the month was archived and are merged in
+            covered = await asyncio.to_thread(archive.max_id, segment)
+            async with SessionLocal() as session:
+                result = await session.execute(
+                    stmt.where(AuditEntry.id > covered).order_by(AuditEntry.timestamp.desc(), AuditEntry.id.desc())
+                )
+                late = [{**entry_to_dict(r), "id": r.id} for r in result]
+            segment = await asyncio.to_thread(self._merge, month, segment, late) if late else {**segment, "max_id": covered}
+
+        async with SessionLocal() as session:
+            result = await session.execute(delete(AuditEntry).where(in_month, AuditEntry.id <= segment["max_id"]))
+            await session.commit()
+        AUDIT_ARCHIVED.inc(result.rowcount)
+        logger.info("Archived %d audit entries from %s", result.rowcount, f"{month:%Y-%m}")
+        return result.rowcount
+
+    @staticmethod
+    def _merge(month: datetime, segment: dict, late: List[dict]) -> dict:
+        """Rewrite the month's segment with `late` records merged in, keeping it newest first."""
+        order = lambda record: (datetime.fromisoformat(record["timestamp"]), record["id"])
+        writer = archive.open(month)
+        try:
+            merged = heapq.merge(archive.read(segment, lambda record: True), late, key=order, reverse=True)
+            while chunk := list(itertools.islice(merged, AUDIT_EXPORT_CHUNK)):
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    async def _compact(self):
+        """Return the space of deleted rows to the filesystem."""
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if engine.dialect.name == "sqlite":
+                await conn.exec_driver_sql("VACUUM")
+            elif engine.dialect.name == "postgresql":
+                await conn.exec_driver_sql("VACUUM ANALYZE audit_log")
+
+audit_retention = AuditRetention()
@@ -0,0 +1,169 @@
+"""
+Closed months of the audit log, moved out of the database into gzip NDJSON
+segment files. A segment is written once and never modified; manifest.json
+lists each month with its time range and orgs so readers open only the
+segments a query can match.
+"""
+import fcntl
+import gzip
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+# Unset disables archiving. Replicas sharing AUDIT_DB_URL must share this directory too,
+# otherwise one of them moves rows to a disk the others cannot read.
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR")
+
+MANIFEST = "manifest.json"
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+class SegmentWriter:
+    """One month's segment being written; invisible to readers until commit()."""
+
+    def __init__(self, store: "SegmentStore", month: datetime):
+        self.store = store
+        self.month = month
+        self.name = f"audit-{month:%Y-%m}.ndjson.gz"
+        self.tmp_path = os.path.join(store.path, self.name + ".tmp")
+        self.rows = 0
+        self.max_id = 0
+        self.orgs = set()
+        self._raw = open(self.tmp_path, "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb")
+
+    def write(self, records: List[dict]):
+        for record in records:
+            self._file.write((json.dumps(record) + "\n").encode("utf-8"))
+            self.orgs.add(record["org"])
+            self.max_id = max(self.max_id, record["id"])
+        self.rows += len(records)
+
+    def commit(self) -> dict:
+        self._file.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(self.tmp_path, os.path.join(self.store.path, self.name))
+        segment = {
+            "month": f"{self.month:%Y-%m}",
+            "file": self.name,
+            "start": self.month.isoformat(),
+            "end": add_months(self.month, 1).isoformat(),
+            "rows": self.rows,
+            # Rows of the month up to this id are in the segment; later ones arrived after it was written
+            "max_id": self.max_id,
+            "orgs": sorted(o for o in self.orgs if o),
+        }
+        self.store.save([s for s in self.store.segments() if s["month"] != segment["month"]] + [segment])
+        return segment
+
+    def abort(self):
+        self._file.close()
+        self._raw.close()
+        os.unlink(self.tmp_path)
+
+
+class SegmentStore:
+    def __init__(self, path: Optional[str] = AUDIT_ARCHIVE_DIR):
+        self.path = path
+        self._segments: List[dict] = []
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def segments(self) -> List[dict]:
+        """Manifest entries, newest month first; re-read when another worker has replaced the manifest."""
+        if not self.path:
+            return []
+        try:
+            mtime = os.stat(os.path.join(self.path, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            if mtime != self._mtime:
+                with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+                    self._segments = json.load(f)["segments"]
+                self._mtime = mtime
+            return self._segments
+
+    def save(self, segments: List[dict]):
+        segments = sorted(segments, key=lambda s: s["month"], reverse=True)
+        tmp = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segments": segments}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+    def get(self, month: datetime) -> Optional[dict]:
+        return next((s for s in self.segments() if s["month"] == f"{month:%Y-%m}"), None)
+
+    def has(self, month: datetime) -> bool:
+        return self.get(month) is not None
+
+    def max_id(self, segment: dict) -> int:
+        if "max_id" in segment:
+            return segment["max_id"]
+        return max((record["id"] for record in self.read(segment, lambda record: True)), default=0)
+
+    @contextmanager
+    def exclusive(self):
+        """Yields True for the one worker allowed to archive right now, False for the others."""
+        if not self.path:
+            yield True
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def open(self, month: datetime) -> SegmentWriter:
+        return SegmentWriter(self, month)
+
+    def select(self, org: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[dict]:
+        """Segments that can hold entries for `org` in [since, until), newest first."""
+        return [
+            s for s in self.segments()
+            if (not org or org in s["orgs"])
+            and (since is None or datetime.fromisoformat(s["end"]) > since)
+            and (until is None or datetime.fromisoformat(s["start"]) < until)
+        ]
+
+    def read(self, segment: dict, match: Callable[[dict], bool]) -> Iterator[dict]:
+        with gzip.open(os.path.join(self.path, segment["file"]), "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if match(record):
+                    yield record
+
+    def drop_before(self, cutoff: datetime) -> List[dict]:
+        """Delete segments that end on or before `cutoff`; returns them."""
+        segments = self.segments()
+        expired = [s for s in segments if datetime.fromisoformat(s["end"]) <= cutoff]
+        if expired:
+            # Manifest first, so readers never see a segment whose file is gone
+            self.save([s for s in segments if s not in expired])
+            for s in expired:
+                try:
+                    os.unlink(os.path.join(self.path, s["file"]))
+                except FileNotFoundError:
+                    pass
+        return expired
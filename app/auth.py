@@ -1,21 +1,41 @@
 import os
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Optional
 
 from fastapi import Request, Response, Depends, HTTPException
 from fastapi.responses import RedirectResponse
-from authlib.integrations.starlette_client import OAuth
 from jose import jwt, JWTError
 
+if TYPE_CHECKING:
+    from authlib.integrations.starlette_client import OAuth
+
 # --- Config ---
 
-oauth = OAuth()
-oauth.register(
-    name='azure',
-    client_id=os.environ["AZURE_AD_CLIENT_ID"],
-    client_secret=os.environ["AZURE_AD_CLIENT_SECRET"],
-    server_metadata_url=f'https://login.microsoftonline.com/{os.environ["AZURE_AD_TENANT_ID"]}/v2.0/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'}
-)
+_oauth: Optional["OAuth"] = None
+
+def get_oauth() -> "OAuth":
+    """Register the Azure AD client on first use; authlib is only imported by servers that log users in."""
+    global _oauth
+    if _oauth is None:
+        from authlib.integrations.starlette_client import OAuth
+
+        oauth = OAuth()
+        oauth.register(
+            name='azure',
+            client_id=os.environ["AZURE_AD_CLIENT_ID"],
+            client_secret=os.environ["AZURE_AD_CLIENT_SECRET"],
+            server_metadata_url=f'https://login.microsoftonline.com/{os.environ["AZURE_AD_TENANT_ID"]}/v2.0/.well-known/openid-configuration',
+            client_kwargs={'scope': 'openid email profile'}
+        )
+        _oauth = oauth
+    return _oauth
+
+async def prefetch_oidc_metadata():
+    """Load the discovery document and signing keys so the first login doesn't wait on them."""
+    azure = get_oauth().azure
+    metadata = await azure.load_server_metadata()
+    await azure.fetch_jwk_set()
+    return metadata
 
 JWT_SECRET = os.environ["JWT_SECRET"]
 JWT_ALGORITHM = "HS256"
@@ -44,15 +64,22 @@ async def get_current_user(request: Request):
     except JWTError:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
 
+async def get_mcp_user(ctx):
+    # MCP tool calls carry the same session cookie as the HTTP transport they arrive on
+    request = getattr(ctx.request_context, "request", None)
+    if request is None:
+        raise HTTPException(status_code=401, detail="Missing session token")
+    return await get_current_user(request)
+
 # --- Routes ---
 
 async def login(request: Request):
     redirect_uri = request.url_for("auth_callback")
-    return await oauth.azure.authorize_redirect(request, redirect_uri)
+    return await get_oauth().azure.authorize_redirect(request, redirect_uri)
 
 async def auth_callback(request: Request):
-    token = await oauth.azure.authorize_access_token(request)
-    userinfo = await oauth.azure.parse_id_token(request, token)
+    token = await get_oauth().azure.authorize_access_token(request)
+    userinfo = await get_oauth().azure.parse_id_token(request, token)
     jwt_token = create_jwt_token(userinfo)
     response = RedirectResponse(url="/")
     response.set_cookie(
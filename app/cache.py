@@ -0,0 +1,305 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, ContextManager, Optional
+
+from cachetools import LRUCache
+from prometheus_client import Counter, Histogram
+
+# Shared second level for every worker on the host ("none" keeps caches in process only)
+CACHE_L2_URL = os.getenv("CACHE_L2_URL", "sqlite:///./cache.db")
+# How long a worker trusts its in-process copy before checking L2 for a newer one
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "5"))
+CACHE_L1_SIZE = int(os.getenv("CACHE_L1_SIZE", "1024"))
+# A filler that holds its lease longer than this is presumed dead
+CACHE_FILL_TIMEOUT = float(os.getenv("CACHE_FILL_TIMEOUT", "30"))
+
+CACHE_REQUESTS = Counter(
+    "mcp_cache_requests_total",
+    "Tiered cache lookups (hit = L1, l2_hit = filled from the shared tier, coalesced = waited for another filler)",
+    ["cache", "result"],
+)
+CACHE_FILL_SECONDS = Histogram("mcp_cache_fill_seconds", "Time spent loading a cache entry from its source", ["cache"])
+
+logger = logging.getLogger(__name__)
+
+
+class NullStore:
+    """L2 that stores nothing; every lease is granted."""
+
+    def get(self, namespace: str, key: str):
+        return None
+
+    def version(self, namespace: str, key: str):
+        return None
+
+    def put(self, namespace: str, key: str, value: str, stored_at: float, version: str):
+        pass
+
+    def delete(self, namespace: str, key: str):
+        pass
+
+    def entries(self, namespace: str, since: float) -> list:
+        return []
+
+    def acquire(self, lease: str, owner: str, now: float, timeout: float) -> bool:
+        return True
+
+    def release(self, lease: str, owner: str):
+        pass
+
+
+class SQLiteStore:
+    """L2 in a SQLite file in WAL mode; leases make fills single-flight across processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _execute(self, sql: str, params=()) -> list:
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=5)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache_entries "
+                    "(namespace TEXT, key TEXT, value TEXT, stored_at REAL, version TEXT, PRIMARY KEY (namespace, key))"
+                )
+                if "version" not in {row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")}:
+                    conn.execute("ALTER TABLE cache_entries ADD COLUMN version TEXT")
+                conn.execute("CREATE TABLE IF NOT EXISTS cache_leases (lease TEXT PRIMARY KEY, owner TEXT, expires REAL)")
+                self._conn = conn
+            return self._conn.execute(sql, params).fetchall()
+
+    def get(self, namespace: str, key: str):
+        rows = self._execute(
+            "SELECT value, stored_at, version FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+        return rows[0] if rows else None
+
+    def version(self, namespace: str, key: str):
+        # Checked on every L1 expiry, so it must not read the (possibly multi-MB) value
+        rows = self._execute("SELECT version FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+        return rows[0][0] if rows else None
+
+    def put(self, namespace: str, key: str, value: str, stored_at: float, version: str):
+        self._execute(
+            "INSERT INTO cache_entries (namespace, key, value, stored_at, version) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(namespace, key) DO UPDATE SET "
+            "value = excluded.value, stored_at = excluded.stored_at, version = excluded.version",
+            (namespace, key, value, stored_at, version),
+        )
+
+    def delete(self, namespace: str, key: str):
+        self._execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def entries(self, namespace: str, since: float) -> list:
+        return self._execute(
+            "SELECT key, value, stored_at, version FROM cache_entries WHERE namespace = ? AND stored_at >= ?",
+            (namespace, since),
+        )
+
+    def acquire(self, lease: str, owner: str, now: float, timeout: float) -> bool:
+        return bool(self._execute(
+            "INSERT INTO cache_leases (lease, owner, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(lease) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE cache_leases.expires < ? RETURNING owner",
+            (lease, owner, now + timeout, now),
+        ))
+
+    def release(self, lease: str, owner: str):
+        self._execute("DELETE FROM cache_leases WHERE lease = ? AND owner = ?", (lease, owner))
+
+
+def make_store(url: str = CACHE_L2_URL):
+    if url == "none":
+        return NullStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported CACHE_L2_URL: {url}")
+
+
+shared_store = make_store()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    stored_at: float  # when the value was loaded from its source; patches keep it
+    checked_at: float
+    version: str = None  # changes on every write, patches included
+
+
+class TieredCache:
+    """
+    In-process L1 in front of a store shared by all workers. Entries are fresh
+    for `ttl` seconds after they were loaded by any worker, then served stale
+    for up to `stale_ttl` more while one background fill replaces them. Only
+    one thread per process and one process per host loads a given key at a time.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: Optional[float] = None,
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda data: data,
+        store=None,
+        l1_ttl: float = CACHE_L1_TTL,
+        maxsize: int = CACHE_L1_SIZE,
+        background: Callable[[], ContextManager] = nullcontext,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.encode = encode
+        self.decode = decode
+        self.store = shared_store if store is None else store
+        self.l1_ttl = l1_ttl
+        self.background = background
+        self._l1: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._refreshing: set = set()
+        self._owner = uuid.uuid4().hex
+        caches[name] = self
+
+    def get(self, key: str, loader: Callable[[], Any]):
+        now = time.time()
+        entry, source = self._lookup(key, now)
+        if entry is not None:
+            age = now - entry.stored_at
+            if age < self.ttl:
+                CACHE_REQUESTS.labels(cache=self.name, result=source).inc()
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                CACHE_REQUESTS.labels(cache=self.name, result="stale").inc()
+                self._revalidate(key, loader)
+                return entry.value
+        return self._fill(key, loader)
+
+    def peek(self, key: str):
+        """The current value if one is cached (even stale), without loading it."""
+        entry, _ = self._lookup(key, time.time())
+        return entry.value if entry is not None else None
+
+    def set(self, key: str, value, stored_at: Optional[float] = None):
+        now = time.time()
+        stored_at = now if stored_at is None else stored_at
+        version = uuid.uuid4().hex
+        self.store.put(self.name, key, json.dumps(self.encode(value)), stored_at, version)
+        with self._lock:
+            self._l1[key] = _Entry(value, stored_at, now, version)
+
+    def replace(self, key: str, value):
+        """
+        Store a patched value (e.g. from a webhook) but keep the entry's age,
+        so the TTL refresh from the source still runs on schedule.
+        """
+        entry, _ = self._lookup(key, time.time())
+        self.set(key, value, stored_at=entry.stored_at if entry is not None else None)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._l1.pop(key, None)
+        self.store.delete(self.name, key)
+
+    def refresh(self, key: str, loader: Callable[[], Any]):
+        """Reload in the background even if the entry is still fresh."""
+        self._revalidate(key, loader, force=True)
+
+    def warm(self) -> int:
+        """Load every entry another worker (or a previous run) left in L2 that is still servable."""
+        now = time.time()
+        rows = self.store.entries(self.name, now - self.ttl - self.stale_ttl)
+        for key, *row in rows:
+            self._load_row(key, row, now)
+        return len(rows)
+
+    def _lookup(self, key: str, now: float):
+        with self._lock:
+            entry = self._l1.get(key)
+        if entry is not None and (now - entry.checked_at < self.l1_ttl or isinstance(self.store, NullStore)):
+            return entry, "hit"
+
+        if entry is not None and entry.version is not None and self.store.version(self.name, key) == entry.version:
+            entry.checked_at = now
+            return entry, "hit"
+        row = self.store.get(self.name, key)
+        if row is None:
+            return None, "miss"
+        return self._load_row(key, row, now), "l2_hit"
+
+    def _load_row(self, key: str, row: tuple, now: float) -> _Entry:
+        value, stored_at, version = row
+        entry = _Entry(self.decode(json.loads(value)), stored_at, now, version)
+        with self._lock:
+            self._l1[key] = entry
+        return entry
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _fill(self, key: str, loader: Callable[[], Any], force: bool = False):
+        with self._key_lock(key):
+            started = time.time()
+            if not force:
+                # Another thread may have filled it while we waited for the lock
+                entry, _ = self._lookup(key, started)
+                if entry is not None and started - entry.stored_at < self.ttl:
+                    CACHE_REQUESTS.labels(cache=self.name, result="coalesced").inc()
+                    return entry.value
+
+            lease = f"{self.name}:{key}"
+            while not self.store.acquire(lease, self._owner, time.time(), CACHE_FILL_TIMEOUT):
+                # Another worker is loading it; use its result once it lands in L2
+                time.sleep(0.05)
+                row = self.store.get(self.name, key)
+                if row is not None and row[1] >= started:
+                    CACHE_REQUESTS.labels(cache=self.name, result="coalesced").inc()
+                    return self._load_row(key, row, time.time()).value
+
+            CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+            try:
+                with CACHE_FILL_SECONDS.labels(cache=self.name).time():
+                    value = loader()
+                self.set(key, value)
+            finally:
+                self.store.release(lease, self._owner)
+            return value
+
+    def _revalidate(self, key: str, loader: Callable[[], Any], force: bool = False):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with self.background():
+                    self._fill(key, loader, force=force)
+            except Exception:
+                logger.warning("Background fill of %s[%s] failed; serving the previous value", self.name, key, exc_info=True)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"cache-{self.name}", daemon=True).start()
+
+
+# Every TieredCache by name, for warm start
+caches: dict[str, TieredCache] = {}
+
+
+def warm_caches() -> dict:
+    return {name: cache.warm() for name, cache in caches.items()}
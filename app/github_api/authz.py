@@ -1,38 +1,51 @@
-from github import Github, GithubIntegration, GithubException
+from functools import lru_cache
 import base64
 import os
 
-GITHUB_APP_ID = int(os.environ["GITHUB_APP_ID"])
-GITHUB_PRIVATE_KEY = base64.b64decode(os.environ["GITHUB_PRIVATE_KEY_BASE64"]).decode("utf-8")
+from github import Github, GithubException, GithubIntegration
 
-integration = GithubIntegration(GITHUB_APP_ID, GITHUB_PRIVATE_KEY)
+from . import transport
+from .tokens import InstallationTokenManager, UNTHROTTLED
+from .installations import InstallationNotFound
+from .membership import get_snapshot
+
+# Point at GitHub Enterprise Server, or a local stand-in such as benchmarks/fake_github.py
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+
+@lru_cache(maxsize=None)
+def get_integration() -> GithubIntegration:
+    """Read the App credentials and build the integration on first use, not at import."""
+    app_id = int(os.environ["GITHUB_APP_ID"])
+    private_key = base64.b64decode(os.environ["GITHUB_PRIVATE_KEY_BASE64"]).decode("utf-8")
+    transport.install()
+    return GithubIntegration(app_id, private_key, base_url=GITHUB_API_URL, **UNTHROTTLED)
+
+tokens = InstallationTokenManager(integration_factory=get_integration, base_url=GITHUB_API_URL)
 
 def get_app_client(org: str, repo: str = None) -> Github:
     try:
-        installation = integration.get_installation(org, repo) if repo else integration.get_organization_installation(org)
-        access_token = integration.get_access_token(installation.id).token
-        return Github(access_token)
+        return tokens.get_client(org, repo)
+    except InstallationNotFound:
+        raise
     except GithubException as e:
-        raise raise GithubException(f"GitHub App installation not found for org={org}, repo={repo}: {e}")
+        raise GithubException(e.status, f"GitHub App installation not found for org={org}, repo={repo}: {e.data}", e.headers) from e
+
+def get_membership_snapshot(org: str):
+    # The snapshot outlives any one client, so it always asks for a fresh (cached) one
+    return get_snapshot(org, lambda: get_app_client(org))
 
 def check_team_membership(client: Github, org: str, team_slug: str, username: str) -> bool:
     try:
-        team = client.get_organization(org).get_team_by_slug(team_slug)
-        return team.has_in_members(username)
+        return get_membership_snapshot(org).is_member(team_slug, username)
     except GithubException:
         return False
 
 def is_org_admin(client: Github, org: str, username: str, allowed_teams=None) -> bool:
     allowed_teams = allowed_teams or ["owners", "mcp-auditors"]
-    gh_org = client.get_organization(org)
-
-    for team_slug in allowed_teams:
-        try:
-            team = gh_org.get_team_by_slug(team_slug)
-            if team.has_in_members(username):
-                return True
-        except GithubException:
-            continue
-    return False
-
-__all__ = ["get_app_client", "check_team_membership", "is_org_admin", "integration"]
+    try:
+        teams = get_membership_snapshot(org).teams_for(username)
+    except GithubException:
+        return False
+    return not teams.isdisjoint(allowed_teams)
+
+__all__ = ["get_app_client", "get_membership_snapshot", "check_team_membership", "is_org_admin", "get_integration", "tokens"]
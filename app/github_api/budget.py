@@ -0,0 +1,205 @@
+import contextvars
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Per-installation coordination of GitHub traffic. Mutations may spend the whole
+# rate limit; reads and background refreshes must leave a reserve behind them.
+GITHUB_MAX_INFLIGHT = int(os.getenv("GITHUB_MAX_INFLIGHT", "8"))
+GITHUB_MUTATION_INTERVAL = float(os.getenv("GITHUB_MUTATION_INTERVAL", "1.0"))
+GITHUB_RESERVE_READS = int(os.getenv("GITHUB_RESERVE_READS", "100"))
+GITHUB_RESERVE_BACKGROUND = int(os.getenv("GITHUB_RESERVE_BACKGROUND", "500"))
+
+
+class Lane(IntEnum):
+    MUTATION = 0
+    READ = 1
+    BACKGROUND = 2
+
+
+RATE_REMAINING = Gauge("mcp_github_ratelimit_remaining", "Remaining GitHub rate limit", ["installation"])
+RATE_RESET = Gauge("mcp_github_ratelimit_reset_timestamp", "When the GitHub rate limit resets", ["installation"])
+QUEUE_DEPTH = Gauge("mcp_github_queue_depth", "GitHub calls waiting for budget", ["lane"])
+QUEUE_WAIT = Histogram("mcp_github_queue_wait_seconds", "Time GitHub calls waited for budget", ["lane"])
+SECONDARY_LIMITS = Counter("mcp_github_secondary_limits_total", "Responses that asked us to back off", ["installation"])
+
+_lane = contextvars.ContextVar("github_lane", default=Lane.READ)
+# Set by run_github, so the budget learns which installation serves each org
+_org = contextvars.ContextVar("github_org", default=None)
+
+
+@contextmanager
+def github_lane(lane: Lane):
+    """Tag GitHub calls made in this context (and executor calls it spawns) with a lane."""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> Lane:
+    return _lane.get()
+
+
+def set_current_org(org: str):
+    _org.set(org)
+
+
+class InstallationBudget:
+    def __init__(self):
+        self.remaining = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+        self.last_mutation = 0.0
+        self.inflight = 0
+        self.waiters: dict[int, tuple] = {}
+
+
+class BudgetScheduler:
+    def __init__(
+        self,
+        max_inflight: int = GITHUB_MAX_INFLIGHT,
+        mutation_interval: float = GITHUB_MUTATION_INTERVAL,
+        reserves: dict = None,
+    ):
+        self.max_inflight = max_inflight
+        self.mutation_interval = mutation_interval
+        self.reserves = reserves or {
+            Lane.MUTATION: 0,
+            Lane.READ: GITHUB_RESERVE_READS,
+            Lane.BACKGROUND: GITHUB_RESERVE_BACKGROUND,
+        }
+        self._budgets: dict[str, InstallationBudget] = {}
+        self._org_keys: dict[str, str] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    def _budget(self, key: str) -> InstallationBudget:
+        if key not in self._budgets:
+            self._budgets[key] = InstallationBudget()
+        return self._budgets[key]
+
+    def _delay(self, budget: InstallationBudget, lane: Lane, mutation: bool, now: float) -> float:
+        if now < budget.blocked_until:
+            return budget.blocked_until - now
+        if budget.remaining is not None and now < budget.reset_at and budget.remaining <= self.reserves[lane]:
+            return budget.reset_at - now
+        if mutation and now - budget.last_mutation < self.mutation_interval:
+            return self.mutation_interval - (now - budget.last_mutation)
+        return 0.0
+
+    def _may_run(self, budget: InstallationBudget, ticket: int, now: float) -> float:
+        """0 when this waiter may go now, otherwise how long to wait before re-checking."""
+        lane, mutation = budget.waiters[ticket]
+        delay = self._delay(budget, lane, mutation, now)
+        if delay > 0:
+            return delay
+        if budget.inflight >= self.max_inflight:
+            return 1.0
+        # Yield to any higher-priority (or older, same-lane) waiter that could run right now
+        for other, (other_lane, other_mutation) in budget.waiters.items():
+            if (other_lane, other) < (lane, ticket) and self._delay(budget, other_lane, other_mutation, now) <= 0:
+                return 0.05
+        return 0.0
+
+    def admission_delay(self, org: str, lane: Lane) -> float:
+        """
+        How long a call for `org` in `lane` would wait for rate-limit budget.
+        Checked before the call takes an executor thread and org slot, so a
+        read waiting for the reset doesn't hold either.
+        """
+        with self._cond:
+            key = self._org_keys.get(org.lower())
+            if key is None:
+                return 0.0
+            return self._delay(self._budget(key), lane, False, time.time())
+
+    @contextmanager
+    def slot(self, key: str, verb: str):
+        lane = current_lane()
+        mutation = verb not in ("GET", "HEAD")
+        started = time.monotonic()
+        org = _org.get()
+        with self._cond:
+            if org and key.startswith("installation:"):
+                self._org_keys[org.lower()] = key
+            budget = self._budget(key)
+            ticket = next(self._seq)
+            budget.waiters[ticket] = (lane, mutation)
+            QUEUE_DEPTH.labels(lane=lane.name.lower()).inc()
+            try:
+                while True:
+                    wait = self._may_run(budget, ticket, time.time())
+                    if wait <= 0:
+                        break
+                    self._cond.wait(timeout=min(wait, 1.0))
+            finally:
+                del budget.waiters[ticket]
+                QUEUE_DEPTH.labels(lane=lane.name.lower()).dec()
+            budget.inflight += 1
+            if mutation:
+                budget.last_mutation = time.time()
+            if budget.remaining is not None:
+                budget.remaining -= 1
+        QUEUE_WAIT.labels(lane=lane.name.lower()).observe(time.monotonic() - started)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                budget.inflight -= 1
+                self._cond.notify_all()
+
+    def observe(self, key: str, status: int, headers, counted: bool = True):
+        """
+        Update the budget from X-RateLimit-* and Retry-After response headers.
+        A call that wasn't `counted` (a 304) gets back the unit its slot took
+        when GitHub didn't report the remaining budget itself.
+        """
+        headers = {k.lower(): v for k, v in dict(headers).items()}
+        now = time.time()
+        with self._cond:
+            budget = self._budget(key)
+            if not counted and "x-ratelimit-remaining" not in headers and budget.remaining is not None:
+                budget.remaining += 1
+            if "x-ratelimit-remaining" in headers:
+                budget.remaining = int(headers["x-ratelimit-remaining"])
+                RATE_REMAINING.labels(installation=key).set(budget.remaining)
+            if "x-ratelimit-reset" in headers:
+                budget.reset_at = float(headers["x-ratelimit-reset"])
+                RATE_RESET.labels(installation=key).set(budget.reset_at)
+            # A plain 403 is usually a permission error; only back off when GitHub says so
+            limited = True
+            if status in (403, 429) and "retry-after" in headers:
+                budget.blocked_until = now + float(headers["retry-after"])
+            elif status in (403, 429) and budget.remaining == 0:
+                budget.blocked_until = budget.reset_at
+            elif status == 429:
+                budget.blocked_until = now + 60  # GitHub asks for at least a minute without a hint
+            else:
+                limited = False
+            if limited:
+                SECONDARY_LIMITS.labels(installation=key).inc()
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                key: {
+                    "remaining": b.remaining,
+                    "reset_at": b.reset_at,
+                    "blocked_until": b.blocked_until,
+                    "inflight": b.inflight,
+                    "waiting": len(b.waiters),
+                }
+                for key, b in self._budgets.items()
+            }
+
+
+scheduler = BudgetScheduler()
@@ -1,38 +1,139 @@
+import asyncio
+import os
+from collections import defaultdict
+from typing import List
+
 from .repo_ops import create_repo, delete_repo, create_issue
-from .secret_ops import replace_secret, delete_secret
+from .secret_ops import replace_secret, rotate_secret, replace_org_secret, delete_secret
 from .team_ops import add_user_to_team, remove_user_from_team
 from .authz import get_app_client, check_team_membership
-from .policy import enforce_policy
+from .executor import run_github
+from .mutations import mutation_scheduler, superseded_by
+from .budget import Lane, github_lane
+from .policy import enforce_policy, DEFAULT_TEAM
 from ..models import ActionRequest
+from ..tracing import span, known_actions
+
+# Concurrent actions per (org, repo) group in a batch
+GITHUB_BATCH_CONCURRENCY = int(os.getenv("GITHUB_BATCH_CONCURRENCY", "4"))
 
 class UnauthorizedError(Exception): pass
 
+dispatch_table = {
+    "create_repo": create_repo,
+    "delete_repo": delete_repo,
+    "replace_secret": replace_secret,
+    "rotate_secret": rotate_secret,
+    "replace_org_secret": replace_org_secret,
+    "delete_secret": delete_secret,
+    "add_user_to_team": add_user_to_team,
+    "remove_user_from_team": remove_user_from_team,
+}
+
+known_actions.update(dispatch_table)
+
+def get_target(gh, org: str, repo: str = None):
+    return gh.get_repo(f"{org}/{repo}") if repo else gh.get_organization(org)
+
 async def perform_github_action(action: ActionRequest, user: dict):
     org = action.org
     repo = action.repo
     action_type = action.action
-    params = action.parameters or {}
+
+    if action_type not in dispatch_table:
+        raise Exception(f"Unknown action: {action_type}")
 
     # Normalize & enhance request via policy rules
-    cleaned_action = enforce_policy(action, user)
+    with span("policy", action_type, org):
+        cleaned_action = enforce_policy(action, user)
 
-    gh = get_app_client(org, repo if repo else None)
+    # Every GitHub round-trip below is blocking, so it runs off the event loop,
+    # and it goes ahead of identity reads and background refreshes for rate-limit budget
+    with github_lane(Lane.MUTATION):
+        with span("token", action_type, org):
+            gh = await run_github(org, get_app_client, org, repo if repo else None)
 
-    if not check_team_membership(gh, org, cleaned_action.parameters.get("team", "infrastructure-admins"), user["email"].split("@")[0]):
-        raise UnauthorizedError("User not in required team")
+        team = cleaned_action.parameters.get("team", "infrastructure-admins")
+        with span("team_check", action_type, org):
+            allowed = await run_github(org, check_team_membership, gh, org, team, user["email"].split("@")[0])
+        if not allowed:
+            raise UnauthorizedError("User not in required team")
 
-    dispatch_table = {
-        "create_repo": create_repo,
-        "delete_repo": delete_repo,
-        "replace_secret": replace_secret,
-        "delete_secret": delete_secret,
-        "add_user_to_team": add_user_to_team,
-        "remove_user_from_team": remove_user_from_team,
-    }
+        with span("target", action_type, org):
+            target = await run_github(org, get_target, gh, org, repo)
+        with span("op", action_type, org):
+            return await run_mutation(org, repo, action_type, target, cleaned_action.parameters)
 
+async def run_mutation(org: str, repo: str, action_type: str, target, params: dict):
+    """Run the write through the per-repo/team scheduler, so it is ordered (and possibly coalesced) with others."""
+    op = dispatch_table[action_type]
+    if asyncio.iscoroutinefunction(op):
+        # Ops that fan out make their own run_github calls
+        call = lambda: op(target, params)
+    else:
+        call = lambda: run_github(org, op, target, params)
+    return await mutation_scheduler.run(action_type, org, repo, params, call)
 
-    if action_type not in dispatch_table:
-        raise Exception(f"Unknown action: {action_type}")
+async def perform_github_actions(actions: List[ActionRequest], user: dict) -> List[dict]:
+    """
+    Run a batch of actions. Actions are grouped by (org, repo) so each group
+    shares one client, one target lookup and one team check per required team.
+    Returns one result per action, in input order.
+    """
+    results: List[dict] = [None] * len(actions)
+    groups = defaultdict(list)
+
+    for index, action in enumerate(actions):
+        if action.action not in dispatch_table:
+            results[index] = _result(index, action, error=f"Unknown action: {action.action}")
+        else:
+            groups[(action.org, action.repo or None)].append((index, action))
+
+    with github_lane(Lane.MUTATION):
+        await asyncio.gather(*(
+            _perform_group(org, repo, items, user, results)
+            for (org, repo), items in groups.items()
+        ))
+    return results
+
+async def _perform_group(org: str, repo: str, items: list, user: dict, results: list):
+    username = user["email"].split("@")[0]
+    try:
+        gh = await run_github(org, get_app_client, org, repo)
+        target = await run_github(org, get_target, gh, org, repo)
+    except Exception as e:
+        for index, action in items:
+            results[index] = _result(index, action, error=str(e))
+        return
+
+    decisions = {}
+    limit = asyncio.Semaphore(GITHUB_BATCH_CONCURRENCY)
+
+    async def authorized(team: str) -> bool:
+        if team not in decisions:
+            decisions[team] = asyncio.ensure_future(run_github(org, check_team_membership, gh, org, team, username))
+        return await decisions[team]
+
+    async def perform(index: int, action: ActionRequest):
+        async with limit:
+            try:
+                cleaned_action = enforce_policy(action, user)
+                if not await authorized(cleaned_action.parameters.get("team", DEFAULT_TEAM)):
+                    raise UnauthorizedError("User not in required team")
+                with span("op", action.action, org):
+                    details = await run_mutation(org, repo, action.action, target, cleaned_action.parameters)
+                results[index] = _result(index, action, details=details)
+            except Exception as e:
+                results[index] = _result(index, action, error=str(e))
+
+    await asyncio.gather(*(perform(index, action) for index, action in items))
 
-    target = gh.get_repo(f"{org}/{repo}") if repo else gh.get_organization(org)
-    return dispatch_table[action_type](target, cleaned_action.parameters)
+def _result(index: int, action: ActionRequest, details=None, error: str = None) -> dict:
+    result = {"index": index, "org": action.org, "repo": action.repo, "action": action.action}
+    if superseded_by(details):
+        result.update(status="superseded", by=superseded_by(details))
+    elif error is None:
+        result.update(status="ok", details=details)
+    else:
+        result.update(status="error", error=error)
+    return result
@@ -0,0 +1,76 @@
+import asyncio
+import contextvars
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from prometheus_client import Gauge, Histogram
+
+from .budget import current_lane, scheduler, set_current_org
+
+# PyGithub is blocking, so every GitHub round-trip runs on this bounded pool
+# instead of the event loop.
+GITHUB_EXECUTOR_WORKERS = int(os.getenv("GITHUB_EXECUTOR_WORKERS", "32"))
+GITHUB_ORG_CONCURRENCY = int(os.getenv("GITHUB_ORG_CONCURRENCY", "8"))
+
+EXECUTOR_INFLIGHT = Gauge("mcp_github_executor_inflight", "Blocking GitHub calls currently running")
+EXECUTOR_WAITING = Gauge("mcp_github_executor_waiting", "Blocking GitHub calls waiting for a slot")
+EXECUTOR_WAIT = Histogram("mcp_github_executor_wait_seconds", "Time a GitHub call waited for an executor slot")
+EXECUTOR_RUN = Histogram("mcp_github_executor_run_seconds", "Time a GitHub call spent running in the executor")
+
+_executor = ThreadPoolExecutor(max_workers=GITHUB_EXECUTOR_WORKERS, thread_name_prefix="github")
+# Semaphores are bound to the loop they were first used on
+_org_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def _org_limit(org: str) -> asyncio.Semaphore:
+    limits = _org_limits.setdefault(asyncio.get_running_loop(), {})
+    if org not in limits:
+        limits[org] = asyncio.Semaphore(GITHUB_ORG_CONCURRENCY)
+    return limits[org]
+
+
+async def run_github(org: str, fn, *args, **kwargs):
+    """
+    Run a blocking GitHub call on the shared executor, limited per org.
+    Context variables of the caller are visible inside the call.
+    """
+    ctx = contextvars.copy_context()
+    ctx.run(set_current_org, org)
+    queued = time.perf_counter()
+    waiting = [True]
+
+    def stop_waiting():
+        # Runs on either the worker or the loop (on cancellation); only the first counts
+        try:
+            waiting.pop()
+        except IndexError:
+            return
+        EXECUTOR_WAITING.dec()
+
+    def timed():
+        started = time.perf_counter()
+        stop_waiting()
+        EXECUTOR_WAIT.observe(started - queued)
+        EXECUTOR_INFLIGHT.inc()
+        try:
+            return ctx.run(fn, *args, **kwargs)
+        finally:
+            EXECUTOR_INFLIGHT.dec()
+            EXECUTOR_RUN.observe(time.perf_counter() - started)
+
+    EXECUTOR_WAITING.inc()
+    try:
+        # A lane out of budget waits here, holding neither a thread nor one of the org's slots
+        lane = current_lane()
+        while (delay := scheduler.admission_delay(org, lane)) > 0:
+            await asyncio.sleep(min(delay, 1.0))
+        async with _org_limit(org):
+            return await asyncio.get_running_loop().run_in_executor(_executor, timed)
+    finally:
+        stop_waiting()
+
+
+def shutdown_executor(wait: bool = True):
+    _executor.shutdown(wait=wait, cancel_futures=True)
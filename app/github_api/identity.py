@@ -1,47 +1,154 @@
 import os
-from cachetools import TTLCache, cached
-from .authz import get_app_client, is_org_admin
+import asyncio
+import threading
+import time
+from cachetools import TTLCache
+from .authz import get_app_client, get_membership_snapshot, is_org_admin
 from github import GithubException
-from datetime import datetime
+from datetime import datetime, timezone
 
-from .authz import integration
+from .authz import tokens
+from .executor import run_github
+from .repo_index import RepoIndex
+from .budget import Lane, github_lane
+from ..cache import TieredCache
 
-# Caches
-_membership_cache = TTLCache(maxsize=256, ttl=300)
-_repos_cache      = TTLCache(maxsize=256, ttl=300)
-_token_cache      = TTLCache(maxsize=256, ttl=300)
+# Caches (webhooks patch these in place, so they can live much longer when configured)
+IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "21600" if os.getenv("GITHUB_WEBHOOK_SECRET") else "300"))
+# Token metadata only changes when the installation's permissions do
+TOKEN_METADATA_TTL = int(os.getenv("TOKEN_METADATA_TTL", "300"))
+
+# Shared with the other workers on the host; stale entries are served while one worker refreshes them
+_repos_cache = TieredCache(
+    "installation_repos",
+    ttl=IDENTITY_CACHE_TTL,
+    encode=lambda repos: [repos.org, list(repos.names)],
+    decode=lambda data: RepoIndex(*data),
+    background=lambda: github_lane(Lane.BACKGROUND),
+)
+_metadata_cache = TieredCache(
+    "installation_metadata",
+    ttl=TOKEN_METADATA_TTL,
+    background=lambda: github_lane(Lane.BACKGROUND),
+)
+
+# Overall budget for building /me across all orgs
+IDENTITY_REPORT_TIMEOUT = float(os.getenv("IDENTITY_REPORT_TIMEOUT", "5"))
+# How long, and for how many (org, subquery, user) keys, a last good answer is kept for late subqueries
+IDENTITY_STALE_TTL = int(os.getenv("IDENTITY_STALE_TTL", "3600"))
+IDENTITY_STALE_ENTRIES = int(os.getenv("IDENTITY_STALE_ENTRIES", "10000"))
 
-@cached(_membership_cache)
 def get_user_membership(username: str, org: str) -> dict:
-    try:
-        gh = get_app_client(org)
-        org_obj = gh.get_organization(org)
-        teams = [t.slug for t in org_obj.get_teams() if t.has_in_members(username)]
-        return {"teams": teams}
-    except Exception as e:
-        return {"error": str(e)}
+    # Errors propagate, so the report flags the org instead of showing an error as teams
+    return {"teams": sorted(get_membership_snapshot(org).teams_for(username))}
 
-@cached(_repos_cache)
-def get_installation_repos(org: str) -> list[str]:
-    try:
-        gh = get_app_client(org)
-        return [r.full_name for r in gh.get_organization(org).get_repos()]
-    except Exception:
-        return []
+def _fetch_installation_repos(org: str) -> RepoIndex:
+    # Errors propagate: caching a failed listing as an empty index would hide every repo until it expired
+    gh = get_app_client(org)
+    return RepoIndex(org, (r.full_name for r in gh.get_organization(org).get_repos()))
+
+def get_installation_repos(org: str) -> RepoIndex:
+    return _repos_cache.get(org, lambda: _fetch_installation_repos(org))
+
+def patch_installation_repos(org: str, added=(), removed=()):
+    repos = _repos_cache.peek(org)
+    if repos is not None:
+        _repos_cache.replace(org, repos.patched(added=added, removed=removed))
+
+def invalidate_installation_repos(org: str):
+    _repos_cache.delete(org)
+
+def _fetch_installation_metadata(org: str) -> dict:
+    token = tokens.get_token(org)
+    return {
+        "expires_at": datetime.fromtimestamp(token.expires_at, timezone.utc).isoformat(),
+        "permissions": token.permissions,
+    }
 
-@cached(_token_cache)
 def get_installation_metadata(org: str) -> dict:
     try:
-        inst = integration.get_organization_installation(org)
-        token = integration.get_access_token(inst.id)
-        return {
-            "expires_at": token.expires_at.isoformat(),
-            "permissions": token.permissions,
-        }
+        return _metadata_cache.get(org, lambda: _fetch_installation_metadata(org))
     except GithubException as e:
         return {"error": str(e)}
 
-def get_identity_report(user: dict) -> dict:
+def invalidate_installation_metadata(org: str):
+    _metadata_cache.delete(org)
+
+def get_admin_flag(username: str, org: str) -> bool:
+    return is_org_admin(get_app_client(org), org, username)
+
+def get_repo_count(org: str) -> int:
+    return len(get_installation_repos(org))
+
+# Last good answer per (org, subquery[, username]), served when a subquery misses the deadline
+_last_known: TTLCache = TTLCache(maxsize=IDENTITY_STALE_ENTRIES, ttl=IDENTITY_STALE_TTL)
+_last_known_lock = threading.Lock()
+_MISSING = object()
+
+def _remember(key: tuple, fn, *args):
+    # Stored from the worker thread, so results land even after the caller gave up waiting
+    result = fn(*args)
+    with _last_known_lock:
+        _last_known[key] = result
+    return result
+
+async def _subquery(key: tuple, fn, *args):
+    return await run_github(key[0], _remember, key, fn, *args)
+
+async def _org_report(org: str, username: str, deadline: float) -> tuple[dict, dict]:
+    # Org-wide answers are kept once per org, only the per-user ones per user
+    subqueries = {
+        "teams": ((org, "teams", username), get_user_membership, username, org),
+        "accessible_repos": ((org, "accessible_repos"), get_repo_count, org),
+        "token": ((org, "token"), get_installation_metadata, org),
+        "is_admin": ((org, "is_admin", username), get_admin_flag, username, org),
+    }
+    tasks = {
+        name: asyncio.ensure_future(_subquery(key, fn, *args))
+        for name, (key, fn, *args) in subqueries.items()
+    }
+    # Late subqueries keep running in the executor and refresh _last_known for the next call
+    await asyncio.wait(tasks.values(), timeout=max(deadline - time.monotonic(), 0))
+
+    values, stale, missing = {}, [], []
+    for name, task in tasks.items():
+        if task.done() and not task.exception():
+            values[name] = task.result()
+            continue
+        if task.done():
+            task.exception()  # retrieved so it is not logged as unhandled
+        with _last_known_lock:
+            last = _last_known.get(subqueries[name][0], _MISSING)
+        if last is not _MISSING:
+            values[name] = last
+            stale.append(name)
+        else:
+            values[name] = None
+            missing.append(name)
+
+    teams = values["teams"]
+    github = {
+        "teams": teams.get("teams", []) if isinstance(teams, dict) else [],
+        # The full list can be tens of thousands of names; page or stream it from /repos/{org}
+        "accessible_repos": {"count": values["accessible_repos"], "href": f"/repos/{org}"},
+        "token": values["token"],
+    }
+    flags = {
+        "is_admin": bool(values["is_admin"]),
+        "stale": bool(stale),
+        "partial": bool(missing),
+    }
+    if stale or missing:
+        flags["degraded"] = sorted(stale + missing)
+    return github, flags
+
+async def get_identity_report(user: dict) -> dict:
+    """
+    Build the /me report for every org in GITHUB_ORGS concurrently, with all
+    subqueries of an org in parallel and one overall deadline. Orgs that miss
+    the deadline report their last known data flagged `stale`, or `partial`
+    when nothing is cached yet.
+    """
     username = user.get("email", "").split("@")[0]
     report = {
         "email": user.get("email"),
@@ -52,17 +159,11 @@ def get_identity_report(user: dict) -> dict:
     }
 
     orgs = [o.strip() for o in os.getenv("GITHUB_ORGS", "").split(",") if o.strip()]
-    for org in orgs:
-        teams = get_user_membership(username, org).get("teams", [])
-        repos = get_installation_repos(org)
-        token_meta = get_installation_metadata(org)
-        admin = is_org_admin(get_app_client(org), org, username)
-
-        report["github"][org] = {
-            "teams": teams,
-            "accessible_repos": repos,
-            "token": token_meta
-        }
-        report["flags"][org] = {"is_admin": admin}
+    deadline = time.monotonic() + IDENTITY_REPORT_TIMEOUT
+    results = await asyncio.gather(*(_org_report(org, username, deadline) for org in orgs))
+
+    for org, (github, flags) in zip(orgs, results):
+        report["github"][org] = github
+        report["flags"][org] = flags
 
     return report
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from typing import Callable
+
+from github import GithubException
+from prometheus_client import Counter
+
+from .budget import Lane, github_lane
+from ..cache import TieredCache
+
+# Installations change rarely, and installation webhooks drop the index when they do
+INSTALLATION_INDEX_TTL = int(os.getenv(
+    "INSTALLATION_INDEX_TTL", "3600" if os.getenv("GITHUB_WEBHOOK_SECRET") else "600"
+))
+# How long an org or repo without an installation is answered locally before GitHub is asked again
+INSTALLATION_NEGATIVE_TTL = int(os.getenv("INSTALLATION_NEGATIVE_TTL", "60"))
+# Misses and per-repo answers are keyed by whatever org/repo callers ask for, so their number is capped
+INSTALLATION_NEGATIVE_ENTRIES = int(os.getenv("INSTALLATION_NEGATIVE_ENTRIES", "10000"))
+INSTALLATION_REPO_ENTRIES = int(os.getenv("INSTALLATION_REPO_ENTRIES", "10000"))
+
+INSTALLATION_LOOKUPS = Counter(
+    "mcp_installation_lookups_total", "Installation lookups by where they were answered", ["result"]
+)
+
+
+class InstallationNotFound(GithubException):
+    """The App is not installed on the org, or the installation doesn't cover the repo."""
+
+    def __init__(self, org: str, repo: str = None):
+        target = f"{org}/{repo}" if repo else org
+        super().__init__(404, {"message": f"No GitHub App installation for {target}"}, None)
+
+
+class InstallationIndex:
+    """
+    Every installation of the App, listed with the App JWT in one paginated
+    call: account login -> (installation id, repository selection). Repos of
+    installations that cover all repositories resolve from the index; only
+    selected-repository installations are asked about individual repos, and
+    those answers expire with the index. Misses are remembered for
+    INSTALLATION_NEGATIVE_TTL so unknown orgs fail fast, while transient
+    errors are raised and never cached.
+    """
+
+    def __init__(
+        self,
+        integration_factory: Callable,
+        ttl: int = INSTALLATION_INDEX_TTL,
+        negative_ttl: int = INSTALLATION_NEGATIVE_TTL,
+        negative_entries: int = INSTALLATION_NEGATIVE_ENTRIES,
+        repo_entries: int = INSTALLATION_REPO_ENTRIES,
+        store=None,
+    ):
+        self.integration_factory = integration_factory
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.negative_entries = negative_entries
+        self.repo_entries = repo_entries
+        self._cache = TieredCache(
+            "installations", ttl=ttl, store=store, background=lambda: github_lane(Lane.BACKGROUND)
+        )
+        # key -> (installation id or None, expires at); see _remember
+        self._repos: dict[tuple, tuple] = {}
+        self._misses: dict[tuple, tuple] = {}
+        self._reloaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self) -> dict:
+        with self._lock:
+            self._reloaded_at = time.time()
+        return {
+            installation.account.login.lower(): [installation.id, installation.repository_selection]
+            for installation in self.integration_factory().get_installations()
+        }
+
+    def lookup(self, org: str, repo: str = None) -> int:
+        key = (org.lower(), repo.lower() if repo else None)
+        now = time.time()
+        with self._lock:
+            if self._misses.get(key, (None, 0))[1] > now:
+                INSTALLATION_LOOKUPS.labels(result="negative").inc()
+                raise InstallationNotFound(org, repo)
+            inst_id, expires = self._repos.get(key, (None, 0))
+        if expires > now:
+            INSTALLATION_LOOKUPS.labels(result="hit").inc()
+            return inst_id
+
+        entry = self._cache.get("all", self._fetch).get(key[0])
+        if entry is None:
+            entry = self._reload().get(key[0])
+        if entry is None:
+            self._miss(key, org, repo)
+
+        inst_id, selection = entry
+        if repo and selection != "all":
+            try:
+                inst_id = self.integration_factory().get_repo_installation(org, repo).id
+            except GithubException as e:
+                if e.status != 404:
+                    raise
+                self._miss(key, org, repo)
+            INSTALLATION_LOOKUPS.labels(result="repo_lookup").inc()
+            self._remember(self._repos, key, inst_id, self.ttl, self.repo_entries)
+        else:
+            # Orgs and repos of "all" installations are answered by the index itself, so they follow its refreshes
+            INSTALLATION_LOOKUPS.labels(result="hit").inc()
+        return inst_id
+
+    def _reload(self) -> dict:
+        """Relist after a miss (the org may have just installed the App), at most once per negative TTL."""
+        with self._lock:
+            if time.time() - self._reloaded_at < self.negative_ttl:
+                return {}
+        index = self._fetch()
+        self._cache.set("all", index)
+        return index
+
+    def _remember(self, memo: dict, key: tuple, value, ttl: float, limit: int):
+        now = time.time()
+        with self._lock:
+            # Every entry of a memo lives the same ttl, so insertion order is expiry order: expired ones are at the front
+            memo.pop(key, None)
+            while memo and (len(memo) >= limit or next(iter(memo.values()))[1] <= now):
+                del memo[next(iter(memo))]
+            memo[key] = (value, now + ttl)
+
+    def _miss(self, key: tuple, org: str, repo: str = None):
+        self._remember(self._misses, key, None, self.negative_ttl, self.negative_entries)
+        INSTALLATION_LOOKUPS.labels(result="miss").inc()
+        raise InstallationNotFound(org, repo)
+
+    def invalidate(self, org: str = None):
+        """Forget the index (and an org's repo lookups and misses) after an installation changed."""
+        with self._lock:
+            for cached in (self._repos, self._misses):
+                for key in [k for k in cached if org is None or k[0] == org.lower()]:
+                    del cached[key]
+            self._reloaded_at = 0.0
+        self._cache.delete("all")
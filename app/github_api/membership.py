@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from typing import Callable
+
+from github import Github
+
+from .budget import Lane, github_lane
+from ..cache import TieredCache
+
+# With webhooks keeping snapshots current, the scheduled refresh is only a safety net
+MEMBERSHIP_REFRESH_INTERVAL = int(os.getenv(
+    "MEMBERSHIP_REFRESH_INTERVAL", "21600" if os.getenv("GITHUB_WEBHOOK_SECRET") else "300"
+))
+# How often a worker picks up a snapshot refreshed or patched by another worker
+MEMBERSHIP_SYNC_INTERVAL = int(os.getenv("MEMBERSHIP_SYNC_INTERVAL", "30"))
+
+# org -> {team slug: member logins}, shared by the workers on the host
+_membership_cache = TieredCache(
+    "org_membership",
+    ttl=MEMBERSHIP_REFRESH_INTERVAL,
+    background=lambda: github_lane(Lane.BACKGROUND),
+)
+
+
+class OrgMembershipSnapshot:
+    """
+    All teams of an org with their members, fetched with paginated bulk
+    listing, plus an inverted username -> team slugs index for O(1) lookups.
+    """
+
+    def __init__(self, org: str, client_factory: Callable[[], Github]):
+        self.org = org
+        self.client_factory = client_factory
+        self.team_members: dict[str, frozenset] = {}
+        self.user_teams: dict[str, set] = {}
+        self.refreshed_at = 0.0
+        self.loaded = None
+        self._lock = threading.Lock()
+
+    def teams_for(self, username: str) -> frozenset:
+        return frozenset(self.user_teams.get(username.lower(), ()))
+
+    def is_member(self, team_slug: str, username: str) -> bool:
+        return team_slug in self.user_teams.get(username.lower(), ())
+
+    def set_team_members(self, team_slug: str, members):
+        """Apply the difference to the inverted index instead of rebuilding it."""
+        with self._lock:
+            new = frozenset(m.lower() for m in members)
+            old = self.team_members.get(team_slug, frozenset())
+            for username in old - new:
+                self._unindex(username, team_slug)
+            for username in new - old:
+                self.user_teams.setdefault(username, set()).add(team_slug)
+            self.team_members[team_slug] = new
+
+    def add_member(self, team_slug: str, username: str):
+        self.set_team_members(team_slug, self.team_members.get(team_slug, frozenset()) | {username.lower()})
+
+    def remove_member(self, team_slug: str, username: str):
+        self.set_team_members(team_slug, self.team_members.get(team_slug, frozenset()) - {username.lower()})
+
+    def remove_team(self, team_slug: str):
+        with self._lock:
+            for username in self.team_members.pop(team_slug, frozenset()):
+                self._unindex(username, team_slug)
+
+    def _unindex(self, username: str, team_slug: str):
+        teams = self.user_teams.get(username)
+        if teams is not None:
+            teams.discard(team_slug)
+            if not teams:
+                del self.user_teams[username]
+
+    def fetch(self) -> dict:
+        gh_org = self.client_factory().get_organization(self.org)
+        return {team.slug: sorted(member.login for member in team.get_members()) for team in gh_org.get_teams()}
+
+    def load(self, team_members: dict):
+        for team_slug in set(self.team_members) - set(team_members):
+            self.remove_team(team_slug)
+        for team_slug, members in team_members.items():
+            self.set_team_members(team_slug, members)
+        self.loaded = team_members
+        self.refreshed_at = time.time()
+
+    def export(self) -> dict:
+        return {team_slug: sorted(members) for team_slug, members in self.team_members.items()}
+
+    def refresh(self):
+        self.load(self.fetch())
+
+
+_snapshots: dict[str, OrgMembershipSnapshot] = {}
+_snapshots_lock = threading.Lock()
+_build_locks: dict[str, threading.Lock] = {}
+
+
+def get_snapshot(org: str, client_factory: Callable[[], Github]) -> OrgMembershipSnapshot:
+    """Return the org's snapshot, building it on first use and refreshing it on a schedule."""
+    snapshot = _snapshots.get(org)
+    if snapshot is not None:
+        return snapshot
+
+    with _snapshots_lock:
+        build_lock = _build_locks.setdefault(org, threading.Lock())
+    with build_lock:
+        snapshot = _snapshots.get(org)
+        if snapshot is None:
+            snapshot = OrgMembershipSnapshot(org, client_factory)
+            _sync(snapshot)
+            _snapshots[org] = snapshot
+            _schedule_refresh(snapshot)
+    return snapshot
+
+
+def get_cached_snapshot(org: str):
+    return _snapshots.get(org)
+
+
+def drop_snapshot(org: str):
+    _snapshots.pop(org, None)
+    _membership_cache.delete(org)
+
+
+def publish_snapshot(snapshot: OrgMembershipSnapshot):
+    """Share a webhook-patched snapshot with the other workers."""
+    data = snapshot.export()
+    _membership_cache.replace(snapshot.org, data)
+    snapshot.loaded = data
+
+
+def _sync(snapshot: OrgMembershipSnapshot):
+    # Another worker (or a stale-while-revalidate fill) may have refreshed the shared copy
+    data = _membership_cache.get(snapshot.org, snapshot.fetch)
+    if data is not snapshot.loaded:
+        snapshot.load(data)
+
+
+def _background_refresh(snapshot: OrgMembershipSnapshot):
+    with github_lane(Lane.BACKGROUND):
+        snapshot.refresh()
+        _membership_cache.set(snapshot.org, snapshot.loaded)
+
+
+def refresh_in_background(org: str):
+    snapshot = _snapshots.get(org)
+    if snapshot is not None:
+        threading.Thread(target=_background_refresh, args=(snapshot,), name=f"gh-membership-{org}", daemon=True).start()
+
+
+def _schedule_refresh(snapshot: OrgMembershipSnapshot, interval: int = min(MEMBERSHIP_SYNC_INTERVAL, MEMBERSHIP_REFRESH_INTERVAL)):
+    def run():
+        try:
+            with github_lane(Lane.BACKGROUND):
+                _sync(snapshot)
+        except Exception:
+            pass  # keep serving the previous snapshot, try again next tick
+        if _snapshots.get(snapshot.org) is snapshot:
+            _schedule_refresh(snapshot, interval)
+
+    timer = threading.Timer(interval, run)
+    timer.daemon = True
+    timer.start()
@@ -0,0 +1,115 @@
+import asyncio
+import contextvars
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from prometheus_client import Counter, Gauge
+
+MUTATION_QUEUE_DEPTH = Gauge(
+    "mcp_github_mutation_queue_depth", "GitHub writes queued or running per repository/team key", ["key"]
+)
+MUTATIONS_COALESCED = Counter(
+    "mcp_github_mutations_coalesced_total", "Queued GitHub writes replaced by a later write to the same target", ["action"]
+)
+
+
+def mutation_key(action: str, org: str, repo: Optional[str], params: dict) -> tuple[str, Optional[tuple]]:
+    """
+    The serialization key of a write, and the target it overwrites (or None
+    when a later write doesn't make it redundant).
+    """
+    org = org.lower()
+    if action in ("replace_secret", "delete_secret"):
+        # Secret names are case-insensitive on GitHub
+        return f"{org}/repo:{repo.lower()}", ("secret", params["name"].upper())
+    if action in ("add_user_to_team", "remove_user_from_team"):
+        return f"{org}/team:{params['team'].lower()}", ("member", params["username"].lower())
+    if action in ("create_repo", "delete_repo"):
+        return f"{org}/repo:{params['name'].lower()}", None
+    if action == "replace_org_secret":
+        return f"{org}/org-secret:{params['name'].upper()}", ("secret", params["name"].upper())
+    if action == "rotate_secret":
+        return f"{org}/org-secret:{params['name'].upper()}", None
+    return (f"{org}/repo:{repo.lower()}" if repo else f"{org}/org"), None
+
+
+def superseded_by(result) -> Optional[str]:
+    """The action that replaced a coalesced write, or None for a write that ran."""
+    if isinstance(result, dict) and result.get("status") == "superseded":
+        return result["by"]
+    return None
+
+
+class _Mutation:
+    __slots__ = ("action", "target", "fn", "context", "future", "started")
+
+    def __init__(self, action: str, target: Optional[tuple], fn: Callable[[], Awaitable[Any]]):
+        self.action = action
+        self.target = target
+        self.fn = fn
+        # The write runs in the drain task, but its spans, call counts and lane belong to the caller
+        self.context = contextvars.copy_context()
+        self.future = asyncio.get_running_loop().create_future()
+        self.started = False
+
+
+class MutationScheduler:
+    """
+    Runs GitHub writes one at a time per (org, repo or team) key, in arrival
+    order, while different keys proceed in parallel. A write that has not
+    started yet is dropped when a later one targets the same secret or team
+    member; its caller gets {"status": "superseded", "by": <later action>}
+    rather than a result that isn't its own. So for the same target the last
+    write wins, and an add then remove of the same member makes one call
+    instead of two.
+    """
+
+    def __init__(self):
+        self._queues: dict[str, deque] = {}
+        # The loop only holds tasks weakly
+        self._drains: dict[str, asyncio.Task] = {}
+
+    def depth(self, key: str) -> int:
+        queue = self._queues.get(key)
+        return len(queue) if queue else 0
+
+    async def run(self, action: str, org: str, repo: Optional[str], params: dict, fn: Callable[[], Awaitable[Any]]):
+        key, target = mutation_key(action, org, repo, params)
+        mutation = _Mutation(action, target, fn)
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._drains[key] = asyncio.get_running_loop().create_task(self._drain(key, queue), name=f"gh-mutations-{key}")
+        if target is not None:
+            for pending in [m for m in queue if not m.started and m.target == target]:
+                queue.remove(pending)
+                pending.future.set_result({"status": "superseded", "by": action})
+                MUTATIONS_COALESCED.labels(action=pending.action).inc()
+        queue.append(mutation)
+        MUTATION_QUEUE_DEPTH.labels(key=key).set(len(queue))
+
+        # The write goes ahead even if this caller disconnects; it was accepted
+        return await asyncio.shield(mutation.future)
+
+    async def _drain(self, key: str, queue: deque):
+        try:
+            while queue:
+                mutation = queue[0]
+                mutation.started = True
+                try:
+                    result = await asyncio.create_task(mutation.fn(), context=mutation.context)
+                except Exception as e:
+                    mutation.future.set_exception(e)
+                else:
+                    mutation.future.set_result(result)
+                queue.popleft()
+                MUTATION_QUEUE_DEPTH.labels(key=key).set(len(queue))
+        finally:
+            del self._queues[key]
+            del self._drains[key]
+            # Keys come and go with repositories and teams; don't keep a series for every one ever seen
+            MUTATION_QUEUE_DEPTH.remove(key)
+
+
+mutation_scheduler = MutationScheduler()
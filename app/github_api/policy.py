@@ -20,7 +20,7 @@ def enforce_policy(action: ActionRequest, user: dict) -> ActionRequest:
         if not params.get("description"):
             params["description"] = f"Repository created by {email_prefix} via MCP"
 
-    if action_type == "replace_secret":
+    if action_type in ("replace_secret", "rotate_secret", "replace_org_secret"):
         if "name" in params and not params["name"].startswith("MCP_"):
             params["name"] = f"MCP_{params['name']}"
 
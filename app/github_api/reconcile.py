@@ -0,0 +1,177 @@
+import asyncio
+from typing import List
+
+from .authz import get_app_client, get_membership_snapshot, check_team_membership, is_org_admin
+from .budget import Lane, github_lane
+from .dispatcher import UnauthorizedError, perform_github_actions
+from .executor import run_github
+from .identity import get_installation_repos, patch_installation_repos
+from .membership import publish_snapshot
+from .policy import DEFAULT_TEAM, enforce_policy
+from ..models import ActionRequest, DesiredState
+
+
+def _normalized(user: dict, org: str, action: str, repo: str = "", **params) -> ActionRequest:
+    # Names go through the same policy as /act, so "api" is compared as "dev-api"
+    return enforce_policy(ActionRequest(org=org, repo=repo, action=action, parameters=params), user)
+
+
+def _secret_names(org: str, repo: str) -> set:
+    gh = get_app_client(org, repo)
+    return {secret.name for secret in gh.get_repo(f"{org}/{repo}").get_secrets()}
+
+
+async def authorize(org: str, user: dict):
+    """Same gate as /act and /audit: members of the default team or org admins, checked before any state is read."""
+    username = user["email"].split("@")[0]
+    with github_lane(Lane.READ):
+        gh = await run_github(org, get_app_client, org)
+        if await run_github(org, check_team_membership, gh, org, DEFAULT_TEAM, username):
+            return
+        if await run_github(org, is_org_admin, gh, org, username):
+            return
+    raise UnauthorizedError("User not in required team")
+
+
+async def read_current_state(state: DesiredState, repos: dict, secret_repos: set) -> dict:
+    """
+    The parts of the org's current state the desired document mentions. Repos
+    and team rosters come from the shared caches; only secret names cost
+    calls, one listing per repository that has `secrets` entries.
+    """
+    org = state.org
+    with github_lane(Lane.READ):
+        index = await run_github(org, get_installation_repos, org)
+        existing = {name for name in repos.values() if f"{org}/{name}" in index}
+        snapshot = await run_github(org, get_membership_snapshot, org)
+
+        listed = sorted(repo for repo in secret_repos if repo in existing or f"{org}/{repo}" in index)
+        names = await asyncio.gather(
+            *(run_github(org, _secret_names, org, repo) for repo in listed), return_exceptions=True
+        )
+    return {
+        "repos": existing,
+        "teams": dict(snapshot.team_members),
+        "secrets": dict(zip(listed, names)),
+    }
+
+
+def plan_changes(state: DesiredState, user: dict, current: dict, repos: dict) -> dict:
+    """
+    Diff the desired state against `current` and return the mutations as
+    ordered phases: repositories first, then memberships and secrets (which
+    may target the new repositories). Unresolvable items are reported, not planned.
+    """
+    org = state.org
+    create, update, unresolved = [], [], []
+
+    for name in repos.values():
+        if name not in current["repos"]:
+            create.append(_normalized(user, org, "create_repo", name=name))
+
+    for team, members in (state.teams or {}).items():
+        if team not in current["teams"]:
+            unresolved.append({"team": team, "error": "team does not exist"})
+            continue
+        have = current["teams"][team]
+        want = {m.lower(): m for m in members}
+        for login in sorted(set(want) - have):
+            update.append(_normalized(user, org, "add_user_to_team", team=team, username=want[login]))
+        if state.prune:
+            for login in sorted(have - set(want)):
+                update.append(_normalized(user, org, "remove_user_from_team", team=team, username=login))
+
+    for repo_key, secrets in (state.secrets or {}).items():
+        repo = repos.get(repo_key, repo_key)
+        if repo not in current["secrets"] and repo not in repos.values():
+            unresolved.append({"repo": repo, "error": "repository does not exist"})
+            continue
+        have = current["secrets"].get(repo, set())
+        if isinstance(have, Exception):
+            unresolved.append({"repo": repo, "error": f"could not list secrets: {have}"})
+            continue
+        # Secret names are case-insensitive on GitHub, which lists them upper-case
+        have = {name.upper() for name in have}
+        wanted = set()
+        for name, value in secrets.items():
+            action = _normalized(user, org, "replace_secret", repo, name=name, value=value)
+            wanted.add(action.parameters["name"].upper())
+            # Secret values can't be read back, so an existing secret is left as it is
+            if action.parameters["name"].upper() in have:
+                continue
+            if value is None:
+                unresolved.append({"repo": repo, "secret": action.parameters["name"], "error": "missing and no value given"})
+            else:
+                update.append(action)
+        if state.prune:
+            for name in sorted(have - wanted):
+                update.append(ActionRequest(org=org, repo=repo, action="delete_secret", parameters={"name": name}))
+
+    return {"phases": [phase for phase in (create, update) if phase], "unresolved": unresolved}
+
+
+def describe(action: ActionRequest) -> dict:
+    params = {k: v for k, v in (action.parameters or {}).items() if k != "value"}
+    return {"action": action.action, "repo": action.repo or None, "parameters": params}
+
+
+def _apply_to_caches(org: str, results: List[dict], actions: List[ActionRequest]):
+    """Patch the cached state with what succeeded, so the next plan starts from it without a webhook."""
+    snapshot = get_membership_snapshot(org)
+    created, roster_changed = [], False
+    for action, result in zip(actions, results):
+        if result["status"] != "ok":
+            continue
+        params = action.parameters
+        if action.action == "create_repo":
+            created.append(f"{org}/{params['name']}")
+        elif action.action == "add_user_to_team":
+            snapshot.add_member(params["team"], params["username"])
+            roster_changed = True
+        elif action.action == "remove_user_from_team":
+            snapshot.remove_member(params["team"], params["username"])
+            roster_changed = True
+    if created:
+        patch_installation_repos(org, added=created)
+    if roster_changed:
+        publish_snapshot(snapshot)
+
+
+async def reconcile(state: DesiredState, user: dict, dry_run: bool = False) -> tuple[dict, list]:
+    """
+    Bring the org to `state` with the fewest mutations: only differences are
+    applied, phase by phase, each phase in parallel through the batch path.
+    Returns the report (plan, and results unless `dry_run`) and the executed
+    (action, result) pairs for the audit log.
+    """
+    await authorize(state.org, user)
+    repos = {name: _normalized(user, state.org, "create_repo", name=name).parameters["name"] for name in state.repos or []}
+    secret_repos = {repos.get(key, key) for key in state.secrets or {}}
+
+    current = await read_current_state(state, repos, secret_repos)
+    plan = plan_changes(state, user, current, repos)
+    report = {
+        "org": state.org,
+        "dry_run": dry_run,
+        "changes": sum(len(phase) for phase in plan["phases"]),
+        "plan": [[describe(action) for action in phase] for phase in plan["phases"]],
+        "unresolved": plan["unresolved"],
+    }
+    if dry_run:
+        report["status"] = "planned"
+        return report, []
+
+    actions, results = [], []
+    for phase in plan["phases"]:
+        actions += phase
+        results += await perform_github_actions(phase, user)
+    if actions:
+        await run_github(state.org, _apply_to_caches, state.org, results, actions)
+
+    failed = sum(r["status"] == "error" for r in results)
+    report.update(
+        status="ok" if not failed and not plan["unresolved"] else "partial",
+        failed=failed,
+        results=[{k: v for k, v in r.items() if k != "index"} for r in results],
+    )
+    return report, list(zip(actions, results))
@@ -0,0 +1,71 @@
+import base64
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, Optional
+
+
+class RepoIndex:
+    """
+    Immutable, case-insensitively sorted set of an org's repository full names.
+    Prefix filters and cursor paging are binary searches; substring filters
+    scan a flat tuple instead of re-walking GitHub objects.
+    """
+
+    __slots__ = ("org", "names", "keys")
+
+    def __init__(self, org: str, full_names: Iterable[str] = ()):
+        self.org = org
+        self.names = tuple(sorted(set(full_names), key=str.lower))
+        self.keys = tuple(name.lower() for name in self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __contains__(self, full_name: str) -> bool:
+        i = bisect_left(self.keys, full_name.lower())
+        return i < len(self.keys) and self.keys[i] == full_name.lower()
+
+    def patched(self, added=(), removed=()) -> "RepoIndex":
+        removed = {name.lower() for name in removed}
+        return RepoIndex(self.org, [n for n in self.names if n.lower() not in removed] + list(added))
+
+    def _range(self, prefix: str = "", after: str = None) -> tuple[int, int]:
+        # Prefixes apply to the repository name, not the "org/" part
+        lo_key = f"{self.org}/{prefix}".lower()
+        lo = bisect_left(self.keys, lo_key)
+        hi = bisect_left(self.keys, lo_key + "\U0010ffff") if prefix else len(self.keys)
+        if after:
+            lo = max(lo, bisect_right(self.keys, after))
+        return lo, hi
+
+    def iter(self, prefix: str = "", contains: str = "", after: str = None) -> Iterator[str]:
+        lo, hi = self._range(prefix, after)
+        needle = contains.lower()
+        for i in range(lo, hi):
+            if not needle or needle in self.keys[i]:
+                yield self.names[i]
+
+    def page(self, prefix: str = "", contains: str = "", cursor: Optional[str] = None, limit: int = 100) -> dict:
+        after = decode_cursor(cursor) if cursor else None
+        repos, last_key = [], None
+        for name in self.iter(prefix, contains, after):
+            if len(repos) == limit:
+                break
+            repos.append(name)
+            last_key = name.lower()
+        else:
+            last_key = None  # ran out of matches: no further page
+        return {"repos": repos, "next_cursor": encode_cursor(last_key) if last_key else None}
+
+
+def encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except ValueError as e:
+        raise ValueError(f"Invalid repository cursor: {cursor}") from e
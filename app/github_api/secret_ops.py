@@ -1,23 +1,102 @@
-import nacl.encoding, nacl.public
+import asyncio
+import threading
+import urllib.parse
 from base64 import b64encode
 
-def replace_secret(repo, params):
-    name = params["name"]
-    value = params["value"]
+import nacl.encoding, nacl.public
+from github import GithubException
+
+from .executor import run_github
+
+class InvalidParameters(ValueError):
+    """The action's parameters are unusable as given; the caller's fault, not GitHub's."""
 
-    try:
-        public_key = repo.get_actions_secret_public_key()
+# owner path ("/repos/{org}/{repo}" or "/orgs/{org}") -> (key_id, SealedBox)
+_public_keys: dict[str, tuple] = {}
+_public_keys_lock = threading.Lock()
+
+def get_sealed_box(requester, owner_path: str, refresh: bool = False) -> tuple:
+    cached = None if refresh else _public_keys.get(owner_path)
+    if cached is None:
+        _, data = requester.requestJsonAndCheck("GET", f"{owner_path}/actions/secrets/public-key")
         sealed_box = nacl.public.SealedBox(nacl.public.PublicKey(
-            public_key.key.encode("utf-8"),
+            data["key"].encode("utf-8"),
             nacl.encoding.Base64Encoder
         ))
-        encrypted = sealed_box.encrypt(value.encode("utf-8"))
-        encrypted_value = b64encode(encrypted).decode("utf-8")
+        cached = (data["key_id"], sealed_box)
+        with _public_keys_lock:
+            _public_keys[owner_path] = cached
+    return cached
+
+def _stale_key(e: GithubException) -> bool:
+    # Other 422s (an invalid visibility, unknown repository ids) would fail the same way with a fresh key
+    message = e.data.get("message", "") if isinstance(e.data, dict) else str(e.data)
+    return e.status in (400, 422) and "key" in str(message).lower()
+
+def put_secret(requester, owner_path: str, name: str, value: str, **extra):
+    """Encrypt with the cached public key; if GitHub rejects it as stale, refetch the key once."""
+    url = f"{owner_path}/actions/secrets/{urllib.parse.quote(name, safe='')}"
+    for attempt in range(2):
+        key_id, sealed_box = get_sealed_box(requester, owner_path, refresh=attempt > 0)
+        encrypted_value = b64encode(sealed_box.encrypt(value.encode("utf-8"))).decode("utf-8")
+        try:
+            requester.requestJsonAndCheck("PUT", url, input={"encrypted_value": encrypted_value, "key_id": key_id, **extra})
+            return
+        except GithubException as e:
+            if attempt or not _stale_key(e):
+                raise
+
+async def _in_parallel(org: str, fn, items) -> dict:
+    # Through run_github, so the fan-out shares the org's concurrency limit, lanes and metrics
+    results = await asyncio.gather(*(run_github(org, fn, item) for item in items), return_exceptions=True)
+    return {item: f"error: {r}" if isinstance(r, Exception) else r for item, r in zip(items, results)}
+
+def _repo_names(params) -> list[str]:
+    repos = params.get("repos") or []
+    if isinstance(repos, str):
+        repos = repos.split(",")
+    if not isinstance(repos, list) or not all(isinstance(name, str) for name in repos):
+        raise InvalidParameters("`repos` must be a list of repository names or a comma-separated string")
+    return [name.strip() for name in repos if name.strip()]
+
+def replace_secret(repo, params):
+    name = params["name"]
+    value = params["value"]
+
+    put_secret(repo.requester, f"/repos/{repo.full_name}", name, value)
+    return {"status": "secret replaced", "secret": name}
+
+async def rotate_secret(org, params):
+    """Set one secret value on many repositories (`repos`: a list or comma-separated names)."""
+    name = params["name"]
+    value = params["value"]
+    repos = _repo_names(params)
+
+    def rotate(repo_name):
+        put_secret(org.requester, f"/repos/{org.login}/{repo_name}", name, value)
+        return "rotated"
+
+    outcomes = await _in_parallel(org.login, rotate, repos)
+    failed = sum(outcome != "rotated" for outcome in outcomes.values())
+    return {"status": "secret rotated" if not failed else "secret partially rotated", "secret": name, "repos": outcomes}
+
+async def replace_org_secret(org, params):
+    """Single-call alternative to rotate_secret: one org secret visible to `repos` (or all)."""
+    name = params["name"]
+    value = params["value"]
+    repos = _repo_names(params)
+    visibility = params.get("visibility", "selected" if repos else "private")
+
+    extra = {"visibility": visibility}
+    if visibility == "selected":
+        ids = await _in_parallel(org.login, lambda repo_name: org.get_repo(repo_name).id, repos)
+        missing = [repo_name for repo_name, repo_id in ids.items() if not isinstance(repo_id, int)]
+        if missing:
+            raise InvalidParameters(f"Unknown repositories: {', '.join(missing)}")
+        extra["selected_repository_ids"] = [ids[repo_name] for repo_name in repos]
 
-        repo.create_or_update_secret(name, encrypted_value, key_id=public_key.key_id)
-        return {"status": "secret replaced", "secret": name}
-    except GithubException as e:
-        print(e)
+    await run_github(org.login, put_secret, org.requester, f"/orgs/{org.login}", name, value, **extra)
+    return {"status": "org secret replaced", "secret": name, "visibility": visibility, "repos": repos}
 
 def delete_secret(repo, params):
     name = params["name"]
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from github import Github, GithubException
+
+from .budget import Lane, github_lane
+from .installations import InstallationIndex
+from .transport import register_token, unregister_token
+
+# PyGithub sleeps between calls of each client by default (0.25 s, 1 s before writes). The budget
+# scheduler already paces writes per installation across all clients, so that sleep only adds latency
+UNTHROTTLED = {"seconds_between_requests": None, "seconds_between_writes": None}
+
+# Refresh installation tokens this many seconds before GitHub expires them
+REFRESH_MARGIN = int(os.getenv("GITHUB_TOKEN_REFRESH_MARGIN", "300"))
+
+
+@dataclass
+class InstallationToken:
+    installation_id: int
+    token: str
+    expires_at: float
+    permissions: dict
+    client: Github
+    used: bool = field(default=False, compare=False)
+
+
+class InstallationTokenManager:
+    """
+    Resolves installation ids per (org, repo) from the installation index
+    (which expires and refreshes them) and caches access tokens per installation.
+    Tokens are re-minted in the background shortly before they expire, and
+    concurrent refreshes of the same installation collapse into one call.
+    """
+
+    def __init__(
+        self,
+        integration=None,
+        refresh_margin: int = REFRESH_MARGIN,
+        integration_factory=None,
+        base_url: str = "https://api.github.com",
+        installations: InstallationIndex = None,
+    ):
+        self._integration = integration
+        self._integration_factory = integration_factory
+        self.base_url = base_url
+        self.refresh_margin = refresh_margin
+        self.installations = installations or InstallationIndex(lambda: self.integration)
+        self._tokens: dict[int, InstallationToken] = {}
+        self._locks: dict[int, threading.Lock] = {}
+        self._refreshing: set[int] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def integration(self):
+        # Built on first use, so importing the app doesn't need the App's private key
+        if self._integration is None:
+            self._integration = self._integration_factory()
+        return self._integration
+
+    def installation_id(self, org: str, repo: str = None) -> int:
+        return self.installations.lookup(org, repo)
+
+    def get_token(self, org: str, repo: str = None) -> InstallationToken:
+        inst_id = self.installation_id(org, repo)
+        entry = self._tokens.get(inst_id)
+        remaining = entry.expires_at - time.time() if entry else 0
+
+        if remaining <= 0:
+            try:
+                entry = self._refresh(inst_id, stale=entry)
+            except GithubException as e:
+                if e.status == 404:
+                    # Uninstalled (perhaps reinstalled under a new id) without a webhook reaching us
+                    self.invalidate(installation_id=inst_id, org=org)
+                raise
+        elif remaining <= self.refresh_margin:
+            self._refresh_in_background(inst_id)
+
+        entry.used = True
+        return entry
+
+    def get_client(self, org: str, repo: str = None) -> Github:
+        return self.get_token(org, repo).client
+
+    def invalidate(self, installation_id: int = None, org: str = None):
+        """Forget the installation's token and the org's entries in the installation index."""
+        if installation_id is not None:
+            with self._lock:
+                self._tokens.pop(installation_id, None)
+        self.installations.invalidate(org)
+
+    def _lock_for(self, inst_id: int) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(inst_id, threading.Lock())
+
+    def _refresh(self, inst_id: int, stale: InstallationToken = None) -> InstallationToken:
+        with self._lock_for(inst_id):
+            # Another caller may have refreshed while we waited on the lock
+            current = self._tokens.get(inst_id)
+            if current is not None and current is not stale:
+                return current
+
+            auth = self.integration.get_access_token(inst_id)
+            entry = InstallationToken(
+                installation_id=inst_id,
+                token=auth.token,
+                expires_at=auth.expires_at.timestamp(),
+                permissions=auth.permissions or {},
+                client=Github(auth.token, base_url=self.base_url, **UNTHROTTLED),
+            )
+            self._tokens[inst_id] = entry
+            register_token(entry.token, inst_id)
+            if current is not None:
+                unregister_token(current.token)
+            self._schedule(entry)
+            return entry
+
+    def _refresh_in_background(self, inst_id: int):
+        with self._lock:
+            if inst_id in self._refreshing:
+                return
+            self._refreshing.add(inst_id)
+
+        def run():
+            try:
+                with github_lane(Lane.BACKGROUND):
+                    self._refresh(inst_id, stale=self._tokens.get(inst_id))
+            except Exception:
+                pass  # the next caller refreshes synchronously once the token expires
+            finally:
+                with self._lock:
+                    self._refreshing.discard(inst_id)
+
+        threading.Thread(target=run, name=f"gh-token-refresh-{inst_id}", daemon=True).start()
+
+    def _schedule(self, entry: InstallationToken):
+        delay = max(entry.expires_at - time.time() - self.refresh_margin, 0)
+
+        def fire():
+            # Only keep tokens warm for installations that were used since the last mint
+            if self._tokens.get(entry.installation_id) is entry and entry.used:
+                self._refresh_in_background(entry.installation_id)
+
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        timer.start()
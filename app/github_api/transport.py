@@ -0,0 +1,350 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+from github.Requester import Requester, HTTPSRequestsConnectionClass
+from prometheus_client import REGISTRY, Counter, Gauge
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+from .budget import scheduler
+from ..tracing import count_github_call
+
+# Conditional-request cache for GitHub GETs: 304 responses don't count against the rate limit
+GITHUB_HTTP_CACHE = os.getenv("GITHUB_HTTP_CACHE", "1") == "1"
+GITHUB_HTTP_CACHE_BYTES = int(os.getenv("GITHUB_HTTP_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+# One keep-alive pool per GitHub host, shared by every client in the process
+GITHUB_HTTP_POOL_SIZE = int(os.getenv("GITHUB_HTTP_POOL_SIZE", "32"))
+GITHUB_HTTP_CONNECT_TIMEOUT = float(os.getenv("GITHUB_HTTP_CONNECT_TIMEOUT", "5"))
+GITHUB_HTTP_READ_TIMEOUT = float(os.getenv("GITHUB_HTTP_READ_TIMEOUT", "30"))
+# Retries for connection errors, for 429/5xx answers to GETs and for rate-limited answers to anything;
+# backoff doubles from GITHUB_HTTP_BACKOFF
+GITHUB_HTTP_RETRIES = int(os.getenv("GITHUB_HTTP_RETRIES", "3"))
+GITHUB_HTTP_BACKOFF = float(os.getenv("GITHUB_HTTP_BACKOFF", "0.5"))
+# Rate-limited answers (403/429 with Retry-After or X-RateLimit-Remaining: 0) are retried, for any
+# method, when GitHub asks for at most this long; longer waits go back to the caller
+GITHUB_HTTP_RATE_LIMIT_WAIT = float(os.getenv("GITHUB_HTTP_RATE_LIMIT_WAIT", "60"))
+
+HTTP_CACHE_REQUESTS = Counter(
+    "mcp_github_http_cache_requests_total",
+    "GitHub GETs by conditional cache outcome (hit = 304 served from cache)",
+    ["result"],
+)
+HTTP_CACHE_BYTES = Gauge("mcp_github_http_cache_bytes", "Bytes of GitHub response bodies held in the HTTP cache")
+HTTP_CACHE_ENTRIES = Gauge("mcp_github_http_cache_entries", "GitHub responses held in the HTTP cache")
+
+
+@dataclass
+class CachedEntry:
+    etag: str
+    last_modified: str
+    headers: dict
+    body: str
+    size: int
+
+
+class ResponseCache:
+    """LRU of GitHub GET responses keyed by (installation, url), bounded by body bytes."""
+
+    def __init__(self, max_bytes: int = GITHUB_HTTP_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[tuple, CachedEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, entry: CachedEntry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            self._entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+            HTTP_CACHE_BYTES.set(self.bytes)
+            HTTP_CACHE_ENTRIES.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            HTTP_CACHE_BYTES.set(0)
+            HTTP_CACHE_ENTRIES.set(0)
+
+
+response_cache = ResponseCache()
+
+
+class GitHubRetry(Retry):
+    """
+    Retry that also waits out GitHub's secondary rate limits, which arrive as
+    403 (or 429) with Retry-After, or with X-RateLimit-Remaining: 0 and a
+    reset time. GitHub turns those requests away before acting on them, so
+    writes are retried too. A plain 403 is a permission error and is returned.
+    """
+
+    max_rate_limit_wait = GITHUB_HTTP_RATE_LIMIT_WAIT
+
+    def rate_limit_wait(self, response) -> Optional[float]:
+        """Seconds GitHub asks us to wait, or None if `response` is not rate-limited."""
+        if response is None or response.status not in (403, 429):
+            return None
+        if response.headers.get("Retry-After"):
+            return self.parse_retry_after(response.headers["Retry-After"])
+        if response.headers.get("X-RateLimit-Remaining") == "0" and response.headers.get("X-RateLimit-Reset"):
+            return max(float(response.headers["X-RateLimit-Reset"]) - time.time(), 0.0)
+        return None
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code in (403, 429) and self.total:
+            return True  # increment() decides once it can see the headers
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None and response.status in (403, 429):
+            wait = self.rate_limit_wait(response)
+            if wait is None:
+                retry = super().is_retry(method, response.status)  # plain 429 on a GET backs off as before
+            else:
+                retry = wait <= self.max_rate_limit_wait
+            if not retry:
+                # With raise_on_status off this hands the response back as it is
+                raise MaxRetryError(_pool, url, ResponseError(f"{response.status} is not retried"))
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+    def sleep(self, response=None):
+        wait = self.rate_limit_wait(response)
+        if wait is not None:
+            time.sleep(wait)
+        else:
+            super().sleep(response)
+
+
+class HTTPPool:
+    """
+    The requests Session all GitHub connections share, so TCP and TLS
+    handshakes are paid once per pooled connection instead of once per client.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = GITHUB_HTTP_POOL_SIZE,
+        retries: int = GITHUB_HTTP_RETRIES,
+        backoff: float = GITHUB_HTTP_BACKOFF,
+        timeout: tuple = (GITHUB_HTTP_CONNECT_TIMEOUT, GITHUB_HTTP_READ_TIMEOUT),
+    ):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.adapter = requests.adapters.HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_size,
+            max_retries=GitHubRetry(
+                total=retries,
+                # Only idempotent requests are retried once they may have reached GitHub
+                allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+                status_forcelist=(429, 500, 502, 503, 504),
+                backoff_factor=backoff,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        )
+        self.session = requests.Session()
+        # Anything but None stops requests from falling back to ~/.netrc credentials
+        self.session.auth = Requester.noopAuth
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def stats(self) -> dict:
+        """Per host: connections opened, requests sent, and connections in use right now."""
+        pools = self.adapter.poolmanager.pools
+        stats = {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats[pool.host] = {
+                "opened": pool.num_connections,
+                "requests": pool.num_requests,
+                # The queue holds idle connections and placeholders for ones never opened
+                "in_use": pool.pool.maxsize - pool.pool.qsize() if pool.pool is not None else 0,
+            }
+        return stats
+
+
+http_pool = HTTPPool()
+
+
+class HTTPPoolCollector:
+    """Pool utilization and connection reuse, read from urllib3's own counters at scrape time."""
+
+    def __init__(self, pool: HTTPPool):
+        self.pool = pool
+
+    def collect(self):
+        opened = CounterMetricFamily("mcp_github_http_connections_opened", "TCP connections opened to GitHub", labels=["host"])
+        sent = CounterMetricFamily("mcp_github_http_requests", "HTTP requests sent to GitHub, retries included", labels=["host"])
+        in_use = GaugeMetricFamily("mcp_github_http_pool_in_use", "Pooled GitHub connections currently in use", labels=["host"])
+        size = GaugeMetricFamily("mcp_github_http_pool_size", "Connections each GitHub host pool keeps alive")
+        for host, stats in self.pool.stats().items():
+            opened.add_metric([host], stats["opened"])
+            sent.add_metric([host], stats["requests"])
+            in_use.add_metric([host], stats["in_use"])
+        size.add_metric([], self.pool.pool_size)
+        return [opened, sent, in_use, size]
+
+
+REGISTRY.register(HTTPPoolCollector(http_pool))
+
+# Installation tokens rotate hourly; keying on the installation keeps entries valid across rotations
+_token_owners: dict[str, int] = {}
+
+
+def register_token(token: str, installation_id: int):
+    _token_owners[token] = installation_id
+
+
+def unregister_token(token: str):
+    _token_owners.pop(token, None)
+
+
+def cache_identity(headers: dict) -> str:
+    authorization = headers.get("Authorization", "")
+    scheme, _, credential = authorization.partition(" ")
+    if scheme.lower() == "bearer":
+        return "app"  # app JWTs change on every mint
+    if credential in _token_owners:
+        return f"installation:{_token_owners[credential]}"
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()[:16]
+
+
+class CachedResponse:
+    # mimics github.Requester.RequestsResponse for a body served from the cache
+    def __init__(self, status: int, headers: dict, body: str, revalidation_headers: dict = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        # Headers of the 304 itself; the merged ones carry the cached response's stale rate-limit values
+        self.revalidation_headers = revalidation_headers or {}
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.body
+
+    def iter_content(self, chunk_size=1):
+        encoded = self.body.encode("utf-8")
+        step = chunk_size or len(encoded) or 1
+        for i in range(0, len(encoded), step):
+            yield encoded[i:i + step]
+
+    def raise_for_status(self):
+        pass
+
+
+class GitHubConnection(HTTPSRequestsConnectionClass):
+    """
+    PyGithub connection used by every client in the process. It sends
+    through the shared HTTPPool, each call waits for its installation's
+    rate-limit budget, and GETs are revalidated with If-None-Match /
+    If-Modified-Since so a 304 turns back into the cached 200.
+    """
+
+    cache = response_cache
+    budget = scheduler
+    pool = http_pool
+
+    def __init__(self, host, port=None, strict=False, timeout=None, retry=None, pool_size=None, **kwargs):
+        # Not calling super(): it would build a Session per connection, and PyGithub makes one per request.
+        # PyGithub's `retry` is dropped; the pool's GitHubRetry covers the rate limits it handled
+        self.host = host
+        self.port = port or 443
+        self.protocol = "https"
+        self.verify = kwargs.get("verify", True)
+        self.timeout = self.pool.timeout
+        self.session = self.pool.session
+        self.adapter = self.pool.adapter
+
+    def close(self):
+        pass  # the session outlives every connection object
+
+    def getresponse(self):
+        identity = cache_identity(self.headers)
+        count_github_call()
+        with self.budget.slot(identity, self.verb):
+            response = self._cached_response(identity)
+            if isinstance(response, CachedResponse):
+                # GitHub doesn't charge conditional requests answered with 304
+                self.budget.observe(identity, 304, response.revalidation_headers, counted=False)
+            else:
+                self.budget.observe(identity, response.status, response.headers)
+        return response
+
+    def _cached_response(self, identity: str):
+        if not GITHUB_HTTP_CACHE or self.verb != "GET" or self.stream:
+            return super().getresponse()
+
+        key = (identity, self.host, self.url)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.headers = dict(self.headers)
+            if entry.etag:
+                self.headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                self.headers["If-Modified-Since"] = entry.last_modified
+
+        response = super().getresponse()
+
+        if response.status == 304 and entry is not None:
+            HTTP_CACHE_REQUESTS.labels(result="hit").inc()
+            # Keep cached validators/pagination links, refresh rate-limit headers
+            revalidation_headers = {k.lower(): v for k, v in response.getheaders()}
+            return CachedResponse(200, {**entry.headers, **revalidation_headers}, entry.body, revalidation_headers)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status == 200 and (etag or last_modified):
+            body = response.read()
+            self.cache.put(key, CachedEntry(
+                etag=etag,
+                last_modified=last_modified,
+                headers={k.lower(): v for k, v in response.getheaders()},
+                body=body,
+                size=len(body.encode("utf-8")),
+            ))
+            HTTP_CACHE_REQUESTS.labels(result="miss" if entry is None else "changed").inc()
+        else:
+            HTTP_CACHE_REQUESTS.labels(result="uncacheable").inc()
+        return response
+
+
+class PlainGitHubConnection(GitHubConnection):
+    """GitHubConnection for an http:// GITHUB_API_URL, e.g. a local stand-in."""
+
+    def __init__(self, host, port=None, *args, **kwargs):
+        super().__init__(host, port or 80, *args, **kwargs)
+        self.protocol = "http"
+
+
+def install():
+    """Route every PyGithub client in this process through GitHubConnection."""
+    # This also makes each Requester create a connection object per request. They are cheap now that
+    # they share one pooled session, and unlike a persistent one they are never used by two threads at once
+    Requester.injectConnectionClasses(PlainGitHubConnection, GitHubConnection)
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+
+from .authz import tokens
+from .identity import patch_installation_repos, invalidate_installation_repos, invalidate_installation_metadata
+from .membership import get_cached_snapshot, drop_snapshot, publish_snapshot, refresh_in_background
+
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
+
+WEBHOOK_EVENTS = Counter("mcp_github_webhooks_total", "GitHub webhook deliveries", ["event", "result"])
+
+
+def verify_signature(secret: str, body: bytes, signature: str) -> bool:
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={expected}", signature)
+
+
+def _org_login(payload: dict):
+    return (payload.get("organization") or {}).get("login")
+
+
+def on_membership(payload: dict) -> list:
+    snapshot = get_cached_snapshot(_org_login(payload))
+    team_slug = (payload.get("team") or {}).get("slug")
+    username = (payload.get("member") or {}).get("login")
+    if snapshot is None or payload.get("scope") != "team" or not team_slug or not username:
+        return []
+    action = payload.get("action")
+    if action == "added":
+        snapshot.add_member(team_slug, username)
+    elif action == "removed":
+        snapshot.remove_member(team_slug, username)
+    else:
+        return []
+    publish_snapshot(snapshot)
+    return [f"membership:{team_slug}:{action}"]
+
+
+def on_team(payload: dict) -> list:
+    org = _org_login(payload)
+    snapshot = get_cached_snapshot(org)
+    team_slug = (payload.get("team") or {}).get("slug")
+    if snapshot is None or not team_slug:
+        return []
+    action = payload.get("action")
+    if action == "created":
+        snapshot.set_team_members(team_slug, [])
+        publish_snapshot(snapshot)
+    elif action == "deleted":
+        snapshot.remove_team(team_slug)
+        publish_snapshot(snapshot)
+    elif action == "edited":
+        # A rename changes the slug, and the payload does not carry the old one
+        refresh_in_background(org)
+    else:
+        return []
+    return [f"team:{team_slug}:{action}"]
+
+
+def on_repository(payload: dict) -> list:
+    org = _org_login(payload)
+    repo = payload.get("repository") or {}
+    full_name = repo.get("full_name")
+    if not org or not full_name:
+        return []
+    action = payload.get("action")
+    if action == "created":
+        patch_installation_repos(org, added=[full_name])
+    elif action == "deleted":
+        patch_installation_repos(org, removed=[full_name])
+    elif action == "renamed":
+        old_name = payload.get("changes", {}).get("repository", {}).get("name", {}).get("from")
+        patch_installation_repos(org, added=[full_name], removed=[f"{org}/{old_name}"] if old_name else [])
+    elif action == "transferred":
+        old_owner = (payload.get("changes", {}).get("owner", {}).get("from", {}).get("organization") or {}).get("login")
+        if old_owner:
+            patch_installation_repos(old_owner, removed=[f"{old_owner}/{repo.get('name')}"])
+        patch_installation_repos(org, added=[full_name])
+    else:
+        return []
+    return [f"repository:{full_name}:{action}"]
+
+
+def on_installation(payload: dict) -> list:
+    installation = payload.get("installation") or {}
+    account = (installation.get("account") or {}).get("login")
+    tokens.invalidate(installation_id=installation.get("id"), org=account)
+    if account:
+        invalidate_installation_repos(account)
+        invalidate_installation_metadata(account)
+        if payload.get("action") in ("deleted", "suspend"):
+            drop_snapshot(account)
+    return [f"installation:{installation.get('id')}:{payload.get('action')}"]
+
+
+HANDLERS = {
+    "membership": on_membership,
+    "team": on_team,
+    "repository": on_repository,
+    "installation": on_installation,
+    "installation_repositories": on_installation,
+}
+
+
+async def github_webhook(request: Request):
+    """
+    Receive signed GitHub webhooks and apply them to the cached membership,
+    repository and installation data.
+    """
+    event = request.headers.get("X-GitHub-Event", "")
+    label = event if event in HANDLERS or event == "ping" else "other"
+
+    if not GITHUB_WEBHOOK_SECRET:
+        WEBHOOK_EVENTS.labels(event=label, result="disabled").inc()
+        return JSONResponse({"detail": "Webhooks are not configured"}, status_code=503)
+
+    body = await request.body()
+    if not verify_signature(GITHUB_WEBHOOK_SECRET, body, request.headers.get("X-Hub-Signature-256", "")):
+        WEBHOOK_EVENTS.labels(event=label, result="bad_signature").inc()
+        return JSONResponse({"detail": "Invalid signature"}, status_code=401)
+
+    if event == "ping":
+        WEBHOOK_EVENTS.labels(event=label, result="ok").inc()
+        return JSONResponse({"status": "pong"})
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        # Signed but unusable; a 4xx tells GitHub not to redeliver it
+        WEBHOOK_EVENTS.labels(event=label, result="bad_payload").inc()
+        return JSONResponse({"detail": "Invalid JSON payload"}, status_code=400)
+
+    handler = HANDLERS.get(event)
+    # Handlers write the shared L2 cache and re-encode whole snapshots and repo indexes; keep that off the loop
+    applied = await asyncio.to_thread(handler, payload) if handler else []
+    WEBHOOK_EVENTS.labels(event=label, result="applied" if applied else "ignored").inc()
+    return JSONResponse({"status": "ok", "event": event, "applied": applied})
@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+import asyncio
+from typing import Optional, Callable, Awaitable
+
+from cachetools import TTLCache
+from fastapi import HTTPException
+from prometheus_client import Counter
+
+from .models import ActionRequest
+from .github_api.policy import enforce_policy
+
+# Completed results are replayed for this long; derived keys (no Idempotency-Key header)
+# only guard against quick client retries, so they expire much sooner.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "600"))
+IDEMPOTENCY_DERIVED_TTL = int(os.getenv("IDEMPOTENCY_DERIVED_TTL", "30"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "4096"))
+
+IDEMPOTENT_REQUESTS = Counter("mcp_idempotent_requests_total", "Requests by idempotency outcome", ["outcome"])
+
+def fingerprint(action: ActionRequest, user: dict) -> str:
+    """Hash of the action after policy normalization, so equivalent requests collide."""
+    try:
+        normalized = enforce_policy(action, user).dict()
+    except Exception:
+        normalized = action.dict()
+    raw = json.dumps([user.get("sub"), user.get("email"), normalized], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class IdempotencyStore:
+    """
+    Collapses duplicate requests: identical in-flight requests share the first
+    one's future, and completed results are replayed from a bounded TTL store.
+    Failures are not stored, so a retry after an error runs again.
+    """
+
+    def __init__(
+        self,
+        ttl: int = IDEMPOTENCY_TTL,
+        derived_ttl: int = IDEMPOTENCY_DERIVED_TTL,
+        max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+    ):
+        self._inflight: dict[str, tuple[str, asyncio.Future]] = {}
+        self._explicit = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._derived = TTLCache(maxsize=max_entries, ttl=derived_ttl)
+        # The user's most recently completed key per scope; only that derived key may replay, so A, B, A runs A twice
+        self._last_completed = TTLCache(maxsize=max_entries, ttl=derived_ttl)
+
+    async def run(
+        self,
+        scope: str,
+        action: ActionRequest,
+        user: dict,
+        fn: Callable[[], Awaitable[dict]],
+        idempotency_key: Optional[str] = None,
+    ) -> tuple[dict, bool]:
+        """Returns (result, replayed)."""
+        digest = fingerprint(action, user)
+        last_key = f"{scope}:{user.get('sub')}:{user.get('email')}"
+        if idempotency_key:
+            key = f"{scope}:{user.get('sub')}:key:{idempotency_key}"
+            completed = self._explicit
+        else:
+            key = f"{scope}:derived:{digest}"
+            completed = self._derived
+            if key in completed and self._last_completed.get(last_key) != key:
+                # Another request came in between, so this one is a new write rather than a retry
+                del completed[key]
+
+        if key in completed:
+            stored_digest, result = completed[key]
+            self._check(stored_digest, digest)
+            IDEMPOTENT_REQUESTS.labels(outcome="replayed").inc()
+            return result, True
+
+        if key in self._inflight:
+            stored_digest, future = self._inflight[key]
+            self._check(stored_digest, digest)
+            IDEMPOTENT_REQUESTS.labels(outcome="coalesced").inc()
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on a failed future; mark its exception as retrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = (digest, future)
+        IDEMPOTENT_REQUESTS.labels(outcome="executed").inc()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            completed[key] = (digest, result)
+            self._last_completed[last_key] = key
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _check(stored_digest: str, digest: str):
+        if stored_digest != digest:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,207 @@
+import os
+import json
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Callable, Awaitable
+
+from fastapi import HTTPException
+from prometheus_client import Gauge, Counter
+from sqlalchemy import Column, Integer, String, DateTime, Text, func, select, update
+
+from .audit import Base, SessionLocal
+from .models import ActionRequest
+
+# Workers draining the job queue; jobs left queued, or running under an expired lease, resume on start
+# and on a sweep every third of the lease, so a crashed process's jobs are taken over while others run
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# How long a claimed job belongs to its worker process without a renewal (renewed every third of it)
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+JOBS_QUEUED = Gauge("mcp_jobs_queued", "Async action jobs waiting for a worker")
+JOBS_FINISHED = Counter("mcp_jobs_finished_total", "Async action jobs finished", ["status"])
+
+logger = logging.getLogger(__name__)
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, index=True)  # queued | running | succeeded | failed
+    user = Column(Text)
+    user_email = Column(String, index=True)
+    action = Column(Text)
+    result = Column(Text)
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    owner = Column(String)
+    lease_until = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+def job_to_dict(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "action": json.loads(job.action),
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+    }
+
+class JobRunner:
+    """
+    Persistent async mode for /act: jobs are stored in the audit database,
+    run by a fixed pool of worker tasks, and picked up again after a restart.
+    Every process sharing the database may queue the same job id; a worker
+    claims it with a conditional UPDATE, so exactly one of them runs it.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, lease: int = JOB_LEASE_SECONDS):
+        self.workers = workers
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: set[str] = set()  # ids in self.queue, so a sweep doesn't queue them twice
+        self.tasks: list[asyncio.Task] = []
+        self.handler: Optional[Callable[[ActionRequest, dict], Awaitable[dict]]] = None
+
+    async def start(self, handler: Callable[[ActionRequest, dict], Awaitable[dict]]):
+        self.handler = handler
+        self.queue = asyncio.Queue()
+        self.pending = set()
+        await self._sweep()
+        self.tasks = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._sweeper(), name="job-sweeper"))
+
+    async def stop(self):
+        # Unfinished jobs go back to queued, so the next start (or another process) picks them up at once
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        async with SessionLocal() as session:
+            await session.execute(
+                update(Job).where(Job.owner == self.owner, Job.status == "running")
+                .values(status="queued", owner=None, lease_until=None)
+            )
+            await session.commit()
+
+    async def submit(self, action: ActionRequest, user: dict) -> dict:
+        if self.queue is None:
+            raise HTTPException(status_code=503, detail="Job runner is not running")
+        job = Job(
+            id=uuid.uuid4().hex,
+            status="queued",
+            user=json.dumps(user, default=str),
+            user_email=user.get("email"),
+            action=action.model_dump_json(),
+        )
+        async with SessionLocal() as session:
+            session.add(job)
+            await session.commit()
+        self._enqueue(job.id)
+        return job_to_dict(job)
+
+    async def get(self, job_id: str, user: dict) -> Optional[dict]:
+        async with SessionLocal() as session:
+            job = await session.get(Job, job_id)
+        if job is None or job.user_email != user.get("email"):
+            return None
+        return job_to_dict(job)
+
+    def _enqueue(self, job_id: str):
+        if job_id not in self.pending:
+            self.pending.add(job_id)
+            self.queue.put_nowait(job_id)
+        JOBS_QUEUED.set(self.queue.qsize())
+
+    async def _sweep(self):
+        """Queue every job that can run: expired leases (the process died) and queued rows no worker holds."""
+        for job_id in await self._resumable():
+            self._enqueue(job_id)
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self._sweep()
+            except Exception:
+                logger.exception("Job sweep failed")
+
+    async def _resumable(self) -> list[str]:
+        async with SessionLocal() as session:
+            # A job whose process died is retried from the start once its lease runs out;
+            # jobs other live workers hold keep renewing theirs
+            await session.execute(
+                update(Job)
+                .where(Job.status == "running", Job.lease_until.is_(None) | (Job.lease_until < datetime.utcnow()))
+                .values(status="queued", owner=None, lease_until=None)
+            )
+            await session.commit()
+            result = await session.execute(select(Job.id).where(Job.status == "queued").order_by(Job.created_at))
+            return list(result.scalars().all())
+
+    async def _claim(self, job_id: str) -> bool:
+        now = datetime.utcnow()
+        async with SessionLocal() as session:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "queued")
+                .values(
+                    status="running", owner=self.owner, lease_until=now + timedelta(seconds=self.lease),
+                    attempts=func.coalesce(Job.attempts, 0) + 1, updated_at=now,
+                )
+            )
+            await session.commit()
+        return result.rowcount == 1
+
+    async def _renew(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await self._set(job_id, lease_until=datetime.utcnow() + timedelta(seconds=self.lease))
+
+    async def _set(self, job_id: str, **values):
+        # Only while this process still owns the job; a worker that lost its lease must not overwrite the new run
+        async with SessionLocal() as session:
+            await session.execute(
+                update(Job).where(Job.id == job_id, Job.owner == self.owner).values(updated_at=datetime.utcnow(), **values)
+            )
+            await session.commit()
+
+    async def _work(self):
+        while True:
+            job_id = await self.queue.get()
+            self.pending.discard(job_id)
+            JOBS_QUEUED.set(self.queue.qsize())
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Job %s crashed", job_id)
+
+    async def _run(self, job_id: str):
+        if not await self._claim(job_id):
+            return  # finished, or claimed by another worker
+        async with SessionLocal() as session:
+            job = await session.get(Job, job_id)
+
+        renewal = asyncio.create_task(self._renew(job_id))
+        try:
+            result = await self.handler(ActionRequest.model_validate_json(job.action), json.loads(job.user))
+        except HTTPException as e:
+            await self._set(job_id, status="failed", error=str(e.detail))
+            JOBS_FINISHED.labels(status="failed").inc()
+        except Exception as e:
+            await self._set(job_id, status="failed", error=str(e))
+            JOBS_FINISHED.labels(status="failed").inc()
+        else:
+            await self._set(job_id, status="succeeded", result=json.dumps(result, default=str))
+            JOBS_FINISHED.labels(status="succeeded").inc()
+        finally:
+            renewal.cancel()
+
+job_runner = JobRunner()
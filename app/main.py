@@ -1,25 +1,43 @@
-from fastapi import FastAPI, Request, Depends, HTTPException, Query
+from fastapi import FastAPI, Request, Response, Depends, HTTPException, Query, Header
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
+from github import GithubException
 
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, Counter, Histogram
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from typing import Optional, List
+from datetime import datetime
 import os
+import json
+import logging
+import time
 
-from .auth import login, auth_callback, get_current_user
-from .models import ActionRequest
-from .github_api.identity import get_identity_report
-from .github_api.dispatcher import perform_github_action
-from .github_api.authz import get_app_client, is_org_admin
-from .audit import init_db, log_action, query_audit_logs
+from .auth import login, auth_callback, get_mcp_user
+from .models import ActionRequest, BatchActionRequest, DesiredState
+from .github_api.identity import get_identity_report, get_installation_repos
+from .github_api.dispatcher import UnauthorizedError, perform_github_action, perform_github_actions
+from .github_api.mutations import superseded_by
+from .github_api.reconcile import reconcile
+from .github_api.authz import get_app_client, get_membership_snapshot, is_org_admin
+from .github_api.executor import run_github, shutdown_executor
+from .github_api.installations import InstallationNotFound
+from .github_api.secret_ops import InvalidParameters
+from .github_api.webhooks import github_webhook
+from .jobs import job_runner
+from .idempotency import idempotency_store
+from .ratelimit import limiter, rate_limited
+from .cache import warm_caches
+from .warmup import warmup
+from .tracing import start_trace, finish_trace, exporter as trace_exporter
+from .audit import (
+    init_db, log_action, log_actions, query_audit_logs, query_audit_page, audit_writer, audit_retention,
+    stream_audit_entries, export_ndjson, export_csv, audit_stats, archived_before,
+)
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="MCP GitHub Control Server",
@@ -34,52 +52,63 @@ app = FastAPI(
 REQUEST_COUNT = Counter("mcp_requests_total", "Total MCP requests", ["method", "endpoint"])
 REQUEST_LATENCY = Histogram("mcp_request_latency_seconds", "Request latency", ["endpoint"])
 
-limiter = Limiter(key_func=get_remote_address)
-
 app.mount("/.well-known", StaticFiles(directory="app/static/.well-known"), name="well-known")
-app.state.limiter = limiter
-app.add_middleware(SlowAPIMiddleware)
-app.add_exception_handler(RateLimitExceeded, lambda request, exc: PlainTextResponse("Too Many Requests", status_code=429))
-
-
-@app.middleware("http")
-async def rate_limiter(request: Request, call_next):
-    response = await limiter.middleware(request, call_next)
-    return response
 
 @app.get("/metrics", include_in_schema=False)
 def metrics():
     return PlainTextResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.get("/healthz", tags=["meta"], summary="Basic health check", include_in_schema=True)
-@limiter.exempt
-def healthz():
-    return {"status": "ok"}
+def healthz(ready: bool = Query(False, description="Report 503 until startup warm-up has finished")):
+    if not ready:
+        return {"status": "ok"}
+    status = warmup.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming up", **status})
+    return {"status": "ok", **status}
 
 @app.middleware("http")
-async def metrics_and_ratelimit(request: Request, call_next):
-    endpoint = request.url.path
-    method = request.method
-
-    start_time = time.time()
+async def request_metrics(request: Request, call_next):
+    start_time = time.perf_counter()
+    # Stage spans and GitHub calls made while serving the request are collected on this trace
+    trace = start_trace()
     try:
-        response = await limiter.middleware(request, call_next)
+        response = await call_next(request)
     finally:
-        duration = time.time() - start_time
-        REQUEST_LATENCY.labels(endpoint=endpoint).observe(duration)
-        REQUEST_COUNT.labels(method=method, endpoint=endpoint).inc()
-
+        # Label by route template (/repos/{org}), not the raw path, to keep series bounded
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        REQUEST_LATENCY.labels(endpoint=endpoint).observe(time.perf_counter() - start_time)
+        REQUEST_COUNT.labels(method=request.method, endpoint=endpoint).inc()
+        finish_trace(trace, f"{request.method} {endpoint}", endpoint)
     return response
 
-
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    # Start from what other workers (or the previous run) already fetched
+    warm_caches()
+    await audit_writer.start()
+    audit_retention.start()
+    await job_runner.start(run_action)
+    warmup.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await warmup.stop()
+    await job_runner.stop()
+    await audit_retention.stop()
+    await audit_writer.stop()
+    trace_exporter.flush()
+    shutdown_executor()
 
 # Azure AD OAuth entrypoints
 app.add_route("/login", login, methods=["GET"])
 app.add_route("/auth/callback", auth_callback, methods=["GET"])
 
+# GitHub App webhooks (HMAC-verified with GITHUB_WEBHOOK_SECRET)
+app.add_route("/webhooks/github", github_webhook, methods=["POST"])
+
 # Open CORS for Codespaces/VSC integration
 app.add_middleware(
     CORSMiddleware,
@@ -98,41 +127,277 @@ async def root():
         "message": "Welcome to the MCP GitHub Server",
         "docs": "/docs",
         "openapi": "/openapi.json",
-        "actions": ["/act", "/audit", "/me"],
+        "actions": ["/act", "/reconcile", "/audit", "/audit/export", "/audit/stats", "/me"],
         "auth": ["/login", "/auth/callback"]
     }
 
+@app.get("/me", tags=["identity"], summary="View identity, orgs, teams, repo access, token metadata")
+async def me(user=Depends(rate_limited("read"))):
+    return await get_identity_report(user)
+
+async def require_org_member(user: dict, org: str):
+    # Checked before any GitHub call, so arbitrary org names cost nothing and leave nothing behind
+    orgs = {o.strip().lower() for o in os.getenv("GITHUB_ORGS", "").split(",") if o.strip()}
+    if org.lower() not in orgs:
+        raise HTTPException(status_code=404, detail=f"Org {org} is not served by this server")
+
+    snapshot = await run_github(org, get_membership_snapshot, org)
+    if not snapshot.teams_for(user["email"].split("@")[0]):
+        raise HTTPException(status_code=403, detail="Only members of the org's teams may list its repositories")
+
+@app.get("/repos/{org}", tags=["identity"], summary="Page or stream the repositories the GitHub App can access")
+async def list_repos(
+    org: str,
+    user=Depends(rate_limited("read")),
+    prefix: str = Query("", description="Repository name prefix (case-insensitive)"),
+    contains: str = Query("", description="Substring of the full name (case-insensitive)"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    try:
+        await require_org_member(user, org)
+        repos = await run_github(org, get_installation_repos, org)
+    except InstallationNotFound as e:
+        raise HTTPException(status_code=404, detail=e.data["message"])
+    except GithubException as e:
+        # Anything but a 404 means GitHub failed us, not that the caller asked for the wrong thing
+        raise HTTPException(status_code=404 if e.status == 404 else 502, detail=f"GitHub error listing repositories: {e.status}")
+
+    if format == "ndjson":
+        lines = (json.dumps({"full_name": name}) + "\n" for name in repos.iter(prefix, contains))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    try:
+        return repos.page(prefix=prefix, contains=contains, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/act")
-@mcp.tool(name="github.act", description="Perform GitHub action via MCP")
-@limiter("5/minute")
 async def act_on_github(
     request: Request,
+    response: Response,
     action: ActionRequest,
-    user=Depends(get_current_user)
+    user=Depends(rate_limited("mutation")),
+    run_async: bool = Query(False, alias="async", description="Queue the action and return 202 with a job id"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     Dispatch a GitHub action (e.g., create repo, manage secrets) using GitHub App installation token.
+    Retries with the same `Idempotency-Key` (or an identical action shortly after) replay the
+    first result instead of calling GitHub again.
     """
+    if run_async or "respond-async" in request.headers.get("Prefer", ""):
+        job, replayed = await idempotency_store.run(
+            "job", action, user, lambda: job_runner.submit(action, user), idempotency_key
+        )
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job["id"], "status": job["status"], "href": f"/jobs/{job['id']}"},
+            headers={"Location": f"/jobs/{job['id']}", "Idempotent-Replayed": str(replayed).lower()}
+        )
+    result, replayed = await idempotency_store.run(
+        "act", action, user, lambda: run_action(action, user), idempotency_key
+    )
+    response.headers["Idempotent-Replayed"] = str(replayed).lower()
+    return result
+
+@mcp.tool(name="github.act", description="Perform GitHub action via MCP; set run_async for long-running actions")
+async def mcp_act(action: ActionRequest, ctx: Context, run_async: bool = False, idempotency_key: Optional[str] = None):
+    user = await get_mcp_user(ctx)
+    limiter.check(user, "mutation")
+    if run_async:
+        job, _ = await idempotency_store.run("job", action, user, lambda: job_runner.submit(action, user), idempotency_key)
+        return job
+    result, _ = await idempotency_store.run("act", action, user, lambda: run_action(action, user), idempotency_key)
+    return result
+
+@app.get("/jobs/{job_id}", tags=["actions"], summary="Poll an asynchronous /act job")
+async def get_job(job_id: str, user=Depends(rate_limited("read"))):
+    job = await job_runner.get(job_id, user)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@mcp.tool(name="github.job_status", description="Poll an asynchronous github.act job")
+async def mcp_job_status(job_id: str, ctx: Context):
+    user = await get_mcp_user(ctx)
+    limiter.check(user, "read")
+    return await get_job(job_id, user)
+
+async def run_action(action: ActionRequest, user: dict):
     try:
         result = await perform_github_action(action=action, user=user)
-        await log_action(user=user, action=action, result="success")
-        return {"status": "ok", "details": result}
     except Exception as e:
         await log_action(user=user, action=action, result=f"error: {str(e)}")
+        if isinstance(e, InvalidParameters):
+            raise HTTPException(status_code=400, detail=str(e))
         raise HTTPException(status_code=500, detail=f"GitHub action failed: {e}")
+    # A later write to the same target replaced this one before it ran
+    by = superseded_by(result)
+    try:
+        await log_action(user=user, action=action, result=f"superseded by {by}" if by else "success")
+    except Exception:
+        logger.exception("Failed to audit %s by %s", action.action, user.get("email"))
+    return result if by else {"status": "ok", "details": result}
+
+def audit_outcome(result: dict) -> str:
+    if result["status"] == "superseded":
+        return f"superseded by {result['by']}"
+    return "success" if result["status"] == "ok" else f"error: {result['error']}"
+
+async def audit_results(user: dict, executed: list):
+    """Audit (action, result) pairs. The writes already happened, so an audit failure must not hide their results."""
+    try:
+        await log_actions(user, [(action, audit_outcome(r)) for action, r in executed])
+    except Exception:
+        logger.exception("Failed to audit %d GitHub actions by %s", len(executed), user.get("email"))
+
+@app.post("/act/batch")
+async def act_on_github_batch(
+    batch: BatchActionRequest,
+    user=Depends(rate_limited("mutation"))
+):
+    """
+    Dispatch several GitHub actions at once. Actions on the same org/repo share
+    one client and authorization decision; each action gets its own result.
+    """
+    return await run_batch(batch, user)
+
+@mcp.tool(name="github.act_batch", description="Perform several GitHub actions via MCP")
+async def mcp_act_batch(batch: BatchActionRequest, ctx: Context):
+    user = await get_mcp_user(ctx)
+    limiter.check(user, "mutation")
+    return await run_batch(batch, user)
+
+async def run_batch(batch: BatchActionRequest, user: dict):
+    results = await perform_github_actions(batch.actions, user)
+    await audit_results(user, list(zip(batch.actions, results)))
+    failed = sum(r["status"] == "error" for r in results)
+    return {"status": "ok" if not failed else "partial", "failed": failed, "results": results}
+
+@app.post("/reconcile")
+async def reconcile_org(
+    state: DesiredState,
+    user=Depends(rate_limited("mutation")),
+    dry_run: bool = Query(False, description="Only return the plan")
+):
+    """
+    Bring an org's repos, team rosters and secrets to the desired state,
+    issuing only the mutations needed. With `prune`, members and secrets
+    missing from the document are removed.
+    """
+    return await run_reconcile(state, user, dry_run)
+
+@mcp.tool(name="github.reconcile", description="Apply a desired-state document to an org; dry_run returns the plan")
+async def mcp_reconcile(state: DesiredState, ctx: Context, dry_run: bool = False):
+    user = await get_mcp_user(ctx)
+    limiter.check(user, "mutation")
+    return await run_reconcile(state, user, dry_run)
+
+async def run_reconcile(state: DesiredState, user: dict, dry_run: bool):
+    try:
+        report, executed = await reconcile(state, user, dry_run=dry_run)
+    except UnauthorizedError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reconcile failed: {e}")
+    if executed:
+        await audit_results(user, executed)
+    return report
+
+async def require_audit_access(user: dict, org: Optional[str]):
+    if not org:
+        raise HTTPException(status_code=400, detail="`org` parameter is required")
 
-@app.get("/audit", response_model=List[dict], tags=["admin"], summary="Query audit logs (org admins only)")
+    try:
+        gh = await run_github(org, get_app_client, org)
+    except InstallationNotFound as e:
+        raise HTTPException(status_code=404, detail=e.data["message"])
+    except GithubException as e:
+        raise HTTPException(status_code=404 if e.status == 404 else 502, detail=f"GitHub error checking access: {e.status}")
+    username = user["email"].split("@")[0]
+    if not await run_github(org, is_org_admin, gh, org, username):
+        raise HTTPException(status_code=403, detail="Only org admins may query audit logs")
+
+@app.get("/audit", tags=["admin"], summary="Query audit logs (org admins only)")
 async def audit_logs(
-    user=Depends(get_current_user),
+    user=Depends(rate_limited("read")),
     email: Optional[str] = Query(None),
     action: Optional[str] = Query(None),
     org: Optional[str] = Query(None),
     repo: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from `next_cursor`; pass an empty value to start"),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
 ):
-    if not org:
-        raise HTTPException(status_code=400, detail="`org` parameter is required")
+    """
+    Without `cursor`, returns a list of entries paged by `offset`. With `cursor`,
+    returns `{"entries": [...], "next_cursor": ...}` using keyset pagination.
+    """
+    await require_audit_access(user, org)
+
+    if cursor is not None:
+        try:
+            return await query_audit_page(
+                email=email, action=action, org=org, repo=repo, limit=limit, cursor=cursor, since=since, until=until
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return await query_audit_logs(
+        email=email, action=action, org=org, repo=repo, limit=limit, offset=offset, since=since, until=until
+    )
+
+@app.get("/audit/export", tags=["admin"], summary="Download audit logs as NDJSON or CSV (org admins only)")
+async def audit_export(
+    user=Depends(rate_limited("read")),
+    org: Optional[str] = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    email: Optional[str] = Query(None),
+    action: Optional[str] = Query(None),
+    repo: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+):
+    """Streams every matching entry, newest first, without loading the result set into memory."""
+    await require_audit_access(user, org)
+
+    entries = stream_audit_entries(email=email, action=action, org=org, repo=repo, since=since, until=until)
+    if format == "csv":
+        body, media_type = export_csv(entries), "text/csv"
+    else:
+        body, media_type = export_ndjson(entries), "application/x-ndjson"
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="audit-{org}.{format}"'},
+    )
+
+@app.get("/audit/stats", tags=["admin"], summary="Count audit entries per time bucket (org admins only)")
+async def audit_statistics(
+    user=Depends(rate_limited("read")),
+    org: Optional[str] = Query(None),
+    bucket: str = Query("day", pattern="^(hour|day|week|month)$"),
+    group_by: List[str] = Query(["action"], description="Any of action, user, result"),
+    email: Optional[str] = Query(None),
+    action: Optional[str] = Query(None),
+    repo: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+):
+    """
+    Returns `{"bucket": ..., "counts": [{"bucket", <group_by...>, "count"}], "archived_before": ...}`,
+    aggregated in the database. Archived months are not counted; `archived_before` is where the
+    counted range starts when there are any (null otherwise).
+    """
+    await require_audit_access(user, org)
+
+    try:
+        counts = await audit_stats(
+            org=org, group_by=group_by, bucket=bucket, email=email, action=action, repo=repo, since=since, until=until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"bucket": bucket, "counts": counts, "archived_before": archived_before()}
 
-    gh = get_app_client(org)
-    username = user["email"].split("@")[0]
@@ -1,11 +1,25 @@
-from pydantic import BaseModel
-from typing import Optional, Dict
+from pydantic import BaseModel, Field
+from typing import Any, Optional, Dict, List
 
 class ActionRequest(BaseModel):
     org: str
     repo: str
     action: str
-    parameters: Optional[Dict[str, str]]
+    parameters: Optional[Dict[str, Any]]
+
+class BatchActionRequest(BaseModel):
+    actions: List[ActionRequest] = Field(..., min_length=1, max_length=200)
+
+class DesiredState(BaseModel):
+    """Desired state of one org for /reconcile; omitted sections are left alone."""
+    org: str
+    repos: Optional[List[str]] = None
+    # team slug -> member logins
+    teams: Optional[Dict[str, List[str]]] = None
+    # repo -> {secret name: value}; a null value only asserts that the secret exists
+    secrets: Optional[Dict[str, Dict[str, Optional[str]]]] = None
+    # Also remove team members and secrets the document doesn't list
+    prune: bool = False
 
 class AuditRecord(BaseModel):
     user: str
@@ -0,0 +1,165 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from prometheus_client import Counter
+
+from .auth import get_current_user
+
+# "memory" keeps buckets per process; a SQLite file (WAL) is shared by every worker on the host
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "sqlite:///./ratelimit.db")
+# Bucket size and refill per (user, action class), e.g. "mutation=5/minute,read=120/minute"
+RATE_LIMITS = os.getenv("RATE_LIMITS", "mutation=5/minute,read=120/minute")
+# Checks run on the event loop: wait at most this long for another worker's write lock, then let the request through
+RATE_LIMIT_BUSY_TIMEOUT_MS = int(os.getenv("RATE_LIMIT_BUSY_TIMEOUT_MS", "20"))
+
+RATE_LIMITED = Counter("mcp_rate_limited_total", "Requests rejected by the per-user rate limit", ["action_class"])
+RATE_LIMIT_FAILED_OPEN = Counter("mcp_rate_limit_failed_open_total", "Requests let through because the bucket store was busy")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_PRUNE_EVERY = 1000
+
+
+def parse_limits(spec: str) -> dict:
+    """'mutation=5/minute,read=2/second' -> {'mutation': (capacity, tokens per second)}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        match = re.fullmatch(r"([\w-]+)=(\d+)/(second|minute|hour|day)", item)
+        if not match:
+            raise ValueError(f"Invalid rate limit: {item!r}")
+        name, count, period = match.groups()
+        limits[name] = (int(count), int(count) / _PERIODS[period])
+    return limits
+
+
+class MemoryBucketStore:
+    """Token buckets in a dict; only correct with a single worker process."""
+
+    def __init__(self):
+        self._buckets: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        """Takes one token; returns 0 if allowed, otherwise seconds until one is available."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = [capacity - 1, now]
+                return 0.0
+            available = min(capacity, bucket[0] + max(now - bucket[1], 0) * rate)
+            if available < 1:
+                return (1 - available) / rate
+            bucket[0] = available - 1
+            bucket[1] = now
+            return 0.0
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file in WAL mode. Each take is one UPSERT in
+    autocommit mode, so it's atomic across every process sharing the file.
+    When the file stays locked past the busy timeout the take fails open:
+    a request slipping through beats stalling the event loop.
+    """
+
+    _TAKE = """
+        INSERT INTO buckets (key, tokens, updated, refill) VALUES (:key, :capacity - 1, :now, :capacity / :rate)
+        ON CONFLICT(key) DO UPDATE SET
+            tokens = min(:capacity, tokens + max(:now - updated, 0) * :rate) - 1,
+            updated = :now,
+            refill = :capacity / :rate
+        WHERE min(:capacity, tokens + max(:now - updated, 0) * :rate) >= 1
+        RETURNING tokens
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = RATE_LIMIT_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.busy_timeout = busy_timeout_ms / 1000
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=self.busy_timeout)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL, refill REAL)")
+        if "refill" not in {row[1] for row in conn.execute("PRAGMA table_info(buckets)")}:
+            conn.execute("ALTER TABLE buckets ADD COLUMN refill REAL")
+        return conn
+
+    def take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        try:
+            return self._take(key, capacity, rate, now)
+        except sqlite3.OperationalError:
+            RATE_LIMIT_FAILED_OPEN.inc()
+            return 0.0
+
+    def _take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            params = {"key": key, "capacity": capacity, "rate": rate, "now": now}
+            if self._conn.execute(self._TAKE, params).fetchone() is not None:
+                self._takes += 1
+                if self._takes % _PRUNE_EVERY == 0:
+                    # A bucket idle for its refill time (capacity / rate, i.e. its period) is full again,
+                    # which is what a missing row means; rows from before `refill` existed wait out the longest period
+                    self._conn.execute(
+                        "DELETE FROM buckets WHERE updated + coalesce(refill, ?) < ?", (_PERIODS["day"], now)
+                    )
+                return 0.0
+            tokens, updated = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            available = min(capacity, tokens + max(now - updated, 0) * rate)
+            return (1 - available) / rate
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def make_store(url: str = RATE_LIMIT_STORAGE):
+    if url == "memory":
+        return MemoryBucketStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteBucketStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported RATE_LIMIT_STORAGE: {url}")
+
+
+class RateLimiter:
+    """Per-user token buckets, one per (JWT subject, action class)."""
+
+    def __init__(self, store, limits: dict):
+        self.store = store
+        self.limits = limits
+
+    def check(self, user: dict, action_class: str):
+        if action_class not in self.limits:
+            return
+        capacity, rate = self.limits[action_class]
+        subject = user.get("sub") or user.get("email")
+        retry_after = self.store.take(f"{action_class}:{subject}", capacity, rate, time.time())
+        if retry_after:
+            RATE_LIMITED.labels(action_class=action_class).inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Too Many Requests",
+                headers={"Retry-After": str(max(1, round(retry_after)))},
+            )
+
+
+limiter = RateLimiter(make_store(), parse_limits(RATE_LIMITS))
+
+
+def rate_limited(action_class: str):
+    """Dependency that authenticates the session and spends one token from the user's bucket."""
+    async def dependency(user=Depends(get_current_user)):
+        limiter.check(user, action_class)
+        return user
+    return dependency
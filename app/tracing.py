@@ -0,0 +1,171 @@
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import Counter, Histogram
+
+# Orgs that get their own label value; everything else is reported as "other"
+TRACE_ORGS = {o.strip().lower() for o in os.getenv("TRACE_ORGS", os.getenv("GITHUB_ORGS", "")).split(",") if o.strip()}
+# Append finished request traces as JSON lines (OpenTelemetry span field names) to this file
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+# Finished traces waiting for the export thread; beyond this they are dropped rather than slowing requests
+TRACE_EXPORT_QUEUE = int(os.getenv("TRACE_EXPORT_QUEUE", "10000"))
+
+STAGE_SECONDS = Histogram(
+    "mcp_action_stage_seconds",
+    "Time spent in each stage of a GitHub action",
+    ["stage", "action", "org"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+GITHUB_CALLS = Histogram(
+    "mcp_github_calls_per_request",
+    "GitHub API calls made while serving one request",
+    ["endpoint"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250),
+)
+
+TRACES_DROPPED = Counter("mcp_traces_dropped_total", "Finished traces not exported because the export queue was full")
+
+
+# Action names that get their own label value (the dispatcher registers its table)
+known_actions: set = set()
+
+
+def org_label(org: Optional[str]) -> str:
+    return org.lower() if org and org.lower() in TRACE_ORGS else "other"
+
+
+def action_label(action: Optional[str]) -> str:
+    return action if action in known_actions else "other"
+
+
+class Trace:
+    """Spans and GitHub call count for one request; shared by the executor threads serving it."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.started_ns = time.time_ns()
+        self.spans: list[dict] = []
+        self.github_calls = 0
+        self._lock = threading.Lock()
+
+    def count_github_call(self):
+        with self._lock:
+            self.github_calls += 1
+
+    def add_span(self, name: str, started_ns: int, ended_ns: int, attributes: dict):
+        with self._lock:
+            self.spans.append({
+                "traceId": self.trace_id,
+                "spanId": uuid.uuid4().hex[:16],
+                "parentSpanId": self.span_id,
+                "name": name,
+                "startTimeUnixNano": started_ns,
+                "endTimeUnixNano": ended_ns,
+                "attributes": attributes,
+            })
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("mcp_trace", default=None)
+
+
+class TraceExporter:
+    """Appends finished traces to a file from one background thread, so requests never wait on disk I/O."""
+
+    def __init__(self, maxsize: int = TRACE_EXPORT_QUEUE):
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, path: str, lines: str):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._thread.start()
+        try:
+            self.queue.put_nowait((path, lines))
+        except queue.Full:
+            TRACES_DROPPED.inc()
+
+    def flush(self):
+        """Block until every submitted trace is written."""
+        if self._thread is not None:
+            self.queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                by_path: dict[str, list] = {}
+                for path, lines in batch:
+                    by_path.setdefault(path, []).append(lines)
+                for path, chunks in by_path.items():
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write("".join(chunks))
+            except OSError:
+                TRACES_DROPPED.inc(len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+exporter = TraceExporter()
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+def finish_trace(trace: Trace, name: str, endpoint: str, attributes: Optional[dict] = None):
+    GITHUB_CALLS.labels(endpoint=endpoint).observe(trace.github_calls)
+    if not TRACE_EXPORT_PATH:
+        return
+    root = {
+        "traceId": trace.trace_id,
+        "spanId": trace.span_id,
+        "parentSpanId": None,
+        "name": name,
+        "startTimeUnixNano": trace.started_ns,
+        "endTimeUnixNano": time.time_ns(),
+        "attributes": {"http.route": endpoint, "github.calls": trace.github_calls, **(attributes or {})},
+    }
+    lines = "".join(json.dumps(span) + "\n" for span in [root, *trace.spans])
+    exporter.submit(TRACE_EXPORT_PATH, lines)
+
+
+def count_github_call():
+    trace = _trace.get()
+    if trace is not None:
+        trace.count_github_call()
+
+
+@contextmanager
+def span(stage: str, action: str, org: Optional[str]):
+    """Time one stage; observed in STAGE_SECONDS and added to the request's trace if there is one."""
+    started_ns = time.time_ns()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage, action=action_label(action), org=org_label(org)).observe(time.perf_counter() - started)
+        trace = _trace.get()
+        if trace is not None:
+            trace.add_span(stage, started_ns, time.time_ns(), {"action": action, "org": org})
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from prometheus_client import Histogram
+
+from .auth import prefetch_oidc_metadata
+from .github_api.authz import tokens, get_membership_snapshot
+from .github_api.identity import get_installation_repos
+from .github_api.executor import run_github
+from .github_api.budget import Lane, github_lane
+
+# Readiness is reported once warm-up finishes or gives up after this long
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+
+WARMUP_SECONDS = Histogram("mcp_warmup_step_seconds", "Duration of startup warm-up steps", ["step"])
+
+logger = logging.getLogger(__name__)
+
+class Warmup:
+    """
+    Startup pipeline that pays the cold-start costs before the first request:
+    Azure OIDC discovery, and per org in GITHUB_ORGS the installation lookup,
+    token mint, membership snapshot and repository index, all concurrently.
+    A failed step is recorded and retried lazily by the first request that needs it.
+    """
+
+    def __init__(self, timeout: float = WARMUP_TIMEOUT):
+        self.timeout = timeout
+        self.ready = False
+        self.steps: dict[str, str] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, orgs: Optional[list] = None):
+        self.task = asyncio.create_task(self.run(orgs), name="warmup")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def run(self, orgs: Optional[list] = None):
+        if orgs is None:
+            orgs = [o.strip() for o in os.getenv("GITHUB_ORGS", "").split(",") if o.strip()]
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(self._step("oidc", prefetch_oidc_metadata), *(self._org(org) for org in orgs)),
+                self.timeout,
+            )
+        except asyncio.TimeoutError:
+            for name, state in self.steps.items():
+                if state == "running":
+                    self.steps[name] = "timeout"
+        finally:
+            self.ready = True
+            logger.info("Warm-up finished in %.2fs: %s", time.monotonic() - started, self.steps)
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "warmup": dict(self.steps)}
+
+    async def _org(self, org: str):
+        # Background lane: live requests arriving during warm-up go first
+        with github_lane(Lane.BACKGROUND):
+            # Resolves the installation id and mints its token
+            if not await self._step(f"{org}:token", run_github, org, tokens.get_token, org):
+                return
+            await asyncio.gather(
+                self._step(f"{org}:membership", run_github, org, get_membership_snapshot, org),
+                self._step(f"{org}:repos", run_github, org, get_installation_repos, org),
+            )
+
+    async def _step(self, name: str, fn, *args) -> bool:
+        self.steps[name] = "running"
+        started = time.perf_counter()
+        try:
+            await fn(*args)
+        except Exception as e:
+            self.steps[name] = f"error: {e}"
+            return False
+        finally:
+            WARMUP_SECONDS.labels(step=name.rpartition(":")[2]).observe(time.perf_counter() - started)
+        self.steps[name] = "ok"
+        return True
+
+warmup = Warmup()
@@ -0,0 +1,260 @@
+"""
+Local stand-in for the parts of the GitHub REST API the server uses, with
+configurable latency, org sizes, rate-limit headers and error injection.
+
+    python -m benchmarks.fake_github --port 9000 --latency-ms 50 --repos 5000
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+
+import nacl.public
+from fastapi import FastAPI, Request, Response
+from starlette.routing import Match
+
+
+def _id(*parts) -> int:
+    # Stable across runs, unlike hash()
+    return zlib.crc32("/".join(parts).encode("utf-8"))
+
+
+@dataclass
+class FakeGitHubConfig:
+    orgs: list = field(default_factory=lambda: ["bench-org"])
+    teams: int = 20
+    members_per_team: int = 25
+    repos: int = 500
+    # Logins added to the teams the server checks (infrastructure-admins, owners)
+    admins: list = field(default_factory=lambda: ["bench"])
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # Fraction of requests answered with a 502
+    error_rate: float = 0.0
+    # Requests per token per hour before 403s with X-RateLimit-Remaining: 0
+    rate_limit: int = 5000
+
+
+class FakeGitHub:
+    def __init__(self, config: FakeGitHubConfig):
+        self.config = config
+        self.calls = Counter()
+        self.remaining: dict[str, int] = {}
+        self.reset_at = int(time.time()) + 3600
+        self.secrets: dict[str, str] = {}
+        self.public_key = base64.b64encode(bytes(nacl.public.PrivateKey.generate().public_key)).decode()
+        self._lock = threading.Lock()
+        self.base_url = ""
+
+    # --- data ---
+
+    def teams(self, org: str) -> dict:
+        c = self.config
+        teams = {
+            f"team-{t}": [f"user-{(t * c.members_per_team + m) % 10000}" for m in range(c.members_per_team)]
+            for t in range(c.teams)
+        }
+        teams["infrastructure-admins"] = list(c.admins)
+        teams["owners"] = list(c.admins)
+        return teams
+
+    def org_json(self, org: str) -> dict:
+        return {"login": org, "id": _id(org), "url": f"{self.base_url}/orgs/{org}"}
+
+    def team_json(self, org: str, slug: str) -> dict:
+        return {"slug": slug, "name": slug, "id": _id(org, slug), "url": f"{self.base_url}/orgs/{org}/teams/{slug}"}
+
+    def repo_json(self, org: str, name: str) -> dict:
+        return {
+            "id": _id(org, name),
+            "name": name,
+            "full_name": f"{org}/{name}",
+            "url": f"{self.base_url}/repos/{org}/{name}",
+            "html_url": f"https://github.example/{org}/{name}",
+            "owner": {"login": org},
+            "private": True,
+        }
+
+    # --- transport behaviour ---
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"total": sum(self.calls.values()), "by_route": dict(self.calls)}
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.remaining.clear()
+
+    def spend(self, request: Request, route: str):
+        """Count the call and charge the caller's rate limit; returns (remaining, exhausted)."""
+        identity = request.headers.get("Authorization", "anonymous")
+        with self._lock:
+            self.calls[f"{request.method} {route}"] += 1
+            remaining = self.remaining.get(identity, self.config.rate_limit)
+            if remaining > 0:
+                self.remaining[identity] = remaining - 1
+            return max(remaining - 1, 0), remaining <= 0
+
+
+def paginate(request: Request, items: list) -> tuple[list, dict]:
+    page = int(request.query_params.get("page", 1))
+    per_page = int(request.query_params.get("per_page", 30))
+    last = max((len(items) + per_page - 1) // per_page, 1)
+    headers = {}
+    if page < last:
+        base = str(request.url.remove_query_params("page"))
+        sep = "&" if "?" in base else "?"
+        headers["Link"] = f'<{base}{sep}page={page + 1}>; rel="next", <{base}{sep}page={last}>; rel="last"'
+    return items[(page - 1) * per_page:page * per_page], headers
+
+
+def create_app(config: FakeGitHubConfig = None) -> FastAPI:
+    fake = FakeGitHub(config or FakeGitHubConfig())
+    app = FastAPI(title="Fake GitHub")
+    app.state.fake = fake
+
+    @app.middleware("http")
+    async def behave_like_github(request: Request, call_next):
+        if request.url.path.startswith("/_"):
+            return await call_next(request)
+        fake.base_url = f"{request.url.scheme}://{request.url.netloc}"
+        c = fake.config
+        if c.latency_ms or c.jitter_ms:
+            await asyncio.sleep((c.latency_ms + random.uniform(0, c.jitter_ms)) / 1000)
+
+        route = next((r.path for r in app.router.routes if r.matches(request.scope)[0] == Match.FULL), request.url.path)
+        remaining, exhausted = fake.spend(request, route)
+        limit_headers = {
+            "X-RateLimit-Limit": str(c.rate_limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(fake.reset_at),
+        }
+        if exhausted:
+            return Response(json.dumps({"message": "API rate limit exceeded"}), 403, limit_headers, "application/json")
+        if c.error_rate and random.random() < c.error_rate:
+            return Response(json.dumps({"message": "Server Error"}), 502, limit_headers, "application/json")
+
+        response = await call_next(request)
+        response.headers.update(limit_headers)
+        if request.method == "GET" and response.status_code == 200:
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+            if request.headers.get("If-None-Match") == etag:
+                return Response(status_code=304, headers={**headers, "ETag": etag})
+            return Response(body, 200, {**headers, "ETag": etag}, response.media_type)
+        return response
+
+    def json_response(data, headers=None, status=200):
+        return Response(json.dumps(data), status, headers or {}, "application/json")
+
+    @app.get("/_stats")
+    def stats():
+        return fake.stats()
+
+    @app.post("/_reset")
+    def reset():
+        fake.reset()
+        return {"ok": True}
+
+    @app.get("/app/installations")
+    def installations(request: Request):
+        listed = [
+            {"id": i + 1, "account": {"login": org}, "target_type": "Organization", "repository_selection": "all"}
+            for i, org in enumerate(fake.config.orgs)
+        ]
+        page, headers = paginate(request, listed)
+        return json_response(page, headers)
+
+    @app.get("/orgs/{org}/installation")
+    def org_installation(org: str):
+        return json_response({"id": fake.config.orgs.index(org) + 1 if org in fake.config.orgs else 1, "account": {"login": org}})
+
+    @app.get("/repos/{org}/{repo}/installation")
+    def repo_installation(org: str, repo: str):
+        return org_installation(org)
+
+    @app.post("/app/installations/{installation_id}/access_tokens")
+    def access_token(installation_id: int):
+        expires = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 3600))
+        token = f"ghs_fake_{installation_id}_{random.getrandbits(64):x}"
+        return json_response({"token": token, "expires_at": expires, "permissions": {"administration": "write"}}, status=201)
+
+    @app.get("/orgs/{org}")
+    def get_org(org: str):
+        return json_response(fake.org_json(org))
+
+    @app.get("/orgs/{org}/teams")
+    def list_teams(org: str, request: Request):
+        page, headers = paginate(request, [fake.team_json(org, slug) for slug in fake.teams(org)])
+        return json_response(page, headers)
+
+    @app.get("/orgs/{org}/teams/{slug}/members")
+    def team_members(org: str, slug: str, request: Request):
+        members = [{"login": login, "id": i} for i, login in enumerate(fake.teams(org).get(slug, []))]
+        page, headers = paginate(request, members)
+        return json_response(page, headers)
+
+    @app.get("/orgs/{org}/repos")
+    def list_repos(org: str, request: Request):
+        page, headers = paginate(request, [fake.repo_json(org, f"repo-{i}") for i in range(fake.config.repos)])
+        return json_response(page, headers)
+
+    @app.post("/orgs/{org}/repos")
+    async def create_repo(org: str, request: Request):
+        body = await request.json()
+        return json_response(fake.repo_json(org, body["name"]), status=201)
+
+    @app.get("/repos/{org}/{repo}")
+    def get_repo(org: str, repo: str):
+        return json_response(fake.repo_json(org, repo))
+
+    @app.get("/repos/{org}/{repo}/actions/secrets/public-key")
+    def public_key(org: str, repo: str):
+        return json_response({"key_id": "fake-key", "key": fake.public_key})
+
+    @app.put("/repos/{org}/{repo}/actions/secrets/{name}")
+    async def put_secret(org: str, repo: str, name: str, request: Request):
+        fake.secrets[f"{org}/{repo}/{name}"] = (await request.json())["encrypted_value"]
+        return Response(status_code=204)
+
+    @app.delete("/repos/{org}/{repo}/actions/secrets/{name}")
+    def delete_secret(org: str, repo: str, name: str):
+        fake.secrets.pop(f"{org}/{repo}/{name}", None)
+        return Response(status_code=204)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--orgs", default="bench-org")
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--members-per-team", type=int, default=25)
+    parser.add_argument("--repos", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=5000)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeGitHubConfig(
+        orgs=args.orgs.split(","), teams=args.teams, members_per_team=args.members_per_team, repos=args.repos,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, rate_limit=args.rate_limit,
+    )
+    uvicorn.run(create_app(config), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
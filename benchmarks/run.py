@@ -0,0 +1,244 @@
+"""
+Drive /act, /me, /audit and the github.act MCP tool concurrently against a
+local fake GitHub (benchmarks/fake_github.py) and report latency percentiles,
+throughput and GitHub calls per request.
+
+    python -m benchmarks.run --requests 200 --concurrency 20 --latency-ms 30
+    python -m benchmarks.run --save benchmarks/baselines/default.json
+    python -m benchmarks.run --compare benchmarks/baselines/default.json
+
+Run from the repository root. The app is served in-process, so the numbers
+cover the server's own work plus its real HTTP round-trips to the fake.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from .fake_github import FakeGitHubConfig, create_app
+
+SCENARIOS = ("me", "act", "audit", "mcp_act")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_github(config: FakeGitHubConfig) -> str:
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-github", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def configure_env(github_url: str, workdir: str, args):
+    # The app reads its configuration at import time, so this runs before importing app.main
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption()
+    )
+    os.environ.update({
+        "GITHUB_API_URL": github_url,
+        "GITHUB_APP_ID": "1",
+        "GITHUB_PRIVATE_KEY_BASE64": base64.b64encode(key).decode(),
+        "GITHUB_ORGS": args.orgs,
+        "GITHUB_MUTATION_INTERVAL": str(args.mutation_interval),
+        "JWT_SECRET": "benchmark-secret",
+        "AZURE_AD_CLIENT_ID": "benchmark",
+        "AZURE_AD_CLIENT_SECRET": "benchmark",
+        "AZURE_AD_TENANT_ID": "benchmark",
+        "AUDIT_DB_URL": f"sqlite+aiosqlite:///{workdir}/audit.db",
+        "AUDIT_ARCHIVE_DIR": f"{workdir}/audit-archive",
+        "AUDIT_HOT_MONTHS": "3",
+        "CACHE_L2_URL": f"sqlite:///{workdir}/cache.db",
+        "RATE_LIMIT_STORAGE": "memory",
+        "RATE_LIMITS": "mutation=1000000/second,read=1000000/second",
+    })
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def summarize(latencies: list, wall: float, github_calls: int, errors: int) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "github_calls_per_request": round(github_calls / len(latencies), 2) if latencies else 0.0,
+    }
+
+
+def make_requests(main, client: httpx.AsyncClient, org: str, session: str) -> dict:
+    from starlette.requests import Request
+    from types import SimpleNamespace
+    from app.models import ActionRequest
+
+    def secret_action(i: int) -> dict:
+        # Distinct values, so idempotency replay doesn't short-circuit the run
+        return {"org": org, "repo": f"repo-{i % 10}", "action": "replace_secret",
+                "parameters": {"name": "BENCH", "value": f"value-{i}-{time.time_ns()}"}}
+
+    mcp_request = Request({"type": "http", "headers": [(b"cookie", f"session={session}".encode())]})
+    mcp_ctx = SimpleNamespace(request_context=SimpleNamespace(request=mcp_request))
+
+    async def me(i):
+        return (await client.get("/me")).is_success
+
+    async def act(i):
+        return (await client.post("/act", json=secret_action(i))).is_success
+
+    async def audit(i):
+        return (await client.get("/audit", params={"org": org, "limit": 50, "cursor": ""})).is_success
+
+    async def mcp_act(i):
+        result = await main.mcp_act(ActionRequest(**secret_action(i)), mcp_ctx)
+        return result.get("status") == "ok"
+
+    return {"me": me, "act": act, "audit": audit, "mcp_act": mcp_act}
+
+
+async def run_scenario(request, github: httpx.AsyncClient, n: int, concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with limit:
+            started = time.perf_counter()
+            try:
+                ok = await request(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    calls_before = (await github.get("/_stats")).json()["total"]
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - started
+    calls = (await github.get("/_stats")).json()["total"] - calls_before
+    return summarize(latencies, wall, calls, errors)
+
+
+async def bench(args) -> dict:
+    config = FakeGitHubConfig(
+        orgs=args.orgs.split(","), teams=args.teams, members_per_team=args.members_per_team, repos=args.repos,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, rate_limit=args.rate_limit,
+    )
+    github_url = start_fake_github(config)
+    workdir = tempfile.mkdtemp(prefix="mcp-bench-")
+    configure_env(github_url, workdir, args)
+
+    from app import main
+    from app.auth import create_jwt_token
+
+    for handler in main.app.router.on_startup:
+        await handler()
+    # Wait for the GitHub part of warm-up; OIDC discovery needs the internet and isn't measured
+    while any(state == "running" for step, state in main.warmup.steps.items() if step != "oidc") or not main.warmup.steps:
+        await asyncio.sleep(0.05)
+
+    org = config.orgs[0]
+    session = create_jwt_token({"sub": "bench", "email": f"{config.admins[0]}@example.com", "name": "Benchmark"})
+    results = {}
+    async with httpx.AsyncClient(base_url=github_url) as github, httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app), base_url="http://mcp.local", cookies={"session": session}
+    ) as client:
+        requests = make_requests(main, client, org, session)
+        for name in args.scenarios.split(","):
+            results[name] = await run_scenario(requests[name], github, args.requests, args.concurrency)
+
+    for handler in main.app.router.on_shutdown:
+        await handler()
+    return {"config": {k: v for k, v in vars(args).items() if k not in ("save", "compare")}, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of `current` against `baseline`, as human-readable lines."""
+    regressions = []
+    for scenario, base in baseline["results"].items():
+        now = current["results"].get(scenario)
+        if now is None:
+            continue
+        if now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {now['p95_ms']}ms vs {base['p95_ms']}ms")
+        if now["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {now['throughput_rps']}/s vs {base['throughput_rps']}/s")
+        # Call counts are deterministic for a given config, so they get no tolerance beyond rounding
+        if now["github_calls_per_request"] > base["github_calls_per_request"] + 0.05:
+            regressions.append(
+                f"{scenario}: {now['github_calls_per_request']} GitHub calls/request vs {base['github_calls_per_request']}"
+            )
+        if now["errors"] > base["errors"]:
+            regressions.append(f"{scenario}: {now['errors']} errors vs {base['errors']}")
+    return regressions
+
+
+def print_table(report: dict):
+    columns = ("requests", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput_rps", "github_calls_per_request")
+    print(f"{'scenario':<10}" + "".join(f"{c:>26}" if c == "github_calls_per_request" else f"{c:>16}" for c in columns))
+    for name, result in report["results"].items():
+        print(f"{name:<10}" + "".join(
+            f"{result[c]:>26}" if c == "github_calls_per_request" else f"{result[c]:>16}" for c in columns
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--orgs", default="bench-org")
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--members-per-team", type=int, default=25)
+    parser.add_argument("--repos", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=5000)
+    parser.add_argument("--mutation-interval", type=float, default=0.0,
+                        help="GITHUB_MUTATION_INTERVAL for the run (production default is 1.0)")
+    parser.add_argument("--save", help="write the report as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative latency/throughput change")
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+    print_table(report)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import os
+
+# app.auth (JWT_SECRET), app.audit, app.ratelimit and app.cache read these at import time;
+# the Azure AD and GitHub App credentials are only read on first use
+for name, value in {
+    "AZURE_AD_CLIENT_ID": "test-client",
+    "AZURE_AD_CLIENT_SECRET": "test-secret",
+    "AZURE_AD_TENANT_ID": "test-tenant",
+    "JWT_SECRET": "INSECURE-DEFAULT-REPLACE",
+    "GITHUB_APP_ID": "1",
+    "GITHUB_PRIVATE_KEY_BASE64": "dGVzdA==",
+    "RATE_LIMIT_STORAGE": "memory",
+    "CACHE_L2_URL": "none",
+    "AUDIT_HOT_MONTHS": "0",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,295 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import audit
+from app.audit_archive import SegmentStore
+from app.models import ActionRequest
+
+USER = {"email": "alice@example.com"}
+
+
+@pytest.fixture
+def audit_db(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/audit.db")
+    monkeypatch.setattr(audit, "engine", engine)
+    monkeypatch.setattr(audit, "SessionLocal", sessionmaker(engine, expire_on_commit=False, class_=AsyncSession))
+    asyncio.run(audit.init_db())
+    return engine
+
+
+async def count_entries():
+    async with audit.SessionLocal() as session:
+        return (await session.execute(select(func.count(audit.AuditEntry.id)))).scalar()
+
+
+def make_action(i=0):
+    return ActionRequest(org="org", repo=f"repo-{i}", action="delete_secret", parameters={"name": "X"})
+
+
+def test_writer_group_commits_and_flushes_on_stop(audit_db, monkeypatch):
+    writer = audit.AuditWriter(batch_size=10, flush_interval_ms=1000)
+    monkeypatch.setattr(audit, "audit_writer", writer)
+    commits = []
+    real_write = audit.write_entries
+
+    async def spy(records):
+        commits.append(len(records))
+        await real_write(records)
+
+    monkeypatch.setattr(audit, "write_entries", spy)
+
+    async def main():
+        await writer.start()
+        for i in range(25):
+            await audit.log_action(USER, make_action(i), "success")
+        await writer.stop()
+        return await count_entries()
+
+    assert asyncio.run(main()) == 25
+    assert len(commits) < 25
+
+
+def test_drop_policy_when_queue_full(audit_db):
+    writer = audit.AuditWriter(queue_size=1, policy="drop", flush_interval_ms=1000)
+
+    async def main():
+        await writer.start()
+        # The writer task has not run yet, so only the first record fits
+        for i in range(3):
+            await writer.submit(audit.AuditEntry(action="a", org="org", result="success"))
+        await writer.stop()
+        return await count_entries()
+
+    assert asyncio.run(main()) == 1
+
+
+def test_failed_flushes_are_retried_and_push_back_on_callers(audit_db, monkeypatch):
+    writer = audit.AuditWriter(batch_size=1, queue_size=2, flush_interval_ms=10, max_backoff_ms=20)
+    real_write = audit.write_entries
+    failing = True
+
+    async def flaky(records):
+        if failing:
+            raise RuntimeError("database is locked")
+        await real_write(records)
+
+    monkeypatch.setattr(audit, "write_entries", flaky)
+
+    async def main():
+        nonlocal failing
+        await writer.start()
+        record = lambda: audit.AuditEntry(action="a", org="org", result="success")
+        await writer.submit(record())
+        await asyncio.sleep(0.1)  # taken by the writer, which keeps failing
+        await writer.submit(record())
+        await writer.submit(record())
+        blocked = asyncio.ensure_future(writer.submit(record()))
+        await asyncio.sleep(0.1)
+        assert not blocked.done()  # the queue is full, so the caller waits instead of losing the record
+        failing = False
+        await blocked
+        await writer.stop()
+        return await count_entries()
+
+    assert asyncio.run(main()) == 4
+
+
+def test_log_action_without_writer_commits_directly(audit_db):
+    asyncio.run(audit.log_action(USER, make_action(), "success"))
+    assert asyncio.run(count_entries()) == 1
+
+
+def test_keyset_pages_cover_every_entry_once(audit_db):
+    async def main():
+        for i in range(7):
+            await audit.log_action(USER, make_action(i), "success")
+        seen, cursor = [], ""
+        while cursor is not None:
+            page = await audit.query_audit_page(org="org", limit=3, cursor=cursor)
+            seen += [e["repo"] for e in page["entries"]]
+            cursor = page["next_cursor"]
+        return seen
+
+    seen = asyncio.run(main())
+    assert sorted(seen) == sorted(f"repo-{i}" for i in range(7))
+    assert seen[0] == "repo-6"
+
+
+def test_invalid_cursor_is_rejected(audit_db):
+    with pytest.raises(ValueError):
+        asyncio.run(audit.query_audit_page(org="org", cursor="not-a-cursor"))
+
+
+def add_entries(*entries):
+    async def main():
+        await audit.write_entries([audit.AuditEntry(**e) for e in entries])
+    asyncio.run(main())
+
+
+def test_export_streams_in_chunks_and_formats(audit_db):
+    add_entries(*[
+        dict(timestamp=datetime(2026, 3, 1, 12, i), user_email="a@x", action="delete_secret", org="org", repo=f"r{i}",
+             parameters='{"name": "X"}', result="success")
+        for i in range(5)
+    ], dict(timestamp=datetime(2026, 3, 1), user_email="a@x", action="delete_secret", org="other", result="success"))
+
+    async def collect(gen):
+        return "".join([chunk async for chunk in gen])
+
+    ndjson = asyncio.run(collect(audit.export_ndjson(audit.stream_audit_entries(org="org", chunk_size=2))))
+    rows = [json.loads(line) for line in ndjson.splitlines()]
+    assert [r["repo"] for r in rows] == ["r4", "r3", "r2", "r1", "r0"]
+
+    since = datetime(2026, 3, 1, 12, 2, tzinfo=timezone.utc)
+    text = asyncio.run(collect(audit.export_csv(audit.stream_audit_entries(org="org", since=since), rows_per_chunk=2)))
+    parsed = list(csv.DictReader(io.StringIO(text)))
+    assert [r["repo"] for r in parsed] == ["r4", "r3", "r2"]
+    assert parsed[0]["parameters"] == '{"name": "X"}'
+
+
+def test_paused_export_does_not_lock_out_writers(audit_db):
+    # Equal timestamps straddle the chunk boundaries; the keyset continues by id
+    add_entries(*[dict(timestamp=datetime(2026, 3, 1), action="a", org="org", repo=f"r{i}", result="success") for i in range(5)])
+
+    async def main():
+        entries = audit.stream_audit_entries(org="org", chunk_size=2)
+        first = await entries.__anext__()
+        # The client stalls here; a writer must still get through
+        await asyncio.wait_for(audit.write_entries([audit.AuditEntry(action="b", org="other", result="success")]), 1)
+        return [first] + [entry async for entry in entries]
+
+    rows = asyncio.run(main())
+    assert [r["repo"] for r in rows] == ["r4", "r3", "r2", "r1", "r0"]
+
+
+def test_stats_group_by_bucket_in_sql(audit_db):
+    add_entries(
+        dict(timestamp=datetime(2026, 3, 2, 9), user_email="a@x", action="add_user", org="org", result="success"),
+        dict(timestamp=datetime(2026, 3, 2, 17), user_email="a@x", action="add_user", org="org", result="error: 404"),
+        dict(timestamp=datetime(2026, 3, 8, 23), user_email="b@x", action="add_user", org="org", result="success"),
+        dict(timestamp=datetime(2026, 3, 9, 1), user_email="b@x", action="remove_user", org="org", result="success"),
+        dict(timestamp=datetime(2026, 3, 9, 1), user_email="b@x", action="remove_user", org="other", result="success"),
+    )
+
+    daily = asyncio.run(audit.audit_stats(org="org", group_by=["action", "result"], bucket="day"))
+    assert daily == [
+        {"bucket": "2026-03-02T00:00:00", "action": "add_user", "result": "error", "count": 1},
+        {"bucket": "2026-03-02T00:00:00", "action": "add_user", "result": "success", "count": 1},
+        {"bucket": "2026-03-08T00:00:00", "action": "add_user", "result": "success", "count": 1},
+        {"bucket": "2026-03-09T00:00:00", "action": "remove_user", "result": "success", "count": 1},
+    ]
+
+    # 2026-03-02 is a Monday; Sunday the 8th still belongs to that week
+    weekly = asyncio.run(audit.audit_stats(org="org", group_by=["user"], bucket="week"))
+    assert weekly == [
+        {"bucket": "2026-03-02T00:00:00", "user": "a@x", "count": 2},
+        {"bucket": "2026-03-02T00:00:00", "user": "b@x", "count": 1},
+        {"bucket": "2026-03-09T00:00:00", "user": "b@x", "count": 1},
+    ]
+
+    for dimension in ("parameters", "org"):
+        with pytest.raises(ValueError):
+            asyncio.run(audit.audit_stats(org="org", group_by=[dimension]))
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    store = SegmentStore(str(tmp_path / "archive"))
+    monkeypatch.setattr(audit, "archive", store)
+    return store
+
+
+def test_closed_months_move_to_segments_and_stay_queryable(audit_db, archive, monkeypatch):
+    add_entries(*[
+        dict(timestamp=datetime(2026, month, day, 12), user_email="a@x", action="delete_secret", org="org",
+             repo=f"r{month}-{day}", result="success")
+        for month, day in [(1, 5), (1, 20), (2, 10), (6, 1), (6, 2)]
+    ])
+    retention = audit.AuditRetention(hot_months=3, retention_days=0)
+
+    assert asyncio.run(retention.run_once(now=datetime(2026, 6, 15))) == {"expired": 0, "archived": 3}
+    assert asyncio.run(count_entries()) == 2
+    assert [s["month"] for s in archive.segments()] == ["2026-02", "2026-01"]
+    assert audit.archived_before() == "2026-03-01T00:00:00"
+
+    everything = ["r6-2", "r6-1", "r2-10", "r1-20", "r1-5"]
+    assert [e["repo"] for e in asyncio.run(audit.query_audit_logs(org="org"))] == everything
+    assert [e["repo"] for e in asyncio.run(audit.query_audit_logs(org="org", limit=2, offset=3))] == everything[3:]
+
+    async def pages():
+        seen, cursor = [], ""
+        while cursor is not None:
+            page = await audit.query_audit_page(org="org", limit=2, cursor=cursor)
+            seen += [e["repo"] for e in page["entries"]]
+            cursor = page["next_cursor"]
+        return seen
+
+    assert asyncio.run(pages()) == everything
+
+    # A recent window never opens a segment
+    monkeypatch.setattr(archive, "read", lambda *a: pytest.fail("archive read for a hot-only query"))
+    recent = asyncio.run(audit.query_audit_logs(org="org", since=datetime(2026, 5, 1)))
+    assert [e["repo"] for e in recent] == ["r6-2", "r6-1"]
+    assert asyncio.run(audit.query_audit_logs(org="someone-else", limit=10)) == []
+
+
+def test_interrupted_archive_pass_does_not_duplicate_or_lose_rows(audit_db, archive):
+    add_entries(*[
+        dict(id=i, timestamp=datetime(2026, 5, i), action="a", org="org", result="success") for i in (1, 2)
+    ])
+    asyncio.run(audit.AuditRetention(hot_months=1, retention_days=0).run_once(now=datetime(2026, 6, 15)))
+
+    # The pass stopped after writing the segment: its rows are back in the database, next to a late one
+    add_entries(*[
+        dict(id=i, timestamp=datetime(2026, 5, i), action="a", org="org", result="success") for i in (1, 2, 3)
+    ])
+    result = asyncio.run(audit.AuditRetention(hot_months=1, retention_days=0).run_once(now=datetime(2026, 6, 15)))
+    assert result["archived"] == 3
+    assert asyncio.run(count_entries()) == 0
+    may = archive.get(datetime(2026, 5, 1))
+    assert (may["rows"], may["max_id"]) == (3, 3)
+    assert [r["id"] for r in archive.read(may, lambda r: True)] == [3, 2, 1]
+
+
+def test_archiving_is_off_without_a_directory_and_expiry_alone_does_not_vacuum(audit_db, monkeypatch):
+    monkeypatch.setattr(audit, "archive", SegmentStore(None))
+    compactions = []
+    monkeypatch.setattr(audit.AuditRetention, "_compact", lambda self: compactions.append(1) or asyncio.sleep(0))
+    add_entries(*[
+        dict(timestamp=datetime(2026, month, 1), action="a", org="org", result="success") for month in (1, 5)
+    ])
+    result = asyncio.run(audit.AuditRetention(hot_months=1, retention_days=60).run_once(now=datetime(2026, 6, 15)))
+    assert result == {"expired": 1, "archived": 0}
+    assert asyncio.run(count_entries()) == 1
+    assert audit.archive.segments() == [] and compactions == []
+
+
+def test_retention_drops_expired_segments_and_rows(audit_db, archive):
+    add_entries(*[
+        dict(timestamp=datetime(2026, month, 1), action="a", org="org", result="success") for month in (1, 2, 5, 6)
+    ])
+    asyncio.run(audit.AuditRetention(hot_months=1, retention_days=0).run_once(now=datetime(2026, 6, 15)))
+    files = {s["file"] for s in archive.segments()}
+    assert len(files) == 3
+
+    # A row for an archived month that arrived late is merged into its segment, not dropped
+    add_entries(dict(timestamp=datetime(2026, 5, 3), action="a", org="org", result="success"))
+    asyncio.run(audit.AuditRetention(hot_months=1, retention_days=0).run_once(now=datetime(2026, 6, 15)))
+    assert asyncio.run(count_entries()) == 1
+    may = archive.get(datetime(2026, 5, 1))
+    assert may["rows"] == 2
+    assert [r["timestamp"][:10] for r in archive.read(may, lambda r: True)] == ["2026-05-03", "2026-05-01"]
+
+    result = asyncio.run(audit.AuditRetention(hot_months=0, retention_days=60).run_once(now=datetime(2026, 6, 15)))
+    assert result == {"expired": 2, "archived": 0}
+    assert [s["month"] for s in archive.segments()] == ["2026-05"]
+    assert [p.name for p in Path(archive.path).glob("*.gz")] == ["audit-2026-05.ndjson.gz"]
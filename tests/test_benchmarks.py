@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_github import FakeGitHubConfig, create_app
+from benchmarks.run import compare, summarize
+
+
+def test_fake_github_paginates_revalidates_and_rate_limits():
+    client = TestClient(create_app(FakeGitHubConfig(repos=45, rate_limit=4)))
+
+    first = client.get("/orgs/acme/repos", params={"per_page": 30})
+    assert len(first.json()) == 30
+    assert 'rel="next"' in first.headers["Link"]
+    assert first.headers["X-RateLimit-Remaining"] == "3"
+
+    cached = client.get("/orgs/acme/repos", params={"per_page": 30}, headers={"If-None-Match": first.headers["ETag"]})
+    assert cached.status_code == 304
+
+    client.get("/orgs/acme")
+    client.get("/orgs/acme")
+    exhausted = client.get("/orgs/acme")
+    assert exhausted.status_code == 403
+    assert exhausted.headers["X-RateLimit-Remaining"] == "0"
+    assert client.get("/_stats").json()["by_route"]["GET /orgs/{org}/repos"] == 2
+
+
+def test_compare_flags_latency_throughput_and_call_regressions():
+    baseline = {"results": {"act": summarize([0.1] * 100, 1.0, 200, 0)}}
+    same = {"results": {"act": summarize([0.11] * 100, 1.05, 200, 0)}}
+    worse = {"results": {"act": summarize([0.2] * 100, 2.0, 300, 1)}}
+
+    assert compare(same, baseline, tolerance=0.25) == []
+    assert len(compare(worse, baseline, tolerance=0.25)) == 4
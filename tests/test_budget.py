@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+from app.github_api.budget import BudgetScheduler, Lane, github_lane
+
+
+def run_in_lane(scheduler, lane, verb, order, name):
+    def run():
+        with github_lane(lane):
+            with scheduler.slot("installation:1", verb):
+                order.append(name)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_mutations_go_before_queued_reads():
+    scheduler = BudgetScheduler(max_inflight=1, mutation_interval=0)
+    order = []
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot("installation:1", "GET"):
+            release.wait()
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.05)
+
+    read = run_in_lane(scheduler, Lane.BACKGROUND, "GET", order, "background")
+    time.sleep(0.05)
+    mutation = run_in_lane(scheduler, Lane.MUTATION, "PUT", order, "mutation")
+    time.sleep(0.05)
+    release.set()
+    for thread in (holder, read, mutation):
+        thread.join(timeout=3)
+
+    assert order == ["mutation", "background"]
+
+
+def test_reads_keep_a_reserve_for_mutations():
+    scheduler = BudgetScheduler(mutation_interval=0, reserves={Lane.MUTATION: 0, Lane.READ: 10, Lane.BACKGROUND: 10})
+    scheduler.observe("installation:1", 200, {"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": str(time.time() + 0.3)})
+    order = []
+
+    read = run_in_lane(scheduler, Lane.READ, "GET", order, "read")
+    mutation = run_in_lane(scheduler, Lane.MUTATION, "POST", order, "mutation")
+    mutation.join(timeout=1)
+    assert order == ["mutation"]
+    read.join(timeout=2)
+    assert order == ["mutation", "read"]
+
+
+def test_plain_403_does_not_back_off():
+    scheduler = BudgetScheduler()
+    scheduler.observe("installation:1", 403, {"X-RateLimit-Remaining": "4000"})
+    assert scheduler.snapshot()["installation:1"]["blocked_until"] == 0.0
+    scheduler.observe("installation:1", 403, {"Retry-After": "30"})
+    assert scheduler.snapshot()["installation:1"]["blocked_until"] > time.time() + 25
+
+
+def test_reads_out_of_budget_wait_before_taking_an_executor_slot(monkeypatch):
+    from app.github_api import executor
+
+    budget = BudgetScheduler(reserves={Lane.MUTATION: 0, Lane.READ: 10, Lane.BACKGROUND: 10})
+    monkeypatch.setattr(executor, "scheduler", budget)
+    monkeypatch.setattr(executor, "GITHUB_ORG_CONCURRENCY", 1)
+
+    def call(verb):
+        with budget.slot("installation:1", verb):
+            return verb
+
+    async def main():
+        await executor.run_github("acme", call, "GET")  # learns that acme is installation:1
+        budget.observe("installation:1", 200, {"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": str(time.time() + 0.5)})
+        with github_lane(Lane.READ):
+            read = asyncio.ensure_future(executor.run_github("acme", call, "GET"))
+        await asyncio.sleep(0.1)
+        assert not read.done()
+        # The waiting read holds neither the org's only slot nor a thread
+        with github_lane(Lane.MUTATION):
+            assert await asyncio.wait_for(executor.run_github("acme", call, "POST"), 0.3) == "POST"
+        return await asyncio.wait_for(read, 2)
+
+    assert asyncio.run(main()) == "GET"
+    assert budget.admission_delay("other-org", Lane.READ) == 0.0
+
+
+def test_revalidated_reads_are_not_charged():
+    scheduler = BudgetScheduler()
+    scheduler.observe("installation:1", 200, {"X-RateLimit-Remaining": "1000", "X-RateLimit-Reset": str(time.time() + 60)})
+    with scheduler.slot("installation:1", "GET"):
+        scheduler.observe("installation:1", 304, {}, counted=False)
+    assert scheduler.snapshot()["installation:1"]["remaining"] == 1000
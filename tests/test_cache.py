@@ -0,0 +1,108 @@
+import multiprocessing
+import time
+
+from app.cache import SQLiteStore, TieredCache
+
+# Forking a process that already runs background threads can deadlock the child
+spawn = multiprocessing.get_context("spawn")
+
+
+def make_cache(tmp_path, name="things", **kwargs):
+    # A separate store per cache behaves like a separate worker process
+    return TieredCache(name, store=SQLiteStore(str(tmp_path / "cache.db")), **kwargs)
+
+
+def test_second_worker_reads_the_shared_tier(tmp_path):
+    calls = []
+    loader = lambda: calls.append(1) or {"n": len(calls)}
+
+    first, second = make_cache(tmp_path, ttl=60), make_cache(tmp_path, ttl=60)
+    assert first.get("k", loader) == {"n": 1}
+    assert second.get("k", loader) == {"n": 1}
+    assert calls == [1]
+
+    second.set("k", {"n": 5})
+    assert first.get("k", loader) == {"n": 1}  # L1 is trusted for l1_ttl
+    first._l1["k"].checked_at = 0
+    assert first.get("k", loader) == {"n": 5}
+
+
+def test_stale_entries_are_served_while_one_fill_runs(tmp_path):
+    cache = make_cache(tmp_path, ttl=0.1, stale_ttl=60)
+    values = iter(["old", "new"])
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        if len(calls) > 1:
+            time.sleep(0.2)
+        return next(values)
+
+    assert cache.get("k", slow_loader) == "old"
+    time.sleep(0.15)
+    started = time.monotonic()
+    assert [cache.get("k", slow_loader) for _ in range(5)] == ["old"] * 5
+    assert time.monotonic() - started < 0.1
+    time.sleep(0.3)
+    assert cache.get("k", slow_loader) == "new"
+    assert len(calls) == 2
+
+
+def test_warm_start_loads_entries_left_on_disk(tmp_path):
+    make_cache(tmp_path, ttl=60).set("k", [1, 2])
+    restarted = make_cache(tmp_path, ttl=60)
+    assert restarted.warm() == 1
+    assert restarted._l1["k"].value == [1, 2]
+
+
+def _fill(path, marker):
+    cache = TieredCache("things", ttl=60, store=SQLiteStore(path))
+
+    def loader():
+        with open(marker, "a") as f:
+            f.write("x")
+        time.sleep(0.3)
+        return "value"
+
+    assert cache.get("k", loader) == "value"
+
+
+def test_fill_is_single_flight_across_processes(tmp_path):
+    path, marker = str(tmp_path / "cache.db"), str(tmp_path / "loads")
+    workers = [spawn.Process(target=_fill, args=(path, marker)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(30)
+    assert all(w.exitcode == 0 for w in workers)
+    assert open(marker).read() == "x"
+
+
+def test_l1_expiry_reads_only_the_version_until_it_changes(tmp_path):
+    first, second = make_cache(tmp_path, ttl=60), make_cache(tmp_path, ttl=60)
+    first.set("k", "v1")
+    assert second.get("k", lambda: None) == "v1"
+
+    reads = []
+    get = second.store.get
+    second.store.get = lambda *args: reads.append(args) or get(*args)
+    second._l1["k"].checked_at = 0
+    assert second.get("k", lambda: None) == "v1"
+    assert reads == []
+
+    first.set("k", "v2")
+    second._l1["k"].checked_at = 0
+    assert second.get("k", lambda: None) == "v2"
+    assert len(reads) == 1
+
+
+def test_patches_are_shared_but_keep_the_entry_age(tmp_path):
+    first, second = make_cache(tmp_path, ttl=60), make_cache(tmp_path, ttl=60)
+    first.get("k", lambda: "loaded")
+    loaded_at = first._l1["k"].stored_at
+
+    time.sleep(0.01)
+    first.replace("k", "patched")
+    second._l1.clear()
+    assert second.get("k", lambda: None) == "patched"
+    assert second._l1["k"].stored_at == first._l1["k"].stored_at == loaded_at
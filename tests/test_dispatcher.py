@@ -0,0 +1,61 @@
+import asyncio
+from collections import Counter
+
+from app.github_api import dispatcher
+from app.models import ActionRequest
+
+USER = {"email": "alice@example.com"}
+
+
+def test_batch_groups_clients_and_authorization(monkeypatch):
+    calls = Counter()
+
+    def get_app_client(org, repo=None):
+        calls["client"] += 1
+        return object()
+
+    def check_team_membership(gh, org, team, username):
+        calls[f"team:{team}"] += 1
+        return team == "infrastructure-admins"
+
+    monkeypatch.setattr(dispatcher, "get_app_client", get_app_client)
+    monkeypatch.setattr(dispatcher, "get_target", lambda gh, org, repo: f"{org}/{repo}")
+    monkeypatch.setattr(dispatcher, "check_team_membership", check_team_membership)
+    monkeypatch.setitem(dispatcher.dispatch_table, "delete_secret", lambda target, params: {"target": target, "secret": params["name"]})
+
+    actions = [
+        ActionRequest(org="acme", repo="api", action="delete_secret", parameters={"name": "A"}),
+        ActionRequest(org="acme", repo="api", action="delete_secret", parameters={"name": "B"}),
+        ActionRequest(org="acme", repo="web", action="delete_secret", parameters={"name": "C"}),
+        ActionRequest(org="acme", repo="web", action="delete_secret", parameters={"name": "D", "team": "other"}),
+        ActionRequest(org="acme", repo="web", action="nonexistent", parameters={}),
+    ]
+    results = asyncio.run(dispatcher.perform_github_actions(actions, USER))
+
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert [r["status"] for r in results] == ["ok", "ok", "ok", "error", "error"]
+    assert results[0]["details"] == {"target": "acme/api", "secret": "A"}
+    assert results[3]["error"] == "User not in required team"
+    assert results[4]["error"] == "Unknown action: nonexistent"
+    assert calls["client"] == 2
+    assert calls["team:infrastructure-admins"] == 2
+    assert calls["team:other"] == 1
+
+
+def test_batch_reports_superseded_writes(monkeypatch):
+    async def run_mutation(org, repo, action_type, target, params):
+        if params["name"] == "OLD":
+            return {"status": "superseded", "by": "delete_secret"}
+        return {"secret": params["name"]}
+
+    monkeypatch.setattr(dispatcher, "get_app_client", lambda org, repo=None: object())
+    monkeypatch.setattr(dispatcher, "get_target", lambda gh, org, repo: f"{org}/{repo}")
+    monkeypatch.setattr(dispatcher, "check_team_membership", lambda gh, org, team, username: True)
+    monkeypatch.setattr(dispatcher, "run_mutation", run_mutation)
+
+    actions = [
+        ActionRequest(org="acme", repo="api", action="delete_secret", parameters={"name": name}) for name in ("OLD", "NEW")
+    ]
+    results = asyncio.run(dispatcher.perform_github_actions(actions, USER))
+    assert [r["status"] for r in results] == ["superseded", "ok"]
+    assert results[0]["by"] == "delete_secret" and "details" not in results[0]
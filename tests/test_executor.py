@@ -0,0 +1,29 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+from app.github_api.executor import run_github
+
+marker = contextvars.ContextVar("marker", default=None)
+
+
+def test_run_github_runs_off_the_event_loop():
+    async def main():
+        marker.set("from-caller")
+        loop_thread = threading.get_ident()
+        seen = await run_github("org", lambda: (threading.get_ident(), marker.get()))
+        return loop_thread, seen
+
+    loop_thread, (worker_thread, value) = asyncio.run(main())
+    assert worker_thread != loop_thread
+    assert value == "from-caller"
+
+
+def test_blocking_calls_overlap():
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(run_github("org", time.sleep, 0.1) for _ in range(4)))
+        return time.perf_counter() - started
+
+    assert asyncio.run(main()) < 0.3
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.idempotency import IdempotencyStore
+from app.models import ActionRequest
+
+USER = {"sub": "u1", "email": "alice@example.com"}
+
+
+def action(name="x"):
+    return ActionRequest(org="acme", repo="", action="create_repo", parameters={"name": name})
+
+
+def test_identical_inflight_requests_share_one_call():
+    store = IdempotencyStore()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"status": "ok"}
+
+    async def main():
+        # "x" and "dev-x" normalize to the same action under the repo policy
+        return await asyncio.gather(
+            store.run("act", action("x"), USER, slow),
+            store.run("act", action("dev-x"), USER, slow),
+        )
+
+    (first, replayed_first), (second, replayed_second) = asyncio.run(main())
+    assert calls == [1]
+    assert first == second == {"status": "ok"}
+    assert (replayed_first, replayed_second) == (False, True)
+
+
+def test_completed_result_is_replayed_but_failures_are_not():
+    store = IdempotencyStore()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return {"status": "ok"}
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await store.run("act", action(), USER, flaky, "key-1")
+        await store.run("act", action(), USER, flaky, "key-1")
+        return await store.run("act", action(), USER, flaky, "key-1")
+
+    result, replayed = asyncio.run(main())
+    assert len(attempts) == 2
+    assert replayed and result == {"status": "ok"}
+
+
+def test_key_reused_for_different_request_is_rejected():
+    store = IdempotencyStore()
+
+    async def ok():
+        return {"status": "ok"}
+
+    async def main():
+        await store.run("act", action("a"), USER, ok, "key-1")
+        await store.run("act", action("b"), USER, ok, "key-1")
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(main())
+    assert exc.value.status_code == 422
+
+
+def test_derived_replay_does_not_skip_a_write_that_was_superseded():
+    store = IdempotencyStore()
+    calls = []
+
+    def write(name):
+        async def run():
+            calls.append(name)
+            return {"status": "ok", "name": name}
+        return run
+
+    async def main():
+        await store.run("act", action("a"), USER, write("a"))
+        _, retried = await store.run("act", action("a"), USER, write("a"))
+        await store.run("act", action("b"), USER, write("b"))
+        _, replayed = await store.run("act", action("a"), USER, write("a"))
+        return retried, replayed
+
+    retried, replayed = asyncio.run(main())
+    # An immediate retry replays; a -> b -> a writes a again
+    assert (retried, replayed) == (True, False)
+    assert calls == ["a", "b", "a"]
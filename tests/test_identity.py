@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from app.github_api import identity
+from app.github_api.repo_index import RepoIndex
+
+USER = {"email": "alice@example.com", "name": "Alice"}
+
+
+def fake_subqueries(monkeypatch, slow_orgs, delay):
+    def repos(org):
+        if org in slow_orgs:
+            time.sleep(delay)
+        return RepoIndex(org, [f"{org}/repo"])
+
+    monkeypatch.setattr(identity, "get_user_membership", lambda username, org: {"teams": ["infra"]})
+    monkeypatch.setattr(identity, "get_installation_repos", repos)
+    monkeypatch.setattr(identity, "get_installation_metadata", lambda org: {"permissions": {}})
+    monkeypatch.setattr(identity, "get_admin_flag", lambda username, org: org == "fast")
+
+
+def test_report_fans_out_and_flags_late_orgs(monkeypatch):
+    monkeypatch.setenv("GITHUB_ORGS", "fast,slow")
+    monkeypatch.setattr(identity, "IDENTITY_REPORT_TIMEOUT", 0.2)
+    monkeypatch.setattr(identity, "_last_known", {})
+    fake_subqueries(monkeypatch, slow_orgs={"slow"}, delay=0.5)
+
+    started = time.monotonic()
+    report = asyncio.run(identity.get_identity_report(USER))
+    assert time.monotonic() - started < 0.45
+
+    assert report["flags"]["fast"] == {"is_admin": True, "stale": False, "partial": False}
+    assert report["github"]["fast"]["accessible_repos"] == {"count": 1, "href": "/repos/fast"}
+    assert report["flags"]["slow"]["partial"] is True
+    assert report["flags"]["slow"]["degraded"] == ["accessible_repos"]
+    assert report["github"]["slow"]["teams"] == ["infra"]
+
+    # The late call finishes in the background and is served as stale next time
+    time.sleep(0.4)
+    report = asyncio.run(identity.get_identity_report(USER))
+    assert report["flags"]["slow"]["stale"] is True
+    assert report["github"]["slow"]["accessible_repos"]["count"] == 1
+
+
+
+def test_failed_membership_lookup_flags_the_org(monkeypatch):
+    monkeypatch.setenv("GITHUB_ORGS", "acme")
+    monkeypatch.setattr(identity, "_last_known", {})
+    get_user_membership = identity.get_user_membership
+    fake_subqueries(monkeypatch, slow_orgs=set(), delay=0)
+
+    def unavailable(org):
+        raise RuntimeError("GitHub unavailable")
+
+    monkeypatch.setattr(identity, "get_user_membership", get_user_membership)
+    monkeypatch.setattr(identity, "get_membership_snapshot", unavailable)
+    report = asyncio.run(identity.get_identity_report(USER))
+
+    assert report["flags"]["acme"]["partial"] is True
+    assert report["flags"]["acme"]["degraded"] == ["teams"]
+    assert report["github"]["acme"]["teams"] == []
@@ -0,0 +1,123 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from github import GithubException
+
+from app.github_api.installations import InstallationIndex, InstallationNotFound
+
+
+class FakeIntegration:
+    def __init__(self, installations):
+        self.installations = installations
+        self.calls = []
+        self.fail = None
+
+    def get_installations(self):
+        self.calls.append("list")
+        if self.fail:
+            raise self.fail
+        return [
+            SimpleNamespace(id=inst_id, account=SimpleNamespace(login=login), repository_selection=selection)
+            for login, (inst_id, selection, _) in self.installations.items()
+        ]
+
+    def get_repo_installation(self, org, repo):
+        self.calls.append(f"repo:{repo}")
+        inst_id, _, repos = self.installations[org]
+        if repo not in repos:
+            raise GithubException(404, {"message": "Not Found"}, None)
+        return SimpleNamespace(id=inst_id)
+
+
+def make_index(integration, negative_ttl=60):
+    return InstallationIndex(lambda: integration, ttl=600, negative_ttl=negative_ttl)
+
+
+def test_orgs_and_repos_resolve_from_one_listing():
+    integration = FakeIntegration({"Acme": (1, "all", ()), "beta": (2, "selected", ("api",))})
+    index = make_index(integration)
+
+    assert index.lookup("acme") == 1
+    assert index.lookup("acme", "anything") == 1
+    assert index.lookup("beta", "api") == 2
+    assert index.lookup("beta", "api") == 2
+    assert integration.calls == ["list", "repo:api"]
+
+
+def test_unknown_org_and_repo_fail_fast_from_negative_cache(monkeypatch):
+    integration = FakeIntegration({"beta": (2, "selected", ("api",))})
+    index = make_index(integration)
+
+    for _ in range(3):
+        with pytest.raises(InstallationNotFound):
+            index.lookup("nobody")
+        with pytest.raises(InstallationNotFound):
+            index.lookup("beta", "secret-repo")
+    assert integration.calls == ["list", "repo:secret-repo"]
+
+    # Once the negative entry expires, a newly installed org is found by relisting
+    integration.installations["nobody"] = (3, "all", ())
+    clock = time.time() + 61
+    monkeypatch.setattr("app.github_api.installations.time.time", lambda: clock)
+    assert index.lookup("nobody") == 3
+
+
+def test_negative_cache_is_bounded_and_drops_expired_entries(monkeypatch):
+    integration = FakeIntegration({"beta": (2, "selected", ())})
+    index = InstallationIndex(lambda: integration, ttl=600, negative_ttl=60, negative_entries=3)
+
+    for i in range(10):
+        with pytest.raises(InstallationNotFound):
+            index.lookup("beta", f"made-up-{i}")
+    assert list(index._misses) == [("beta", "made-up-7"), ("beta", "made-up-8"), ("beta", "made-up-9")]
+
+    clock = time.time() + 61
+    monkeypatch.setattr("app.github_api.installations.time.time", lambda: clock)
+    with pytest.raises(InstallationNotFound):
+        index.lookup("beta", "one-more")
+    assert list(index._misses) == [("beta", "one-more")]
+
+
+def test_repo_answers_are_not_memoized_for_all_installations_and_expire_otherwise(monkeypatch):
+    integration = FakeIntegration({"acme": (1, "all", ()), "beta": (2, "selected", ("api", "web", "ops"))})
+    index = InstallationIndex(lambda: integration, ttl=600, repo_entries=2)
+
+    for i in range(100):
+        assert index.lookup("acme", f"made-up-{i}") == 1
+    assert index._repos == {}
+
+    for repo in ("api", "web", "ops", "ops"):
+        assert index.lookup("beta", repo) == 2
+    assert list(index._repos) == [("beta", "web"), ("beta", "ops")]
+    assert integration.calls == ["list", "repo:api", "repo:web", "repo:ops"]
+
+    clock = time.time() + 601
+    monkeypatch.setattr("app.github_api.installations.time.time", lambda: clock)
+    index.lookup("beta", "ops")
+    assert integration.calls[-1] == "repo:ops"
+
+
+def test_transient_errors_are_not_cached():
+    integration = FakeIntegration({"acme": (1, "all", ())})
+    integration.fail = GithubException(502, {"message": "Bad Gateway"}, None)
+    index = make_index(integration)
+
+    with pytest.raises(GithubException) as excinfo:
+        index.lookup("acme")
+    assert not isinstance(excinfo.value, InstallationNotFound)
+
+    integration.fail = None
+    assert index.lookup("acme") == 1
+
+
+def test_invalidate_relists():
+    integration = FakeIntegration({})
+    index = make_index(integration)
+    with pytest.raises(InstallationNotFound):
+        index.lookup("acme")
+
+    integration.installations["acme"] = (7, "all", ())
+    index.invalidate("acme")
+    assert index.lookup("acme") == 7
+    assert integration.calls == ["list", "list"]
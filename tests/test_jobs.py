@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import audit, jobs
+from app.models import ActionRequest
+
+USER = {"email": "alice@example.com"}
+ACTION = ActionRequest(org="acme", repo="", action="create_repo", parameters={"name": "x"})
+
+
+@pytest.fixture
+def job_db(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/audit.db")
+    session_factory = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    monkeypatch.setattr(audit, "engine", engine)
+    monkeypatch.setattr(audit, "SessionLocal", session_factory)
+    monkeypatch.setattr(jobs, "SessionLocal", session_factory)
+    asyncio.run(audit.init_db())
+
+
+async def wait_for(runner, job_id, status):
+    for _ in range(100):
+        job = await runner.get(job_id, USER)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job never reached {status}")
+
+
+def test_job_runs_and_is_only_visible_to_its_owner(job_db):
+    async def handler(action, user):
+        return {"status": "ok", "details": {"name": action.parameters["name"]}}
+
+    async def main():
+        runner = jobs.JobRunner(workers=1)
+        await runner.start(handler)
+        job = await runner.submit(ACTION, USER)
+        done = await wait_for(runner, job["id"], "succeeded")
+        hidden = await runner.get(job["id"], {"email": "mallory@example.com"})
+        await runner.stop()
+        return done, hidden
+
+    done, hidden = asyncio.run(main())
+    assert done["result"] == {"status": "ok", "details": {"name": "x"}}
+    assert done["attempts"] == 1
+    assert hidden is None
+
+
+def test_unfinished_jobs_resume_after_restart(job_db):
+
+    async def main():
+        blocked = asyncio.Event()
+
+        async def stuck(action, user):
+            blocked.set()
+            await asyncio.sleep(60)
+
+        first = jobs.JobRunner(workers=1)
+        await first.start(stuck)
+        job = await first.submit(ACTION, USER)
+        await blocked.wait()
+        await first.stop()  # simulated restart while the job is running
+
+        async def ok(action, user):
+            return {"status": "ok"}
+
+        second = jobs.JobRunner(workers=1)
+        await second.start(ok)
+        done = await wait_for(second, job["id"], "succeeded")
+        await second.stop()
+        return done
+
+    done = asyncio.run(main())
+    assert done["attempts"] == 2
+
+
+def test_a_job_queued_by_several_workers_runs_once(job_db):
+    calls = []
+
+    async def handler(action, user):
+        calls.append(action.parameters["name"])
+        await asyncio.sleep(0.05)
+        return {"status": "ok"}
+
+    async def main():
+        first, second = jobs.JobRunner(workers=2), jobs.JobRunner(workers=2)
+        await first.start(handler)
+        await second.start(handler)
+        job = await first.submit(ACTION, USER)
+        second.queue.put_nowait(job["id"])  # as if the second process had found it on start
+        done = await wait_for(first, job["id"], "succeeded")
+        await asyncio.sleep(0.1)
+        await first.stop()
+        await second.stop()
+        return done
+
+    done = asyncio.run(main())
+    assert calls == ["x"]
+    assert done["attempts"] == 1
+
+
+def test_start_leaves_jobs_with_a_live_lease_alone(job_db):
+    async def main():
+        blocked = asyncio.Event()
+
+        async def stuck(action, user):
+            blocked.set()
+            await asyncio.sleep(60)
+
+        busy = jobs.JobRunner(workers=1)
+        await busy.start(stuck)
+        job = await busy.submit(ACTION, USER)
+        await blocked.wait()
+
+        # Another worker process starting up must not take over the running job
+        other = jobs.JobRunner(workers=1)
+        await other.start(stuck)
+        running = await other.get(job["id"], USER)
+        resumable = await other._resumable()
+        await other.stop()
+        await busy.stop()
+        return running, resumable
+
+    running, resumable = asyncio.run(main())
+    assert running["status"] == "running"
+    assert resumable == []
+
+
+def test_sweep_takes_over_jobs_whose_lease_expires_after_start(job_db):
+    async def ok(action, user):
+        return {"status": "ok"}
+
+    async def main():
+        # A process that crashed mid-job and restarted within the lease
+        async with jobs.SessionLocal() as session:
+            session.add(jobs.Job(
+                id="orphan", status="running", user='{"email": "alice@example.com"}', user_email="alice@example.com",
+                action=ACTION.model_dump_json(), attempts=1, owner="dead:1:x",
+                lease_until=datetime.utcnow() + timedelta(seconds=0.3),
+            ))
+            await session.commit()
+
+        runner = jobs.JobRunner(workers=1, lease=0.3)
+        await runner.start(ok)
+        assert (await runner.get("orphan", USER))["status"] == "running"
+        done = await wait_for(runner, "orphan", "succeeded")
+        await runner.stop()
+        return done
+
+    done = asyncio.run(main())
+    assert done["attempts"] == 2
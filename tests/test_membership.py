@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from app.github_api.membership import OrgMembershipSnapshot
+
+
+class FakeTeam:
+    def __init__(self, slug, members):
+        self.slug = slug
+        self.members = members
+        self.member_calls = 0
+
+    def get_members(self):
+        self.member_calls += 1
+        return [SimpleNamespace(login=m) for m in self.members]
+
+
+def make_snapshot(teams):
+    org = SimpleNamespace(get_teams=lambda: list(teams.values()))
+    client = SimpleNamespace(get_organization=lambda name: org)
+    snapshot = OrgMembershipSnapshot("org", lambda: client)
+    snapshot.refresh()
+    return snapshot
+
+
+def test_inverted_index_answers_lookups():
+    teams = {
+        "owners": FakeTeam("owners", ["Alice"]),
+        "infra": FakeTeam("infra", ["alice", "bob"]),
+    }
+    snapshot = make_snapshot(teams)
+
+    assert snapshot.teams_for("alice") == {"owners", "infra"}
+    assert snapshot.is_member("infra", "BOB")
+    assert not snapshot.is_member("owners", "bob")
+    assert all(team.member_calls == 1 for team in teams.values())
+
+
+def test_refresh_applies_team_and_member_changes():
+    teams = {
+        "owners": FakeTeam("owners", ["alice"]),
+        "infra": FakeTeam("infra", ["alice", "bob"]),
+    }
+    snapshot = make_snapshot(teams)
+
+    teams["infra"].members = ["bob", "carol"]
+    del teams["owners"]
+    snapshot.refresh()
+
+    assert snapshot.teams_for("alice") == frozenset()
+    assert "alice" not in snapshot.user_teams
+    assert snapshot.teams_for("carol") == {"infra"}
+
+
+def test_in_place_patches():
+    snapshot = make_snapshot({"infra": FakeTeam("infra", ["bob"])})
+    snapshot.add_member("infra", "Dave")
+    snapshot.remove_member("infra", "bob")
+    assert snapshot.is_member("infra", "dave")
+    assert not snapshot.is_member("infra", "bob")
@@ -0,0 +1,84 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from app.github_api.mutations import MutationScheduler
+
+
+def depth(key):
+    return REGISTRY.get_sample_value("mcp_github_mutation_queue_depth", {"key": key})
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_writes_serialize_per_key_and_run_in_parallel_across_keys():
+    scheduler = MutationScheduler()
+    running, peak, order = {}, {}, []
+
+    def write(repo, name):
+        async def fn():
+            running[repo] = running.get(repo, 0) + 1
+            peak[repo] = max(peak.get(repo, 0), running[repo])
+            await asyncio.sleep(0.01)
+            order.append((repo, name))
+            running[repo] -= 1
+            return name
+        return scheduler.run("delete_secret", "acme", repo, {"name": name}, fn)
+
+    async def main():
+        started = asyncio.get_running_loop().time()
+        results = await asyncio.gather(*(write(repo, f"S{i}") for i in range(4) for repo in ("api", "web")))
+        return results, asyncio.get_running_loop().time() - started
+
+    results, elapsed = asyncio.run(main())
+    assert results == ["S0", "S0", "S1", "S1", "S2", "S2", "S3", "S3"]
+    assert peak == {"api": 1, "web": 1}
+    assert [name for repo, name in order if repo == "api"] == ["S0", "S1", "S2", "S3"]
+    assert elapsed < 0.08  # the two repos overlapped
+    assert depth("acme/repo:api") is None
+
+
+def test_superseded_writes_are_coalesced():
+    scheduler = MutationScheduler()
+    calls = []
+
+    async def main():
+        release = asyncio.Event()
+
+        def write(action, params, wait=False):
+            async def fn():
+                if wait:
+                    await release.wait()
+                calls.append((action, params.get("value") or params.get("username")))
+                return {"action": action, **params}
+            key_params = {**params, "team": "Platform"} if "username" in params else params
+            return asyncio.ensure_future(scheduler.run(action, "acme", "api", key_params, fn))
+
+        first = write("replace_secret", {"name": "TOKEN", "value": "v1"}, wait=True)
+        await settle()  # v1 is now running
+        second = write("replace_secret", {"name": "TOKEN", "value": "v2"})
+        other = write("replace_secret", {"name": "OTHER", "value": "o"})
+        third = write("replace_secret", {"name": "token", "value": "v3"})
+        added = write("add_user_to_team", {"username": "Carol"})
+        removed = write("remove_user_from_team", {"username": "carol"})
+        await settle()
+        assert depth("acme/repo:api") == 3
+        # The loop keeps only weak references to tasks; the scheduler holds the drains
+        assert "acme/repo:api" in scheduler._drains
+        release.set()
+        return await asyncio.gather(first, second, other, third, added, removed)
+
+    first, second, other, third, added, removed = asyncio.run(main())
+    # The team key runs alongside the repo key, so only the order within each key is fixed
+    assert [c for c in calls if c[0] == "replace_secret"] == [
+        ("replace_secret", "v1"), ("replace_secret", "o"), ("replace_secret", "v3"),
+    ]
+    assert [c for c in calls if c[0] != "replace_secret"] == [("remove_user_from_team", "carol")]
+    assert first["value"] == "v1"
+    assert second == {"status": "superseded", "by": "replace_secret"} and third["value"] == "v3"
+    assert added == {"status": "superseded", "by": "remove_user_from_team"}
+    assert removed["action"] == "remove_user_from_team"
+    assert scheduler._drains == {}
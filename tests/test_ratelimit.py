@@ -0,0 +1,117 @@
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app import ratelimit
+from app.ratelimit import MemoryBucketStore, SQLiteBucketStore, RateLimiter, parse_limits
+
+# Per-call budget for the limiter check, in microseconds: about 5x the measured ~3us (memory) and
+# ~30us (SQLite), so a regression fails while the best of a few rounds absorbs scheduler noise
+MEMORY_BUDGET_US = 15
+SQLITE_BUDGET_US = 150
+
+# Forking a process that already runs background threads can deadlock the child
+spawn = multiprocessing.get_context("spawn")
+
+
+def test_parse_limits():
+    assert parse_limits("mutation=5/minute, read=2/second") == {"mutation": (5, 5 / 60), "read": (2, 2.0)}
+    with pytest.raises(ValueError):
+        parse_limits("mutation=5 per minute")
+
+
+def _store(kind, tmp_path):
+    return MemoryBucketStore() if kind == "memory" else SQLiteBucketStore(str(tmp_path / "rl.db"))
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_bucket_refills(kind, tmp_path):
+    store = _store(kind, tmp_path)
+    assert [store.take("k", 2, 1.0, 100.0) for _ in range(3)] == [0.0, 0.0, pytest.approx(1.0)]
+    assert store.take("k", 2, 1.0, 100.5) == pytest.approx(0.5)
+    assert store.take("k", 2, 1.0, 101.0) == 0.0
+    # other users and classes have their own buckets
+    assert store.take("other", 2, 1.0, 101.0) == 0.0
+
+
+def test_limiter_keys_on_user_and_class():
+    limiter = RateLimiter(MemoryBucketStore(), {"mutation": (1, 1 / 60), "read": (10, 1.0)})
+    alice, bob = {"sub": "alice"}, {"sub": "bob"}
+    limiter.check(alice, "mutation")
+    limiter.check(bob, "mutation")
+    limiter.check(alice, "read")
+    with pytest.raises(HTTPException) as exc:
+        limiter.check(alice, "mutation")
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "60"
+
+
+def test_sqlite_store_fails_open_while_another_worker_holds_the_lock(tmp_path):
+    path = str(tmp_path / "rl.db")
+    store = SQLiteBucketStore(path, busy_timeout_ms=10)
+    assert store.take("k", 1, 1e-6, 100.0) == 0.0
+
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        # The bucket is empty, but the store can't tell, so the request goes through
+        assert store.take("k", 1, 1e-6, 100.0) == 0.0
+        assert time.perf_counter() - started < 1
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+    assert store.take("k", 1, 1e-6, 100.0) > 0
+
+
+def test_sqlite_prune_waits_for_each_buckets_own_period(tmp_path):
+    store = SQLiteBucketStore(str(tmp_path / "rl.db"))
+    day, minute = (1, 1 / 86400), (1, 1 / 60)
+    assert store.take("daily", *day, 0.0) == 0.0
+    assert store.take("minutely", *minute, 0.0) == 0.0
+
+    # Two hours idle: the per-minute bucket is full again and can go, the daily one is still empty
+    now = 7200.0
+    for i in range(ratelimit._PRUNE_EVERY):
+        store.take(f"other-{i}", 10**9, 10**6, now)
+    keys = {row[0] for row in store._conn.execute("SELECT key FROM buckets")}
+    assert "daily" in keys and "minutely" not in keys
+    assert store.take("daily", *day, now) > 0
+
+
+def _hammer(path, n, results):
+    # Long enough that no take fails open under contention, which would let extra requests through
+    store = SQLiteBucketStore(path, busy_timeout_ms=5000)
+    results.put(sum(store.take("shared", 50, 1e-6, time.time()) == 0.0 for _ in range(n)))
+
+
+def test_sqlite_bucket_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "rl.db")
+    results = spawn.Queue()
+    workers = [spawn.Process(target=_hammer, args=(path, 40, results)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(30)
+    assert sum(results.get(timeout=30) for _ in workers) == 50
+
+
+@pytest.mark.parametrize("kind,budget_us", [("memory", MEMORY_BUDGET_US), ("sqlite", SQLITE_BUDGET_US)])
+def test_check_overhead_within_budget(kind, budget_us, tmp_path):
+    limiter = RateLimiter(_store(kind, tmp_path), {"read": (10**9, 10**6)})
+    users = [{"sub": f"user-{i}"} for i in range(100)]
+    for user in users:
+        limiter.check(user, "read")
+
+    n = 5000
+    rounds = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(n):
+            limiter.check(users[i % 100], "read")
+        rounds.append((time.perf_counter() - start) / n * 1e6)
+    per_call_us = min(rounds)
+    assert per_call_us < budget_us, f"{kind} limiter took {per_call_us:.1f}us per check"
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.github_api import reconcile as rc
+from app.github_api.dispatcher import UnauthorizedError
+from app.github_api.membership import OrgMembershipSnapshot
+from app.github_api.repo_index import RepoIndex
+from app.models import DesiredState
+
+USER = {"email": "alice@example.com"}
+
+
+def fake_org(monkeypatch, repos, teams, secrets):
+    state = {"index": RepoIndex("acme", [f"acme/{r}" for r in repos]), "phases": []}
+    snapshot = OrgMembershipSnapshot("acme", client_factory=None)
+    snapshot.load(teams)
+
+    def patch_installation_repos(org, added=(), removed=()):
+        state["index"] = state["index"].patched(added=added, removed=removed)
+
+    async def perform_github_actions(actions, user):
+        state["phases"].append([(a.action, a.repo, dict(a.parameters)) for a in actions])
+        return [{"index": i, "status": "ok", "details": None} for i in range(len(actions))]
+
+    monkeypatch.setattr(rc, "get_app_client", lambda org, repo=None: None)
+    monkeypatch.setattr(rc, "check_team_membership", lambda gh, org, team, username: snapshot.is_member(team, username))
+    monkeypatch.setattr(rc, "is_org_admin", lambda gh, org, username: "owners" in snapshot.teams_for(username))
+    monkeypatch.setattr(rc, "get_installation_repos", lambda org: state["index"])
+    monkeypatch.setattr(rc, "get_membership_snapshot", lambda org: snapshot)
+    monkeypatch.setattr(rc, "_secret_names", lambda org, repo: set(secrets.get(repo, ())))
+    monkeypatch.setattr(rc, "patch_installation_repos", patch_installation_repos)
+    monkeypatch.setattr(rc, "publish_snapshot", lambda snapshot: None)
+    monkeypatch.setattr(rc, "perform_github_actions", perform_github_actions)
+    return state
+
+
+def test_plan_issues_only_the_differences_in_dependency_order(monkeypatch):
+    org = fake_org(
+        monkeypatch,
+        repos=["dev-api"],
+        teams={"platform": ["alice", "bob"], "infrastructure-admins": ["alice"]},
+        secrets={"dev-api": {"MCP_TOKEN", "MCP_OLD"}},
+    )
+    desired = DesiredState(
+        org="acme",
+        repos=["api", "web"],
+        teams={"platform": ["Alice", "carol"], "missing": ["dave"]},
+        secrets={"api": {"TOKEN": None, "NEW": "s3cret"}, "web": {"TOKEN": "t"}},
+        prune=True,
+    )
+
+    plan, executed = asyncio.run(rc.reconcile(desired, USER, dry_run=True))
+    assert executed == [] and org["phases"] == []
+    assert plan["status"] == "planned"
+    assert plan["plan"][0] == [{"action": "create_repo", "repo": None, "parameters": {
+        "name": "dev-web", "private": True, "description": "Repository created by alice via MCP", "team": "infrastructure-admins",
+    }}]
+    assert sorted((a["action"], a["repo"], a["parameters"].get("username") or a["parameters"]["name"]) for a in plan["plan"][1]) == [
+        ("add_user_to_team", None, "carol"),
+        ("delete_secret", "dev-api", "MCP_OLD"),
+        ("remove_user_from_team", None, "bob"),
+        ("replace_secret", "dev-api", "MCP_NEW"),
+        ("replace_secret", "dev-web", "MCP_TOKEN"),
+    ]
+    # Secret values never appear in the plan
+    assert all("value" not in a["parameters"] for phase in plan["plan"] for a in phase)
+    assert plan["unresolved"] == [{"team": "missing", "error": "team does not exist"}]
+
+    report, executed = asyncio.run(rc.reconcile(desired, USER))
+    assert report["status"] == "partial" and report["failed"] == 0 and report["changes"] == 6
+    assert [len(phase) for phase in org["phases"]] == [1, 5]
+    assert len(executed) == 6
+
+    # The applied changes are in the cached state, so a second pass has only the secrets left
+    # (the fake org doesn't store them)
+    again, _ = asyncio.run(rc.reconcile(desired.model_copy(update={"teams": {"platform": ["alice", "carol"]}}), USER, dry_run=True))
+    assert {a["action"] for phase in again["plan"] for a in phase} == {"replace_secret", "delete_secret"}
+
+
+def test_only_team_members_and_org_admins_can_see_the_plan(monkeypatch):
+    fake_org(monkeypatch, repos=[], teams={"owners": ["root"], "platform": ["bob"]}, secrets={})
+    reads = []
+    monkeypatch.setattr(rc, "get_installation_repos", lambda org: reads.append(org))
+    desired = DesiredState(org="acme", repos=["api"], secrets={"api": {"TOKEN": None}})
+
+    with pytest.raises(UnauthorizedError):
+        asyncio.run(rc.reconcile(desired, {"email": "bob@example.com"}, dry_run=True))
+    # Nothing about the org was read for a caller who may not see it
+    assert reads == []
+
+    monkeypatch.setattr(rc, "get_installation_repos", lambda org: RepoIndex("acme", []))
+    plan, _ = asyncio.run(rc.reconcile(desired, {"email": "root@example.com"}, dry_run=True))
+    assert plan["status"] == "planned"
+
+
+def test_secret_names_match_githubs_upper_case_listing(monkeypatch):
+    fake_org(monkeypatch, repos=["dev-api"], teams={"infrastructure-admins": ["alice"]},
+             secrets={"dev-api": {"MCP_DB_PASSWORD", "MCP_STALE"}})
+    secrets = {"api": {"db_password": "s3cret", "api_key": None}}
+
+    for prune in (False, True):
+        plan, _ = asyncio.run(rc.reconcile(DesiredState(org="acme", repos=["api"], secrets=secrets, prune=prune), USER, dry_run=True))
+        planned = [(a["action"], a["parameters"]["name"]) for phase in plan["plan"] for a in phase]
+        # The existing secret is neither rewritten nor pruned; only the one the document doesn't mention goes
+        assert planned == ([("delete_secret", "MCP_STALE")] if prune else [])
+        assert plan["unresolved"] == [{"repo": "dev-api", "secret": "MCP_api_key", "error": "missing and no value given"}]
@@ -0,0 +1,37 @@
+import pytest
+
+from app.github_api.repo_index import RepoIndex
+
+NAMES = ["acme/api", "acme/API-gateway", "acme/web", "acme/infra-tools", "acme/apex", "acme/docs"]
+
+
+def test_prefix_filter_is_case_insensitive_and_sorted():
+    index = RepoIndex("acme", NAMES)
+    assert list(index.iter(prefix="ap")) == ["acme/apex", "acme/api", "acme/API-gateway"]
+    assert list(index.iter(contains="tools")) == ["acme/infra-tools"]
+    assert "acme/WEB" in index
+
+
+def test_cursor_pages_cover_all_matches():
+    index = RepoIndex("acme", NAMES)
+    seen, cursor = [], None
+    while True:
+        page = index.page(cursor=cursor, limit=4)
+        seen += page["repos"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == list(index)
+    assert len(seen) == len(NAMES)
+
+
+def test_patched_returns_new_index():
+    index = RepoIndex("acme", NAMES)
+    patched = index.patched(added=["acme/new"], removed=["acme/docs"])
+    assert "acme/new" in patched and "acme/docs" not in patched
+    assert len(index) == len(NAMES)
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        RepoIndex("acme", NAMES).page(cursor="%%%")
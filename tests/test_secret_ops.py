@@ -0,0 +1,80 @@
+import asyncio
+
+import nacl.encoding
+import nacl.public
+import pytest
+from github import GithubException
+
+from app.github_api import secret_ops
+
+PRIVATE_KEY = nacl.public.PrivateKey.generate()
+PUBLIC_KEY = PRIVATE_KEY.public_key.encode(nacl.encoding.Base64Encoder).decode("utf-8")
+
+
+class FakeRequester:
+    def __init__(self, reject_first_put=False, message="Bad key_id"):
+        self.calls = []
+        self.reject_first_put = reject_first_put
+        self.message = message
+
+    def requestJsonAndCheck(self, verb, url, input=None):
+        self.calls.append((verb, url))
+        if verb == "GET":
+            return {}, {"key_id": "k1", "key": PUBLIC_KEY}
+        if self.reject_first_put:
+            self.reject_first_put = False
+            raise GithubException(422, {"message": self.message}, None)
+        self.last_input = input
+        return {}, {}
+
+
+class FakeOrg:
+    login = "acme"
+
+    def __init__(self, requester):
+        self.requester = requester
+
+
+def setup_function():
+    secret_ops._public_keys.clear()
+
+
+def test_rotate_fetches_each_public_key_once():
+    requester = FakeRequester()
+    org = FakeOrg(requester)
+    params = {"name": "MCP_TOKEN", "value": "s3cr3t", "repos": "api, web"}
+
+    first = asyncio.run(secret_ops.rotate_secret(org, params))
+    asyncio.run(secret_ops.rotate_secret(org, params))
+
+    assert first["repos"] == {"api": "rotated", "web": "rotated"}
+    gets = [url for verb, url in requester.calls if verb == "GET"]
+    assert sorted(gets) == ["/repos/acme/api/actions/secrets/public-key", "/repos/acme/web/actions/secrets/public-key"]
+    sealed = requester.last_input["encrypted_value"]
+    box = nacl.public.SealedBox(PRIVATE_KEY)
+    assert box.decrypt(sealed.encode("utf-8"), encoder=nacl.encoding.Base64Encoder) == b"s3cr3t"
+
+
+def test_stale_key_is_refetched_once():
+    requester = FakeRequester(reject_first_put=True)
+    secret_ops.put_secret(requester, "/orgs/acme", "MCP_TOKEN", "value", visibility="private")
+    verbs = [verb for verb, _ in requester.calls]
+    assert verbs == ["GET", "PUT", "GET", "PUT"]
+    assert requester.last_input["visibility"] == "private"
+
+
+def test_other_validation_errors_are_not_retried():
+    requester = FakeRequester(reject_first_put=True, message="Invalid visibility")
+    with pytest.raises(GithubException):
+        secret_ops.put_secret(requester, "/orgs/acme", "MCP_TOKEN", "value", visibility="everyone")
+    assert [verb for verb, _ in requester.calls] == ["GET", "PUT"]
+
+
+def test_repos_may_be_a_list_or_a_comma_separated_string():
+    requester = FakeRequester()
+    listed = asyncio.run(secret_ops.rotate_secret(FakeOrg(requester), {"name": "MCP_T", "value": "v", "repos": ["api", " web"]}))
+    assert listed["repos"] == {"api": "rotated", "web": "rotated"}
+
+    for repos in ({"api": True}, ["api", 7], 42):
+        with pytest.raises(secret_ops.InvalidParameters):
+            asyncio.run(secret_ops.rotate_secret(FakeOrg(requester), {"name": "MCP_T", "value": "v", "repos": repos}))
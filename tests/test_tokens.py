@@ -0,0 +1,95 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from github import GithubException
+
+from app.github_api.tokens import InstallationTokenManager
+
+
+class FakeIntegration:
+    def __init__(self, lifetime=3600, delay=0.0):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.lookups = 0
+        self.mints = 0
+
+    def get_installations(self):
+        self.lookups += 1
+        return [SimpleNamespace(id=42, account=SimpleNamespace(login="org"), repository_selection="all")]
+
+    def get_repo_installation(self, org, repo):
+        self.lookups += 1
+        return SimpleNamespace(id=42)
+
+    def get_access_token(self, installation_id):
+        self.mints += 1
+        time.sleep(self.delay)
+        return SimpleNamespace(
+            token=f"tok-{self.mints}",
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.lifetime),
+            permissions={"contents": "read"},
+        )
+
+
+def test_warm_request_makes_no_token_calls():
+    integration = FakeIntegration()
+    manager = InstallationTokenManager(integration)
+
+    first = manager.get_client("org")
+    assert manager.get_client("org") is first
+    assert manager.get_client("org", "repo").__class__ is first.__class__
+    assert integration.mints == 1
+    assert integration.lookups == 1  # one listing covers the org and all its repos
+
+
+def test_concurrent_refreshes_collapse():
+    integration = FakeIntegration(delay=0.05)
+    manager = InstallationTokenManager(integration)
+
+    threads = [threading.Thread(target=manager.get_token, args=("org",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert integration.mints == 1
+
+
+def test_token_near_expiry_refreshes_in_background():
+    integration = FakeIntegration(lifetime=60)
+    manager = InstallationTokenManager(integration, refresh_margin=120)
+
+    first = manager.get_token("org")
+    second = manager.get_token("org")
+    assert second.token == first.token  # served from cache while refreshing
+
+    deadline = time.time() + 2
+    while integration.mints < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert integration.mints >= 2
+
+
+def test_failed_mint_for_a_removed_installation_drops_the_org():
+    integration = FakeIntegration()
+    manager = InstallationTokenManager(integration)
+    manager.get_token("org")
+
+    # Reinstalled under a new id, and no webhook told us
+    manager._tokens.clear()
+    integration.get_installations = lambda: [
+        SimpleNamespace(id=43, account=SimpleNamespace(login="org"), repository_selection="all")
+    ]
+    mint = integration.get_access_token
+
+    def get_access_token(installation_id):
+        if installation_id == 42:
+            raise GithubException(404, {"message": "Not Found"}, None)
+        return mint(installation_id)
+
+    integration.get_access_token = get_access_token
+    with pytest.raises(GithubException):
+        manager.get_token("org")
+    assert manager.get_token("org").installation_id == 43
@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from app import tracing
+from app.github_api import dispatcher
+from app.models import ActionRequest
+
+USER = {"email": "alice@example.com"}
+
+
+def test_act_stages_and_github_calls_are_traced(monkeypatch, tmp_path):
+    export = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(export))
+
+    def get_target(gh, org, repo):
+        tracing.count_github_call()  # runs in an executor thread, like GitHubConnection
+        return f"{org}/{repo}"
+
+    monkeypatch.setattr(dispatcher, "get_app_client", lambda org, repo=None: object())
+    monkeypatch.setattr(dispatcher, "check_team_membership", lambda gh, org, team, username: True)
+    monkeypatch.setattr(dispatcher, "get_target", get_target)
+    monkeypatch.setitem(dispatcher.dispatch_table, "delete_secret", lambda target, params: {"deleted": params["name"]})
+
+    async def request():
+        trace = tracing.start_trace()
+        action = ActionRequest(org="acme", repo="api", action="delete_secret", parameters={"name": "A"})
+        await dispatcher.perform_github_action(action, USER)
+        tracing.finish_trace(trace, "POST /act", "/act")
+        return trace
+
+    trace = asyncio.run(request())
+    tracing.exporter.flush()
+    assert [s["name"] for s in trace.spans] == ["policy", "token", "team_check", "target", "op"]
+    assert trace.github_calls == 1
+
+    lines = [json.loads(line) for line in export.read_text().splitlines()]
+    assert lines[0]["name"] == "POST /act"
+    assert lines[0]["attributes"]["github.calls"] == 1
+    assert {line["traceId"] for line in lines} == {trace.trace_id}
+    assert all(line["parentSpanId"] == lines[0]["spanId"] for line in lines[1:])
+
+
+def test_labels_are_bounded(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_ORGS", {"acme"})
+    assert tracing.org_label("ACME") == "acme"
+    assert tracing.org_label("someone-else") == "other"
+    assert tracing.action_label("delete_secret") == "delete_secret"
+    assert tracing.action_label("DROP TABLE") == "other"
@@ -0,0 +1,165 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from requests.structures import CaseInsensitiveDict
+
+from github.Requester import HTTPSRequestsConnectionClass
+
+from app.github_api import transport
+
+
+class FakeResponse:
+    def __init__(self, status, headers, body=""):
+        self.status = status
+        self.headers = CaseInsensitiveDict(headers)
+        self.body = body
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self):
+        return self.body
+
+
+def make_server(monkeypatch, body='{"login": "acme"}', etag='"v1"'):
+    seen = []
+
+    def getresponse(self):
+        seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == etag:
+            return FakeResponse(304, {"X-RateLimit-Remaining": "4999"})
+        return FakeResponse(200, {"ETag": etag, "Link": "<next>", "X-RateLimit-Remaining": "5000"}, body)
+
+    monkeypatch.setattr(HTTPSRequestsConnectionClass, "getresponse", getresponse)
+    return seen
+
+
+def make_connection():
+    cnx = transport.GitHubConnection("api.github.com")
+    cnx.cache = transport.ResponseCache(max_bytes=1024)
+    return cnx
+
+
+def request(cnx, url="/orgs/acme", token="tok"):
+    cnx.request("GET", url, None, {"Authorization": f"token {token}"})
+    return cnx.getresponse()
+
+
+def test_revalidates_and_serves_304_from_cache(monkeypatch):
+    seen = make_server(monkeypatch)
+    cnx = make_connection()
+
+    first = request(cnx)
+    second = request(cnx)
+
+    assert first.status == 200 and second.status == 200
+    assert second.read() == '{"login": "acme"}'
+    assert seen[1]["If-None-Match"] == '"v1"'
+    headers = dict(second.getheaders())
+    assert headers["link"] == "<next>"
+    assert headers["x-ratelimit-remaining"] == "4999"
+
+
+def test_cache_is_scoped_per_installation(monkeypatch):
+    seen = make_server(monkeypatch)
+    transport.register_token("tok-a", 1)
+    transport.register_token("tok-b", 2)
+    cnx = make_connection()
+
+    request(cnx, token="tok-a")
+    request(cnx, token="tok-b")
+
+    assert "If-None-Match" not in seen[1]
+
+
+def test_lru_evicts_by_bytes():
+    cache = transport.ResponseCache(max_bytes=10)
+    for i in range(3):
+        cache.put(("i", "h", f"/{i}"), transport.CachedEntry('"e"', None, {}, "abcd", 4))
+    assert cache.bytes == 8
+    assert cache.get(("i", "h", "/0")) is None
+    assert cache.get(("i", "h", "/2")) is not None
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    failures = {}
+    failure_status, failure_headers = 502, {}
+
+    def respond(self):
+        remaining = self.failures.get(self.command, 0)
+        status = self.failure_status if remaining else 200
+        self.failures[self.command] = max(remaining - 1, 0)
+        body = b'{"ok": true}'
+        self.send_response(status)
+        for name, value in (self.failure_headers if remaining else {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = respond
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_clients_share_pooled_connections_and_retry_reads(monkeypatch):
+    monkeypatch.setattr(transport, "GITHUB_HTTP_CACHE", False)
+    pool = transport.HTTPPool(pool_size=4, retries=2, backoff=0)
+    monkeypatch.setattr(transport.GitHubConnection, "pool", pool)
+    server = serve()
+    host, port = server.server_address
+
+    def call(verb, token):
+        # PyGithub builds a connection object per request; they must all reuse the same sockets
+        cnx = transport.PlainGitHubConnection(host, port)
+        cnx.request(verb, "/orgs/acme", None, {"Authorization": f"token {token}"})
+        status = cnx.getresponse().status
+        cnx.close()
+        return status
+
+    try:
+        FlakyHandler.failures = {"GET": 1, "POST": 1}
+        assert call("GET", "a") == 200      # retried after the 502
+        assert call("POST", "b") == 502     # writes are never retried
+        assert call("GET", "c") == 200
+    finally:
+        server.shutdown()
+
+    stats = pool.stats()[host]
+    assert stats == {"opened": 1, "requests": 4, "in_use": 0}
+
+
+def test_secondary_rate_limits_are_waited_out_for_writes_too(monkeypatch):
+    monkeypatch.setattr(transport, "GITHUB_HTTP_CACHE", False)
+    monkeypatch.setattr(transport.GitHubConnection, "pool", transport.HTTPPool(pool_size=4, retries=2, backoff=0))
+    monkeypatch.setattr(FlakyHandler, "failure_status", 403)
+    server = serve()
+    host, port = server.server_address
+
+    def call(verb):
+        cnx = transport.PlainGitHubConnection(host, port)
+        cnx.request(verb, "/orgs/acme", None, {"Authorization": "token t"})
+        return cnx.getresponse().status
+
+    try:
+        for headers in ({"Retry-After": "0"}, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "0"}):
+            monkeypatch.setattr(FlakyHandler, "failure_headers", headers)
+            FlakyHandler.failures = {"POST": 1}
+            assert call("POST") == 200
+
+        # A plain 403 is a permission error, and a long wait is left to the caller
+        for headers in ({}, {"Retry-After": "3600"}):
+            monkeypatch.setattr(FlakyHandler, "failure_headers", headers)
+            FlakyHandler.failures = {"GET": 1}
+            assert call("GET") == 403
+    finally:
+        server.shutdown()
@@ -0,0 +1,56 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+from app import warmup as warmup_module
+from app.warmup import Warmup
+
+
+def fake_steps(monkeypatch, delay=0.1, fail_org=None):
+    def get_token(org):
+        if org == fail_org:
+            raise RuntimeError("installation not found")
+        time.sleep(delay)
+
+    async def oidc():
+        await asyncio.sleep(delay)
+
+    monkeypatch.setattr(warmup_module.tokens, "get_token", get_token)
+    monkeypatch.setattr(warmup_module, "get_membership_snapshot", lambda org: time.sleep(delay))
+    monkeypatch.setattr(warmup_module, "get_installation_repos", lambda org: time.sleep(delay))
+    monkeypatch.setattr(warmup_module, "prefetch_oidc_metadata", oidc)
+
+
+def test_orgs_warm_concurrently_and_failures_do_not_block_readiness(monkeypatch):
+    fake_steps(monkeypatch, fail_org="broken")
+    warmup = Warmup()
+
+    started = time.monotonic()
+    asyncio.run(warmup.run(["a", "b", "broken"]))
+    # token then (membership | repos) per org, every org in parallel
+    assert time.monotonic() - started < 0.35
+
+    status = warmup.status()
+    assert status["ready"] is True
+    assert status["warmup"]["oidc"] == "ok"
+    assert status["warmup"]["a:repos"] == status["warmup"]["b:membership"] == "ok"
+    assert status["warmup"]["broken:token"].startswith("error")
+    assert "broken:repos" not in status["warmup"]
+
+
+def test_timeout_marks_unfinished_steps(monkeypatch):
+    fake_steps(monkeypatch, delay=0.3)
+    warmup = Warmup(timeout=0.1)
+    asyncio.run(warmup.run(["a"]))
+    assert warmup.ready
+    assert warmup.status()["warmup"]["a:token"] == "timeout"
+
+
+def test_imports_do_not_build_clients():
+    code = (
+        "import sys, tests.conftest, app.auth, app.github_api.authz as authz;"
+        "assert 'authlib' not in sys.modules;"
+        "assert authz.get_integration.cache_info().currsize == 0"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.github_api import identity, membership, webhooks
+
+SECRET = "webhook-secret"
+
+app = FastAPI()
+app.add_route("/webhooks/github", webhooks.github_webhook, methods=["POST"])
+client = TestClient(app)
+
+
+def deliver(event, payload, secret=SECRET):
+    body = json.dumps(payload).encode("utf-8")
+    signature = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return client.post(
+        "/webhooks/github",
+        content=body,
+        headers={"X-GitHub-Event": event, "X-Hub-Signature-256": signature},
+    )
+
+
+def test_rejects_bad_signature(monkeypatch):
+    monkeypatch.setattr(webhooks, "GITHUB_WEBHOOK_SECRET", SECRET)
+    res = deliver("ping", {}, secret="wrong")
+    assert res.status_code == 401
+
+
+def test_membership_event_patches_snapshot(monkeypatch):
+    monkeypatch.setattr(webhooks, "GITHUB_WEBHOOK_SECRET", SECRET)
+    snapshot = membership.OrgMembershipSnapshot("acme", lambda: None)
+    snapshot.set_team_members("infra", ["bob"])
+    monkeypatch.setitem(membership._snapshots, "acme", snapshot)
+
+    res = deliver("membership", {
+        "action": "added",
+        "scope": "team",
+        "member": {"login": "alice"},
+        "team": {"slug": "infra"},
+        "organization": {"login": "acme"},
+    })
+
+    assert res.status_code == 200
+    assert res.json()["applied"] == ["membership:infra:added"]
+    assert snapshot.is_member("infra", "alice")
+
+
+def test_repository_events_patch_repo_cache(monkeypatch):
+    monkeypatch.setattr(webhooks, "GITHUB_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(identity, "get_app_client", lambda org: SimpleNamespace(
+        get_organization=lambda name: SimpleNamespace(get_repos=lambda: [SimpleNamespace(full_name="acme/one")])
+    ))
+    identity.invalidate_installation_repos("acme")
+    assert list(identity.get_installation_repos("acme")) == ["acme/one"]
+
+    deliver("repository", {"action": "created", "repository": {"full_name": "acme/two"}, "organization": {"login": "acme"}})
+    deliver("repository", {"action": "deleted", "repository": {"full_name": "acme/one"}, "organization": {"login": "acme"}})
+
+    assert list(identity.get_installation_repos("acme")) == ["acme/two"]
+    identity.invalidate_installation_repos("acme")
+
+
+def test_malformed_or_unexpected_payloads_are_not_server_errors(monkeypatch):
+    monkeypatch.setattr(webhooks, "GITHUB_WEBHOOK_SECRET", SECRET)
+    body = b"{not json"
+    signature = "sha256=" + hmac.new(SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    res = client.post(
+        "/webhooks/github", content=body,
+        headers={"X-GitHub-Event": "repository", "X-Hub-Signature-256": signature},
+    )
+    assert res.status_code == 400
+    assert deliver("repository", ["not", "an", "object"]).status_code == 400
+
+    res = deliver("repository", {"repository": {"full_name": "acme/x"}, "organization": {"login": "acme"}})
+    assert res.status_code == 200
+    assert res.json()["applied"] == []
+
+
+def test_handlers_run_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(webhooks, "GITHUB_WEBHOOK_SECRET", SECRET)
+    seen = []
+
+    def handler(payload):
+        try:
+            asyncio.get_running_loop()
+            seen.append("loop")
+        except RuntimeError:
+            seen.append("thread")
+        return ["handled"]
+
+    monkeypatch.setitem(webhooks.HANDLERS, "team", handler)
+    assert deliver("team", {"action": "created"}).json()["applied"] == ["handled"]
+    assert seen == ["thread"]